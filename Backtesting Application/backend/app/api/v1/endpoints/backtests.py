@@ -1,12 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Any, AsyncIterator, Literal
+import json
+import math
+import os
+import numpy as np
+import pandas as pd
 from celery.result import AsyncResult
-from sqlalchemy.orm import Session
+from celery.utils import uuid
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session, load_only
 from datetime import datetime
 
 from app.tasks.celery_app import celery_app
-from app.db.session import get_db
-from app.db.models import Backtest, Strategy, Dataset
+from app.tasks.scheduler import dispatch, queue_depths
+from app.db.session import SessionLocal, get_db
+from app.db.models import Backtest, BacktestBatch, Strategy, Dataset
+from app.core.config import settings
+from app.core.pubsub import get_pubsub, progress_channel
+from app.api.v1.endpoints.strategies import validate_strategy_file
+from app.engine.artifacts import (
+    LEVEL_EQUITY_PREFIX, LEVEL_PREFIX, LEVEL_TIME_PREFIX, artifact_fields, delete_artifact, equity_level_sizes, load_artifact,
+    load_trades,
+)
+from app.engine.chunked import Checkpoint
+from app.engine.fingerprint import cache_key, file_hash
+from app.engine.downsample import DECIMATION_METHODS, decimate, lttb
+from app.engine.trades import trade_columns
+from app.engine.sweep import SWEEP_METRICS
 
 router = APIRouter()
 
@@ -14,10 +37,95 @@ class BacktestRequest(BaseModel):
     name: str
     strategy_id: int
     dataset_id: int
+    # Trade only the bars dated in this range (inclusive), with warmup_bars
+    # earlier bars for indicator warm-up
     start_date: str | None = None
     end_date: str | None = None
     initial_capital: float = 10000.0
     commission: float = 0.001
+    signal_mode: Literal["hold", "target"] = "hold"
+    strategy_params: dict[str, Any] = {}
+    engine: Literal["vectorized", "event"] = "vectorized"
+    rolling_window: int = Field(default=63, gt=1)
+    # Out-of-core run in windows of this many bars (vectorized engine only);
+    # datasets over CHUNKED_DATASET_BYTES are always run in CHUNK_BARS windows
+    chunk_bars: int | None = Field(default=None, gt=0)
+    warmup_bars: int | None = Field(default=None, ge=0)  # default CHUNK_WARMUP_BARS
+
+class SweepRequest(BacktestRequest):
+    parameter_grid: dict[str, list[Any]]
+    metric: str = "sharpe_ratio"
+
+class PortfolioRequest(BacktestRequest):
+    dataset_id: int | None = None
+    dataset_ids: list[int] = Field(min_length=1)
+    align: Literal["intersection", "union"] = "intersection"
+    panel: bool = False
+
+class BatchRunRequest(BacktestRequest):
+    name: str | None = None  # defaults to "<batch name> #<n>"
+
+class BatchRequest(BaseModel):
+    name: str
+    metric: str = "sharpe_ratio"
+    runs: list[BatchRunRequest] = Field(min_length=1)
+
+class MonteCarloRequest(BaseModel):
+    n_paths: int = Field(default=1000, gt=0)
+    block_size: int = Field(default=1, gt=0)
+    seed: int = 42
+
+class WalkForwardRequest(SweepRequest):
+    in_sample_bars: int = Field(gt=0)
+    out_of_sample_bars: int = Field(gt=0)
+    anchored: bool = False
+
+# Statuses of runs that will not change again
+_FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+# Request fields that name a run rather than change its result
+_UNKEYED_FIELDS = {"name", "strategy_id", "dataset_id", "dataset_ids"}
+
+def _content_hash(row: Strategy | Dataset) -> str:
+    """
+    Stored file hash of a strategy or dataset, computed once for older rows;
+    the caller commits it.
+    """
+    if row.content_hash is None:
+        row.content_hash = file_hash(row.file_path)
+    return row.content_hash
+
+def _check_ready(datasets: list[Dataset]):
+    """Backtests run only on datasets that finished ingestion."""
+    for dataset in datasets:
+        if dataset.status == "ingesting":
+            raise HTTPException(status_code=409, detail=f"Dataset {dataset.id} is still being ingested")
+        if dataset.status == "failed":
+            raise HTTPException(status_code=400, detail=f"Dataset {dataset.id} failed ingestion: {dataset.error}")
+
+def _cached_backtest(key: str, db: Session) -> Backtest | None:
+    """Latest run with this key that has completed or is still in flight."""
+    backtest = (
+        db.query(Backtest)
+        .filter(Backtest.cache_key == key, Backtest.status.in_(["queued", "pending", "running", "completed"]))
+        .order_by(Backtest.created_at.desc())
+        .first()
+    )
+    if backtest is None:
+        return None
+    if backtest.status == "completed" and not (backtest.artifact_path and os.path.exists(backtest.artifact_path)):
+        return None
+    return backtest
+
+def _check_dates(req: BacktestRequest):
+    try:
+        start = pd.Timestamp(req.start_date) if req.start_date else None
+        end = pd.Timestamp(req.end_date) if req.end_date else None
+        ordered = start is None or end is None or start <= end
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid start_date or end_date: {str(e)}")
+    if not ordered:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
 
 @router.post("")
 def create_backtest(req: BacktestRequest, db: Session = Depends(get_db)):
@@ -30,49 +138,366 @@ def create_backtest(req: BacktestRequest, db: Session = Depends(get_db)):
     dataset = db.query(Dataset).filter(Dataset.id == req.dataset_id).first()
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
+    _check_ready([dataset])
+    
+    _check_dates(req)
+    if req.engine == "event":
+        if req.chunk_bars:
+            raise HTTPException(status_code=400, detail="Chunked runs need the vectorized engine")
+        with open(strategy.file_path) as f:
+            if not validate_strategy_file(f.read())["has_event_handler"]:
+                raise HTTPException(status_code=400, detail="The event engine needs a strategy class with an on_bar() method")
+    
+    # Identical strategy source, data and settings: serve the stored result or
+    # attach to the run in flight
+    key = cache_key(
+        "single",
+        _content_hash(strategy),
+        [_content_hash(dataset)],
+        req.model_dump(exclude=_UNKEYED_FIELDS),
+    )
+    if settings.RESULT_CACHE_ENABLED and (cached := _cached_backtest(key, db)):
+        # Keeps hashes computed for older rows
+        db.commit()
+        return {
+            "backtest_id": cached.id,
+            "task_id": cached.task_id,
+            "status": cached.status,
+            "cached": True
+        }
+    
+    # Sent by the fair-share dispatcher, within the user's interactive places
+    backtest = Backtest(
+        user_id=1,
+        strategy_id=req.strategy_id,
+        dataset_id=req.dataset_id,
+        name=req.name,
+        status="queued",
+        lane="interactive",
+        cache_key=key,
+        task_id=uuid(),
+        task_request={"name": "tasks.backtest.run_backtest", "args": [strategy.file_path, dataset.file_path]},
+        parameters=req.model_dump()
+    )
+    db.add(backtest)
+    db.commit()
+    dispatch(db, [backtest.user_id])
+    
+    return {
+        "backtest_id": backtest.id,
+        "task_id": backtest.task_id,
+        "status": "queued",
+        "cached": False
+    }
+
+def _require_vectorized(req: BacktestRequest):
+    if req.engine != "vectorized":
+        raise HTTPException(status_code=400, detail="The event engine only runs single backtests")
+    if req.chunk_bars:
+        raise HTTPException(status_code=400, detail="Only single backtests run chunked")
+
+def _queue_grid_backtest(req: SweepRequest, mode: str, task_name: str, db: Session) -> dict:
+    """Validate a parameter grid against the strategy's defaults and queue the job"""
+    strategy = db.query(Strategy).filter(Strategy.id == req.strategy_id).first()
+    if not strategy:
+        raise HTTPException(status_code=404, detail="Strategy not found")
+    
+    dataset = db.query(Dataset).filter(Dataset.id == req.dataset_id).first()
+    if not dataset:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    _check_ready([dataset])
+    
+    _require_vectorized(req)
+    
+    # Grid keys must be parameters the strategy actually accepts
+    with open(strategy.file_path) as f:
+        parameters = validate_strategy_file(f.read())["parameters"]
+    unknown = [key for key in req.parameter_grid if key not in parameters]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown strategy parameters: {unknown}. Available: {list(parameters)}"
+        )
+    if req.metric not in SWEEP_METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {req.metric}. Available: {SWEEP_METRICS}")
+    if any(len(values) == 0 for values in req.parameter_grid.values()):
+        raise HTTPException(status_code=400, detail="Every grid parameter needs at least one value")
     
-    # Create backtest record
+    combinations = math.prod(len(values) for values in req.parameter_grid.values())
+    if combinations > settings.SWEEP_MAX_COMBINATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Grid has {combinations} combinations; the limit is {settings.SWEEP_MAX_COMBINATIONS}"
+        )
+    
+    # Sent by the fair-share dispatcher, within the user's sweep lane places
     backtest = Backtest(
         user_id=1,
         strategy_id=req.strategy_id,
         dataset_id=req.dataset_id,
         name=req.name,
-        status="pending",
+        mode=mode,
+        status="queued",
+        lane="sweep",
+        task_id=uuid(),
+        task_request={"name": task_name, "args": [strategy.file_path, dataset.file_path]},
         parameters=req.model_dump()
     )
     db.add(backtest)
     db.commit()
-    db.refresh(backtest)
+    dispatch(db, [backtest.user_id])
+    
+    return {
+        "backtest_id": backtest.id,
+        "task_id": backtest.task_id,
+        "combinations": combinations,
+        "defaults": parameters,
+        "status": "queued"
+    }
+
+@router.post("/sweep")
+def create_sweep(req: SweepRequest, db: Session = Depends(get_db)):
+    """Queue a parameter sweep evaluated as a single task over one dataset load"""
+    return _queue_grid_backtest(req, "sweep", "tasks.backtest.run_sweep", db)
+
+@router.post("/walk-forward")
+def create_walk_forward(req: WalkForwardRequest, db: Session = Depends(get_db)):
+    """Queue a walk-forward optimization whose folds run in parallel"""
+    return _queue_grid_backtest(req, "walk_forward", "tasks.backtest.run_walk_forward", db)
+
+@router.post("/portfolio")
+def create_portfolio_backtest(req: PortfolioRequest, db: Session = Depends(get_db)):
+    """Queue a backtest that trades several datasets from one cash account"""
+    strategy = db.query(Strategy).filter(Strategy.id == req.strategy_id).first()
+    if not strategy:
+        raise HTTPException(status_code=404, detail="Strategy not found")
+    
+    datasets = {d.id: d for d in db.query(Dataset).filter(Dataset.id.in_(req.dataset_ids)).all()}
+    missing = [dataset_id for dataset_id in req.dataset_ids if dataset_id not in datasets]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Datasets not found: {missing}")
+    _check_ready(list(datasets.values()))
+    if len(set(req.dataset_ids)) != len(req.dataset_ids):
+        raise HTTPException(status_code=400, detail="dataset_ids must not repeat")
+    _require_vectorized(req)
+    
+    assets = []
+    for dataset_id in req.dataset_ids:
+        dataset = datasets[dataset_id]
+        assets.append({
+            "dataset_id": dataset.id,
+            "label": f"{dataset.ticker or dataset.name} ({dataset.id})",
+            "path": dataset.file_path,
+        })
     
-    # Queue task with backtest ID
-    task = celery_app.send_task(
-        "tasks.backtest.run_backtest",
-        args=[backtest.id, strategy.file_path, dataset.file_path, req.model_dump()]
+    backtest = Backtest(
+        user_id=1,
+        strategy_id=req.strategy_id,
+        dataset_ids=req.dataset_ids,
+        name=req.name,
+        mode="portfolio",
+        status="queued",
+        lane="interactive",
+        task_id=uuid(),
+        task_request={"name": "tasks.backtest.run_portfolio_backtest", "args": [strategy.file_path, assets]},
+        parameters=req.model_dump()
     )
+    db.add(backtest)
+    db.commit()
+    dispatch(db, [backtest.user_id])
     
     return {
         "backtest_id": backtest.id,
-        "task_id": task.id,
+        "task_id": backtest.task_id,
+        "assets": len(assets),
+        "status": "queued"
+    }
+
+@router.post("/batch")
+def create_batch(req: BatchRequest, db: Session = Depends(get_db)):
+    """
+    Queue many single backtests at once.
+    
+    The runs' rows are inserted by one statement in one transaction and
+    queued in the batch lane, from which the fair-share dispatcher sends
+    them to the workers; the batch's status endpoint ranks the completed
+    runs.
+    """
+    if len(req.runs) > settings.BATCH_MAX_RUNS:
+        raise HTTPException(status_code=400, detail=f"A batch is limited to {settings.BATCH_MAX_RUNS} runs")
+    if req.metric not in SWEEP_METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {req.metric}. Available: {SWEEP_METRICS}")
+    
+    strategy_ids = {run.strategy_id for run in req.runs}
+    dataset_ids = {run.dataset_id for run in req.runs}
+    strategies = {s.id: s for s in db.query(Strategy).filter(Strategy.id.in_(strategy_ids)).all()}
+    datasets = {d.id: d for d in db.query(Dataset).filter(Dataset.id.in_(dataset_ids)).all()}
+    missing = sorted(strategy_ids - strategies.keys())
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Strategies not found: {missing}")
+    missing = sorted(dataset_ids - datasets.keys())
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Datasets not found: {missing}")
+    _check_ready(list(datasets.values()))
+    
+    for run in req.runs:
+        _check_dates(run)
+    if any(run.engine == "event" and run.chunk_bars for run in req.runs):
+        raise HTTPException(status_code=400, detail="Chunked runs need the vectorized engine")
+    for strategy_id in {run.strategy_id for run in req.runs if run.engine == "event"}:
+        with open(strategies[strategy_id].file_path) as f:
+            if not validate_strategy_file(f.read())["has_event_handler"]:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Strategy {strategy_id} has no on_bar() method for the event engine"
+                )
+    
+    # Once per strategy and dataset rather than per run
+    strategy_hashes = {strategy_id: _content_hash(strategy) for strategy_id, strategy in strategies.items()}
+    dataset_hashes = {dataset_id: _content_hash(dataset) for dataset_id, dataset in datasets.items()}
+    
+    batch = BacktestBatch(user_id=1, name=req.name, metric=req.metric)
+    db.add(batch)
+    db.flush()
+    
+    # Runs are keyed like single backtests, so later identical submissions
+    # are served from the batch's results; every run in the batch is queued
+    rows = []
+    for i, run in enumerate(req.runs, start=1):
+        config = {**run.model_dump(), "name": run.name or f"{req.name} #{i}"}
+        rows.append({
+            "user_id": 1,
+            "batch_id": batch.id,
+            "strategy_id": run.strategy_id,
+            "dataset_id": run.dataset_id,
+            "name": config["name"],
+            "mode": "single",
+            "status": "queued",
+            "lane": "batch",
+            "cache_key": cache_key(
+                "single",
+                strategy_hashes[run.strategy_id],
+                [dataset_hashes[run.dataset_id]],
+                run.model_dump(exclude=_UNKEYED_FIELDS),
+            ),
+            # Assigned up front so the rows need no second write
+            "task_id": uuid(),
+            "task_request": {
+                "name": "tasks.backtest.run_backtest",
+                "args": [strategies[run.strategy_id].file_path, datasets[run.dataset_id].file_path],
+            },
+            "parameters": config,
+        })
+    # RETURNING in parameter order would cost a statement per row on some
+    # databases; the unique task ids match the new ids back to their rows
+    inserted = dict(db.execute(insert(Backtest).returning(Backtest.task_id, Backtest.id), rows).all())
+    db.commit()
+    backtest_ids = [inserted[row["task_id"]] for row in rows]
+    dispatched = dispatch(db, [batch.user_id])
+    
+    return {
+        "batch_id": batch.id,
+        "backtest_ids": backtest_ids,
+        "runs": len(backtest_ids),
+        "dispatched": dispatched,
         "status": "queued"
     }
 
+@router.get("/batch/{batch_id}")
+def get_batch(
+    batch_id: int,
+    metric: str | None = None,
+    limit: int = Query(default=100, ge=1, le=10_000),
+    db: Session = Depends(get_db)
+):
+    """Batch progress and its completed runs ranked by `metric` (default: the batch's)"""
+    batch = db.query(BacktestBatch).filter(BacktestBatch.id == batch_id).first()
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    metric = metric or batch.metric
+    if metric not in SWEEP_METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}. Available: {SWEEP_METRICS}")
+    
+    counts = dict(
+        db.query(Backtest.status, func.count())
+        .filter(Backtest.batch_id == batch.id)
+        .group_by(Backtest.status)
+        .all()
+    )
+    total = sum(counts.values())
+    finished = sum(counts.get(status, 0) for status in _FINISHED_STATUSES)
+    
+    # Only the metrics are read back: results also hold the chart previews
+    completed = (
+        db.query(
+            Backtest.id, Backtest.name, Backtest.strategy_id, Backtest.dataset_id,
+            Backtest.parameters["strategy_params"], Backtest.results["metrics"],
+        )
+        .filter(Backtest.batch_id == batch.id, Backtest.status == "completed")
+        .all()
+    )
+    completed.sort(key=lambda row: (row[5] or {}).get(metric, -math.inf), reverse=True)
+    
+    return {
+        "batch_id": batch.id,
+        "name": batch.name,
+        "metric": metric,
+        "status": "completed" if finished == total else "running",
+        "total": total,
+        "counts": counts,
+        "leaderboard": [
+            {
+                "rank": rank,
+                "backtest_id": backtest_id,
+                "name": name,
+                "strategy_id": strategy_id,
+                "dataset_id": dataset_id,
+                "strategy_params": strategy_params,
+                "metrics": metrics,
+            }
+            for rank, (backtest_id, name, strategy_id, dataset_id, strategy_params, metrics)
+            in enumerate(completed[:limit], start=1)
+        ],
+        "created_at": batch.created_at
+    }
+
 @router.get("")
 def list_backtests(db: Session = Depends(get_db)):
     """List all backtests"""
-    backtests = db.query(Backtest).order_by(Backtest.created_at.desc()).all()
+    # Only the listed columns: parameters and results stay in the database
+    backtests = (
+        db.query(Backtest)
+        .options(load_only(
+            Backtest.id, Backtest.name, Backtest.mode, Backtest.status, Backtest.strategy_id,
+            Backtest.dataset_id, Backtest.dataset_ids, Backtest.batch_id, Backtest.extends_id,
+            Backtest.created_at, Backtest.completed_at,
+        ))
+        .filter(Backtest.parent_id.is_(None))  # Walk-forward folds are listed through their walk-forward
+        .order_by(Backtest.created_at.desc())
+        .all()
+    )
     return [
         {
             "id": b.id,
             "name": b.name,
+            "mode": b.mode,
             "status": b.status,
             "strategy_id": b.strategy_id,
             "dataset_id": b.dataset_id,
+            "dataset_ids": b.dataset_ids,
+            "batch_id": b.batch_id,
+            "extends_id": b.extends_id,
             "created_at": b.created_at,
             "completed_at": b.completed_at
         }
         for b in backtests
     ]
 
+@router.get("/queues")
+def get_queue_depths(db: Session = Depends(get_db)):
+    """Per lane: broker queue depth and queued, pending and running runs, overall and per user"""
+    return queue_depths(db)
+
 @router.get("/{backtest_id}")
 def get_backtest(backtest_id: int, db: Session = Depends(get_db)):
     """Get backtest status and details"""
@@ -83,24 +508,386 @@ def get_backtest(backtest_id: int, db: Session = Depends(get_db)):
     return {
         "id": backtest.id,
         "name": backtest.name,
+        "mode": backtest.mode,
         "status": backtest.status,
         "strategy_id": backtest.strategy_id,
         "dataset_id": backtest.dataset_id,
+        "dataset_ids": backtest.dataset_ids,
+        "batch_id": backtest.batch_id,
+        "extends_id": backtest.extends_id,
         "parameters": backtest.parameters,
         "results": backtest.results,
+        "has_artifact": backtest.artifact_path is not None,
         "created_at": backtest.created_at,
         "started_at": backtest.started_at,
         "completed_at": backtest.completed_at
     }
 
+def _completed_with_artifact(backtest_id: int, db: Session) -> Backtest:
+    backtest = db.query(Backtest).filter(Backtest.id == backtest_id).first()
+    if not backtest:
+        raise HTTPException(status_code=404, detail="Backtest not found")
+    if backtest.status != "completed" or backtest.artifact_path is None:
+        raise HTTPException(status_code=400, detail="Per-bar results are not available for this backtest")
+    return backtest
+
+@router.get("/{backtest_id}/equity")
+def get_equity_curve(
+    backtest_id: int,
+    points: int = Query(default=500, ge=2),
+    method: str = "lttb",
+    start: int | None = Query(default=None, ge=0),
+    end: int | None = Query(default=None, ge=0),
+    db: Session = Depends(get_db)
+):
+    """
+    Equity curve decimated to `points` points, optionally for bars [start, end).
+    
+    Whole-curve LTTB requests are served from the stored resolution levels,
+    reading only the level's members; zoomed ranges, min/max decimation and
+    finer resolutions are decimated from the full curve. `timestamps` are
+    included when the run has them.
+    """
+    backtest = _completed_with_artifact(backtest_id, db)
+    if method not in DECIMATION_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown method: {method}. Available: {DECIMATION_METHODS}")
+    if points > settings.EQUITY_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"points is limited to {settings.EQUITY_MAX_POINTS}")
+    
+    levels = equity_level_sizes(artifact_fields(backtest.artifact_path))
+    level = min((size for size in levels if size >= points), default=None)
+    if method == "lttb" and start is None and end is None and level is not None:
+        names = [f"{LEVEL_PREFIX}{level}", f"{LEVEL_EQUITY_PREFIX}{level}", f"{LEVEL_TIME_PREFIX}{level}"]
+        stored = load_artifact(backtest.artifact_path, names)
+        bars = stored[names[0]]
+        equity = stored.get(names[1])
+        if equity is None:
+            # Artifacts from before levels kept their equity
+            equity = load_artifact(backtest.artifact_path, ["equity"])["equity"][bars]
+        timestamps = stored.get(names[2])
+        keep = lttb(equity, points)
+        bars, equity = bars[keep], equity[keep]
+        timestamps = timestamps[keep] if timestamps is not None else None
+    else:
+        full = load_artifact(backtest.artifact_path, ["equity", "timestamps"])
+        equity, timestamps = full["equity"], full.get("timestamps")
+        lo, hi = start or 0, min(end if end is not None else len(equity), len(equity))
+        if lo >= hi:
+            raise HTTPException(status_code=400, detail=f"Empty bar range [{lo}, {hi})")
+        keep = decimate(equity[lo:hi], points, method)
+        bars, equity = keep + lo, equity[lo:hi][keep]
+        timestamps = timestamps[bars] if timestamps is not None else None
+    
+    curve = {
+        "backtest_id": backtest.id,
+        "method": method,
+        "points": len(bars),
+        "bars": bars.tolist(),
+        "equity": equity.tolist(),
+    }
+    if timestamps is not None:
+        curve["timestamps"] = _time_list(timestamps)
+    return curve
+
+def _time_list(timestamps: np.ndarray) -> list[str]:
+    if timestamps.dtype.kind == "M":
+        return np.datetime_as_string(timestamps, unit="s").tolist()
+    return timestamps.astype(str).tolist()
+
+def _finished_event(backtest_id: int) -> dict | None:
+    """The final event of a run that has finished (or been deleted), from the database."""
+    # Short-lived session: streams outlive the request's
+    db = SessionLocal()
+    try:
+        row = (
+            db.query(Backtest.status, Backtest.results["metrics"], Backtest.results["error"])
+            .filter(Backtest.id == backtest_id)
+            .first()
+        )
+    finally:
+        db.close()
+    if row is None:
+        return {"backtest_id": backtest_id, "stage": "failed", "percent": 100, "error": "Backtest deleted"}
+    status, metrics, error = row
+    if status not in _FINISHED_STATUSES:
+        return None
+    event = {"backtest_id": backtest_id, "stage": status, "percent": 100}
+    if metrics is not None:
+        event["metrics"] = metrics
+    if error is not None:
+        event["error"] = error
+    return event
+
+def _server_sent(event: dict) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+async def _progress_stream(backtest_id: int) -> AsyncIterator[str]:
+    pubsub = get_pubsub()
+    channel = progress_channel(backtest_id)
+    # Listening before the status check, so no event is lost in between
+    async with pubsub.listen(channel) as listener:
+        finished = await run_in_threadpool(_finished_event, backtest_id)
+        if finished is not None:
+            yield _server_sent(finished)
+            return
+        if (latest := await pubsub.last_async(channel)) is not None:
+            yield _server_sent(latest)
+        while True:
+            event = await listener.get(settings.PROGRESS_KEEPALIVE_SECONDS)
+            if event is None:
+                # Quiet: the worker may have died without a final event
+                finished = await run_in_threadpool(_finished_event, backtest_id)
+                if finished is not None:
+                    yield _server_sent(finished)
+                    return
+                yield ": keepalive\n\n"
+                continue
+            yield _server_sent(event)
+            if event["stage"] in _FINISHED_STATUSES:
+                return
+
+@router.get("/{backtest_id}/events")
+def stream_progress(backtest_id: int, db: Session = Depends(get_db)):
+    """
+    Server-sent events of a run's progress: stage, percent done, bars run and
+    metrics so far. The stream ends after the `completed`, `failed` or
+    `cancelled` event.
+    """
+    if db.query(Backtest.id).filter(Backtest.id == backtest_id).first() is None:
+        raise HTTPException(status_code=404, detail="Backtest not found")
+    return StreamingResponse(
+        _progress_stream(backtest_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/{backtest_id}/trades")
+def get_trades(
+    backtest_id: int,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=1000, ge=1, le=100_000),
+    db: Session = Depends(get_db)
+):
+    """Page of the trade ledger, columnar: one list per field"""
+    backtest = _completed_with_artifact(backtest_id, db)
+    trades = load_trades(backtest.artifact_path)
+    if not trades:
+        raise HTTPException(status_code=400, detail="This backtest has no trade ledger")
+    
+    total = len(trades["pnl"])
+    page = {field: values[offset:offset + limit] for field, values in trades.items()}
+    return {
+        "backtest_id": backtest.id,
+        "total": total,
+        "offset": offset,
+        "trades": trade_columns(page),
+    }
+
+@router.post("/{backtest_id}/monte-carlo")
+def create_monte_carlo(backtest_id: int, req: MonteCarloRequest, db: Session = Depends(get_db)):
+    """
+    Queue a bootstrap robustness analysis of a completed backtest's returns.
+    
+    The analysis runs as a child run in the interactive lane, so it takes
+    one of the user's places there; the task stores it in the backtest's
+    results and deletes the child.
+    """
+    backtest = db.query(Backtest).filter(Backtest.id == backtest_id).first()
+    if not backtest:
+        raise HTTPException(status_code=404, detail="Backtest not found")
+    
+    if backtest.status != "completed" or backtest.artifact_path is None:
+        raise HTTPException(status_code=400, detail="Monte Carlo needs a completed backtest with stored returns")
+    if req.n_paths > settings.MONTE_CARLO_MAX_PATHS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"n_paths is limited to {settings.MONTE_CARLO_MAX_PATHS}"
+        )
+    
+    backtest.results = {**backtest.results, "monte_carlo": {"status": "pending", **req.model_dump()}}
+    run = Backtest(
+        user_id=backtest.user_id,
+        parent_id=backtest.id,
+        name=f"{backtest.name} Monte Carlo",
+        mode="monte_carlo",
+        status="queued",
+        lane="interactive",
+        task_id=uuid(),
+        task_request={"name": "tasks.backtest.run_monte_carlo", "args": []},
+        parameters=req.model_dump()
+    )
+    db.add(run)
+    db.commit()
+    task_id = run.task_id
+    dispatch(db, [backtest.user_id])
+    
+    return {
+        "backtest_id": backtest.id,
+        "task_id": task_id,
+        "status": "queued"
+    }
+
+@router.post("/{backtest_id}/extend")
+def extend_backtest(backtest_id: int, db: Session = Depends(get_db)):
+    """
+    Continue a completed backtest over the bars appended to its dataset since
+    it ran, as a new backtest with the same settings.
+    
+    The run resumes from the checkpoint the backtest saved: only the new bars
+    (and the warm-up bars before them) are read and run through the strategy,
+    and the results cover the whole dataset. Extended runs can be extended in
+    turn. Signals and per-bar output equal a full re-run under the warm-up
+    caveats of chunked runs; summed metrics can differ in the last digits.
+    """
+    source = db.query(Backtest).filter(Backtest.id == backtest_id).first()
+    if not source:
+        raise HTTPException(status_code=404, detail="Backtest not found")
+    if source.mode != "single" or source.status != "completed" or source.artifact_path is None:
+        raise HTTPException(status_code=400, detail="Only completed single backtests can be extended")
+    strategy = db.query(Strategy).filter(Strategy.id == source.strategy_id).first()
+    dataset = db.query(Dataset).filter(Dataset.id == source.dataset_id).first()
+    if not strategy or not dataset:
+        raise HTTPException(status_code=404, detail="The backtest's strategy or dataset no longer exists")
+    
+    checkpoint = Checkpoint.load(source.artifact_path) if os.path.exists(source.artifact_path) else None
+    if checkpoint is None:
+        raise HTTPException(
+            status_code=400,
+            detail="The backtest saved no checkpoint (event engine runs, runs with an end_date and runs whose dataset changed meanwhile do not)"
+        )
+    if checkpoint.strategy_hash != _content_hash(strategy):
+        raise HTTPException(status_code=409, detail="The strategy changed since the backtest ran; run it again instead")
+    size = os.path.getsize(dataset.file_path)
+    if size < checkpoint.data_bytes:
+        raise HTTPException(status_code=409, detail="The dataset was replaced since the backtest ran; run it again instead")
+    if size == checkpoint.data_bytes:
+        raise HTTPException(status_code=400, detail="No bars were appended since the backtest ran")
+    
+    # One extension per source and dataset state: repeats attach to it
+    key = cache_key(
+        "extend",
+        checkpoint.strategy_hash,
+        [_content_hash(dataset)],
+        {"backtest_id": source.id},
+    )
+    if settings.RESULT_CACHE_ENABLED and (cached := _cached_backtest(key, db)):
+        # Keeps hashes computed for older rows
+        db.commit()
+        return {
+            "backtest_id": cached.id,
+            "task_id": cached.task_id,
+            "status": cached.status,
+            "extends": source.id,
+            "cached": True
+        }
+    
+    backtest = Backtest(
+        user_id=source.user_id,
+        strategy_id=source.strategy_id,
+        dataset_id=source.dataset_id,
+        extends_id=source.id,
+        name=source.name,
+        status="queued",
+        lane="interactive",
+        cache_key=key,
+        task_id=uuid(),
+        task_request={"name": "tasks.backtest.run_backtest", "args": [strategy.file_path, dataset.file_path]},
+        parameters=source.parameters
+    )
+    db.add(backtest)
+    db.commit()
+    dispatch(db, [backtest.user_id])
+    
+    return {
+        "backtest_id": backtest.id,
+        "task_id": backtest.task_id,
+        "status": "queued",
+        "extends": source.id,
+        "cached": False
+    }
+
+@router.post("/{backtest_id}/cancel")
+def cancel_backtest(backtest_id: int, db: Session = Depends(get_db)):
+    """
+    Cancel a queued or running backtest.
+    
+    Runs not started yet are revoked and marked cancelled at once. Running
+    ones are marked `cancelling`: the worker stops at its next check between
+    engine chunks (within about CANCEL_CHECK_SECONDS plus one chunk;
+    sandboxed strategy code is killed) and marks the run cancelled. A
+    walk-forward's folds are cancelled with it.
+    """
+    backtest = db.query(Backtest).filter(Backtest.id == backtest_id).first()
+    if not backtest:
+        raise HTTPException(status_code=404, detail="Backtest not found")
+    
+    # Conditional updates: the worker may start or finish the run meanwhile
+    runs = db.query(Backtest).filter(Backtest.id == backtest_id)
+    if runs.filter(Backtest.status.in_(("queued", "pending"))).update(
+        {"status": "cancelled", "completed_at": datetime.utcnow()}, synchronize_session=False
+    ):
+        status = "cancelled"
+    elif runs.filter(Backtest.status == "running").update({"status": "cancelling"}, synchronize_session=False):
+        status = "cancelling"
+    else:
+        db.rollback()
+        db.refresh(backtest)
+        raise HTTPException(status_code=400, detail=f"Backtest is already {backtest.status}")
+    task_ids = [backtest.task_id]
+    if status == "cancelling" and backtest.mode == "walk_forward":
+        task_ids += _cancel_folds(backtest_id, db)
+        status = db.query(Backtest.status).filter(Backtest.id == backtest_id).scalar()
+    db.commit()
+    
+    for task_id in filter(None, task_ids):
+        celery_app.control.revoke(task_id)
+    if status == "cancelled":
+        get_pubsub().publish(
+            progress_channel(backtest_id), {"backtest_id": backtest_id, "stage": "cancelled", "percent": 100}
+        )
+    
+    return {"backtest_id": backtest_id, "status": status}
+
+def _cancel_folds(backtest_id: int, db: Session) -> list[str]:
+    """
+    Cancel the folds of a walk-forward being cancelled; returns the task ids
+    of those sent to the broker. With no fold left running, none will end to
+    finish the walk-forward, so it is marked cancelled and its folds deleted
+    here; with no folds yet, run_walk_forward sees the cancel instead.
+    """
+    folds = db.query(Backtest).filter(Backtest.parent_id == backtest_id)
+    task_ids = [task_id for (task_id,) in folds.filter(Backtest.status == "pending").with_entities(Backtest.task_id)]
+    folds.filter(Backtest.status.in_(("queued", "pending"))).update(
+        {"status": "cancelled", "completed_at": datetime.utcnow()}, synchronize_session=False
+    )
+    folds.filter(Backtest.status == "running").update({"status": "cancelling"}, synchronize_session=False)
+    
+    if folds.count() and not folds.filter(Backtest.status == "cancelling").count():
+        artifacts = [path for (path,) in folds.with_entities(Backtest.artifact_path)]
+        folds.delete(synchronize_session=False)
+        db.query(Backtest).filter(Backtest.id == backtest_id).update(
+            {"status": "cancelled", "completed_at": datetime.utcnow()}, synchronize_session=False
+        )
+        db.commit()
+        for path in artifacts:
+            delete_artifact(path)
+    return task_ids
+
 @router.delete("/{backtest_id}")
 def delete_backtest(backtest_id: int, db: Session = Depends(get_db)):
-    """Delete a backtest"""
+    """Delete a backtest; a run still in progress stops at its next cancel check"""
     backtest = db.query(Backtest).filter(Backtest.id == backtest_id).first()
     if not backtest:
         raise HTTPException(status_code=404, detail="Backtest not found")
     
-    db.delete(backtest)
+    # With a walk-forward's folds; running ones stop at their next check
+    runs = db.query(Backtest).filter((Backtest.id == backtest_id) | (Backtest.parent_id == backtest_id))
+    deleted = runs.with_entities(Backtest.artifact_path, Backtest.task_id, Backtest.status).all()
+    runs.delete(synchronize_session=False)
     db.commit()
+    for artifact, task_id, status in deleted:
+        delete_artifact(artifact)
+        if task_id and status == "pending":
+            celery_app.control.revoke(task_id)
     
     return {"message": "Backtest deleted successfully"}
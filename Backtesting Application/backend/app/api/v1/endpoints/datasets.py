@@ -2,7 +2,11 @@ from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List
+import csv
+import logging
 import os
+import shutil
+import uuid
 import pandas as pd
 import yfinance as yf
 from datetime import datetime
@@ -10,9 +14,18 @@ from datetime import datetime
 from app.db.session import get_db
 from app.db.models import Dataset
 from app.core.config import settings
+from app.engine.columnar import delete_columnar, load_columnar
+from app.engine.data import append_rows, convert_dataset, date_index_path
+from app.engine.fingerprint import file_hash
+from app.tasks.celery_app import celery_app
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Uploads are copied to disk in parts of this size
+_UPLOAD_CHUNK_BYTES = 1024 * 1024
+
 class YFinanceRequest(BaseModel):
     ticker: str
     name: str | None = None
@@ -21,33 +34,44 @@ class YFinanceRequest(BaseModel):
     interval: str = "1d"  # 1d, 1h, 5m, etc.
 
 @router.post("/upload")
-async def upload_dataset(
+def upload_dataset(
     file: UploadFile = File(...),
     name: str = None,
     db: Session = Depends(get_db)
 ):
-    """Upload a CSV dataset with OHLCV data"""
+    """
+    Upload a CSV dataset with OHLCV data.
+    
+    Only the header is checked here, and the file is streamed to disk; a
+    worker then parses it (tasks.dataset.ingest_dataset). The dataset is
+    `ingesting` until then: GET /datasets/{id} reports when it is `ready`,
+    or `failed` with the reason.
+    
+    A plain function, so the copy runs in the thread pool rather than on the
+    event loop.
+    """
     
     # Validate file extension
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only .csv files are allowed")
     
-    # Read and validate CSV
-    content = await file.read()
+    # Validate the header, from the first part of the upload
+    first = file.file.read(_UPLOAD_CHUNK_BYTES)
     try:
-        df = pd.read_csv(pd.io.common.BytesIO(content))
-    except Exception as e:
+        header_line = first.split(b"\n", 1)[0].decode("utf-8-sig").rstrip("\r")
+        columns = next(csv.reader([header_line]), [])
+    except (UnicodeDecodeError, csv.Error) as e:
         raise HTTPException(status_code=400, detail=f"Invalid CSV file: {str(e)}")
     
     # Validate required columns (flexible column names)
     required_cols = ['open', 'high', 'low', 'close', 'volume']
-    df_cols_lower = [col.lower() for col in df.columns]
+    df_cols_lower = [col.lower() for col in columns]
     
     missing_cols = [col for col in required_cols if col not in df_cols_lower]
     if missing_cols:
         raise HTTPException(
             status_code=400,
-            detail=f"CSV must contain OHLCV columns. Missing: {missing_cols}. Found: {list(df.columns)}"
+            detail=f"CSV must contain OHLCV columns. Missing: {missing_cols}. Found: {columns}"
         )
     
     # Generate unique filename
@@ -56,23 +80,11 @@ async def upload_dataset(
     filename = f"{safe_name}_{timestamp}.csv"
     file_path = os.path.join(settings.DATASET_DIR, filename)
     
-    # Save file
+    # Save file: the part read so far, then the rest of the spooled upload
     os.makedirs(settings.DATASET_DIR, exist_ok=True)
     with open(file_path, 'wb') as f:
-        f.write(content)
-    
-    # Extract date range if date column exists
-    start_date = None
-    end_date = None
-    for col in df.columns:
-        if col.lower() in ['date', 'datetime', 'timestamp']:
-            try:
-                df[col] = pd.to_datetime(df[col])
-                start_date = df[col].min()
-                end_date = df[col].max()
-            except:
-                pass
-            break
+        f.write(first)
+        shutil.copyfileobj(file.file, f, _UPLOAD_CHUNK_BYTES)
     
     # Save to database
     dataset = Dataset(
@@ -80,21 +92,20 @@ async def upload_dataset(
         name=name or file.filename,
         type="uploaded",
         file_path=file_path,
-        start_date=start_date,
-        end_date=end_date
+        status="ingesting"
     )
     db.add(dataset)
     db.commit()
     db.refresh(dataset)
     
+    celery_app.send_task("tasks.dataset.ingest_dataset", args=[dataset.id])
+    
     return {
         "id": dataset.id,
         "name": dataset.name,
         "type": dataset.type,
-        "rows": len(df),
-        "columns": list(df.columns),
-        "start_date": start_date,
-        "end_date": end_date,
+        "status": dataset.status,
+        "columns": columns,
         "created_at": dataset.created_at
     }
 
@@ -168,6 +179,7 @@ def fetch_yfinance_data(req: YFinanceRequest, db: Session = Depends(get_db)):
         
         os.makedirs(settings.DATASET_DIR, exist_ok=True)
         df.to_csv(file_path, index=False)
+        _convert(file_path)
         
         # Save to database
         dataset = Dataset(
@@ -176,7 +188,9 @@ def fetch_yfinance_data(req: YFinanceRequest, db: Session = Depends(get_db)):
             type="yfinance",
             ticker=req.ticker,
             file_path=file_path,
+            content_hash=file_hash(file_path),
             interval=req.interval,
+            rows=len(df),
             start_date=pd.to_datetime(req.start_date),
             end_date=pd.to_datetime(req.end_date)
         )
@@ -204,6 +218,66 @@ def fetch_yfinance_data(req: YFinanceRequest, db: Session = Depends(get_db)):
         print(f"YFinance error: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=error_detail)
 
+def _convert(file_path: str) -> None:
+    """Write the columnar copy workers load (see app.engine.columnar)."""
+    if not settings.DATASET_COLUMNAR:
+        return
+    try:
+        convert_dataset(file_path)
+    except (OSError, ValueError, pd.errors.ParserError) as e:
+        # Workers parse the CSV and try again on first load
+        logger.warning("Columnar conversion of %s failed: %s", file_path, e)
+
+@router.post("/{dataset_id}/append")
+def append_to_dataset(
+    dataset_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Append the rows of a CSV file with the dataset's columns, such as the
+    latest bars of a feed. Completed backtests on the dataset can then be
+    extended over just the new bars (POST /backtests/{id}/extend).
+    
+    A plain function, so the upload, the append and the rehash of the
+    dataset run in the thread pool rather than on the event loop.
+    """
+    # Locks the row (where supported): concurrent appends would drop each other's rows
+    dataset = db.query(Dataset).filter(Dataset.id == dataset_id).with_for_update().first()
+    if not dataset:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    if dataset.status != "ready":
+        raise HTTPException(status_code=409, detail=f"The dataset is {dataset.status}; rows can only be appended once it is ready")
+    
+    # Streamed to a file next to the dataset, then checked and appended from it
+    upload_path = f"{dataset.file_path}.{uuid.uuid4().hex}.append"
+    try:
+        with open(upload_path, "wb") as f:
+            shutil.copyfileobj(file.file, f)
+        appended = append_rows(dataset.file_path, upload_path)
+    except (ValueError, pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not append rows: {str(e)}")
+    finally:
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+    
+    dataset.content_hash = file_hash(dataset.file_path)
+    # The columnar copy is rewritten on the next load, off the request path
+    if appended.end_date is not None:
+        dataset.end_date = appended.end_date
+    if dataset.rows is not None:
+        dataset.rows += appended.rows
+    db.commit()
+    
+    return {
+        "id": dataset.id,
+        "name": dataset.name,
+        "rows": dataset.rows,
+        "rows_appended": appended.rows,
+        "start_date": dataset.start_date,
+        "end_date": dataset.end_date
+    }
+
 @router.get("")
 def list_datasets(db: Session = Depends(get_db)):
     """List all datasets"""
@@ -214,6 +288,7 @@ def list_datasets(db: Session = Depends(get_db)):
             "name": d.name,
             "type": d.type,
             "ticker": d.ticker,
+            "status": d.status,
             "start_date": d.start_date,
             "end_date": d.end_date,
             "created_at": d.created_at
@@ -241,9 +316,13 @@ def get_dataset(dataset_id: int, db: Session = Depends(get_db)):
         "type": dataset.type,
         "ticker": dataset.ticker,
         "file_path": dataset.file_path,
+        "status": dataset.status,
+        "error": dataset.error,
+        "rows": dataset.rows,
         "start_date": dataset.start_date,
         "end_date": dataset.end_date,
         "created_at": dataset.created_at,
+        "columnar": os.path.exists(dataset.file_path) and load_columnar(dataset.file_path) is not None,
         "preview": preview
     }
 
@@ -254,9 +333,11 @@ def delete_dataset(dataset_id: int, db: Session = Depends(get_db)):
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
-    # Delete file
-    if os.path.exists(dataset.file_path):
-        os.remove(dataset.file_path)
+    # Delete file, with its date index and columnar copy
+    for path in (dataset.file_path, date_index_path(dataset.file_path)):
+        if os.path.exists(path):
+            os.remove(path)
+    delete_columnar(dataset.file_path)
     
     db.delete(dataset)
     db.commit()
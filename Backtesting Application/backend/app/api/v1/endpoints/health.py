@@ -1,7 +1,19 @@
-from fastapi import APIRouter
+from celery.exceptions import TimeoutError
+from fastapi import APIRouter, HTTPException
+
+from app.tasks.celery_app import celery_app
 
 router = APIRouter()
 
 @router.get("")
 def health():
     return {"status": "ok"}
+
+@router.get("/cache")
+def worker_cache():
+    """Dataset, indicator and strategy code cache counters of one backtest worker process"""
+    task = celery_app.send_task("tasks.backtest.worker_cache_stats")
+    try:
+        return task.get(timeout=10)
+    except TimeoutError:
+        raise HTTPException(status_code=503, detail="No backtest worker answered")
@@ -8,6 +8,7 @@ from datetime import datetime
 from app.db.session import get_db
 from app.db.models import Strategy
 from app.core.config import settings
+from app.engine.fingerprint import bytes_hash
 
 router = APIRouter()
 
@@ -15,6 +16,7 @@ def validate_strategy_file(content: str) -> dict:
     """
     Validate that the Python file contains required strategy components.
     Expected: A class with run() or execute() method, or a function named strategy().
+    A class with on_bar() is an event-driven strategy for the bar-by-bar engine.
     """
     try:
         tree = ast.parse(content)
@@ -23,6 +25,7 @@ def validate_strategy_file(content: str) -> dict:
     
     has_strategy_class = False
     has_strategy_function = False
+    has_event_handler = False
     
     for node in ast.walk(tree):
         if isinstance(node, ast.ClassDef):
@@ -30,22 +33,62 @@ def validate_strategy_file(content: str) -> dict:
             for item in node.body:
                 if isinstance(item, ast.FunctionDef) and item.name in ["run", "execute", "backtest"]:
                     has_strategy_class = True
-                    break
+                elif isinstance(item, ast.FunctionDef) and item.name == "on_bar":
+                    has_event_handler = True
         elif isinstance(node, ast.FunctionDef) and node.name in ["strategy", "run_strategy", "backtest"]:
             has_strategy_function = True
     
-    if not (has_strategy_class or has_strategy_function):
+    if not (has_strategy_class or has_strategy_function or has_event_handler):
         raise HTTPException(
             status_code=400,
-            detail="Strategy file must contain either a class with run()/execute()/backtest() method or a function named strategy()/run_strategy()/backtest()"
+            detail="Strategy file must contain either a class with run()/execute()/backtest()/on_bar() method or a function named strategy()/run_strategy()/backtest()"
         )
     
     return {
         "valid": True,
         "has_class": has_strategy_class,
-        "has_function": has_strategy_function
+        "has_function": has_strategy_function,
+        "has_event_handler": has_event_handler,
+        "parameters": extract_strategy_parameters(tree),
     }
 
+def _literal_defaults(args: ast.arguments, skip: int) -> dict:
+    """Map argument names to their literal default values (None if not a literal)."""
+    positional = args.posonlyargs + args.args
+    defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+    pairs = list(zip(positional, defaults))[skip:]
+    pairs += list(zip(args.kwonlyargs, args.kw_defaults))
+    
+    params = {}
+    for arg, default in pairs:
+        try:
+            params[arg.arg] = ast.literal_eval(default) if default is not None else None
+        except ValueError:
+            params[arg.arg] = None
+    return params
+
+def extract_strategy_parameters(tree: ast.Module) -> dict:
+    """
+    Return the tunable parameters of a strategy and their defaults.
+    
+    Mirrors the worker's entry point resolution: the __init__ arguments of the
+    first class with run()/execute()/backtest() (or on_bar() for event-driven
+    strategies), otherwise the arguments after `data` of a
+    strategy()/run_strategy()/backtest() function.
+    """
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            methods = {item.name: item for item in node.body if isinstance(item, ast.FunctionDef)}
+            if any(name in methods for name in ["run", "execute", "backtest", "on_bar"]):
+                init = methods.get("__init__")
+                return _literal_defaults(init.args, skip=1) if init else {}
+    
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name in ["strategy", "run_strategy", "backtest"]:
+            return _literal_defaults(node.args, skip=1)
+    
+    return {}
+
 @router.post("")
 async def upload_strategy(
     file: UploadFile = File(...),
@@ -85,6 +128,7 @@ async def upload_strategy(
         user_id=1,
         name=name or file.filename,
         file_path=file_path,
+        content_hash=bytes_hash(content),
         description=description or ""
     )
     db.add(strategy)
@@ -120,11 +164,18 @@ def get_strategy(strategy_id: int, db: Session = Depends(get_db)):
     if not strategy:
         raise HTTPException(status_code=404, detail="Strategy not found")
     
+    try:
+        with open(strategy.file_path) as f:
+            parameters = extract_strategy_parameters(ast.parse(f.read()))
+    except (OSError, SyntaxError):
+        parameters = {}
+    
     return {
         "id": strategy.id,
         "name": strategy.name,
         "description": strategy.description,
         "file_path": strategy.file_path,
+        "parameters": parameters,
         "created_at": strategy.created_at
     }
 
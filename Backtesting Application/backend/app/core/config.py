@@ -24,6 +24,85 @@ class Settings(BaseSettings):
     DATASET_DIR: str = os.getenv("DATASET_DIR", "/app/datasets")
     RESULTS_DIR: str = os.getenv("RESULTS_DIR", "/app/results")
 
+    # Backtest progress events, streamed to clients by GET /backtests/{id}/events
+    PROGRESS_BROKER: str = os.getenv("PROGRESS_BROKER", "redis")  # redis | memory
+    PROGRESS_INTERVAL_SECONDS: float = 0.5  # between a run's bar progress events
+    PROGRESS_KEEPALIVE_SECONDS: float = 15
+    PROGRESS_EVENT_TTL: int = 24 * 3600
+
+    # Running backtests re-read their status, between engine chunks, at most
+    # this often to notice a cancel request
+    CANCEL_CHECK_SECONDS: float = 1.0
+
+    # Runs each user may have pending at the broker or running, per batch and
+    # sweep lane, and in the interactive lane; further runs wait for dispatch
+    USER_MAX_CONCURRENCY: int = 4
+    USER_MAX_INTERACTIVE_CONCURRENCY: int = 8
+
+    # Batch submissions: backtests queued by one request
+    BATCH_MAX_RUNS: int = 5000
+
+    # Parameter sweeps
+    SWEEP_MAX_COMBINATIONS: int = 10000
+    SWEEP_MAX_CELLS: int = 5_000_000  # bars x combinations simulated per block
+    WALK_FORWARD_MAX_FOLDS: int = 500
+
+    # Portfolio backtests: per-asset strategy runs use a process pool once the
+    # universe has at least PORTFOLIO_POOL_MIN_ASSETS datasets
+    PORTFOLIO_MAX_WORKERS: int = os.cpu_count() or 1
+    PORTFOLIO_POOL_MIN_ASSETS: int = 16
+
+    # Monte Carlo robustness analysis
+    MONTE_CARLO_MAX_PATHS: int = 100_000
+    MONTE_CARLO_MAX_CELLS: int = 2_000_000  # paths x blocks resampled per chunk
+
+    # Identical single backtests (same strategy source, data and settings)
+    # return the stored or in-flight run instead of queueing new work
+    RESULT_CACHE_ENABLED: bool = True
+
+    # Strategy signals cached by strategy source, data and strategy parameters,
+    # shared by workers through RESULTS_DIR
+    SIGNAL_CACHE_ENABLED: bool = True
+    SIGNAL_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+
+    # Equity curves are stored as LTTB views at these point counts; the
+    # smallest is also returned as `equity_curve`
+    EQUITY_CURVE_LEVELS: List[int] = [500, 2000, 10000]
+    EQUITY_MAX_POINTS: int = 100_000
+
+    # Parsed datasets, per worker process
+    DATASET_CACHE_BYTES: int = 512 * 1024 * 1024
+
+    # Datasets get a typed columnar copy at ingest that workers memory-map
+    # instead of parsing the CSV; DATASET_FLOAT32 stores its float columns
+    # in single precision (half the size, less precise prices)
+    DATASET_COLUMNAR: bool = True
+    DATASET_FLOAT32: bool = False
+
+    # Out-of-core backtests: datasets larger than this are read and simulated
+    # in windows of CHUNK_BARS bars, each with CHUNK_WARMUP_BARS earlier bars
+    # in front for indicator warm-up
+    CHUNKED_DATASET_BYTES: int = 2 * 1024 * 1024 * 1024
+    CHUNK_BARS: int = 1_000_000
+    CHUNK_WARMUP_BARS: int = 10_000
+
+    # Strategy sandboxes: pre-forked processes per worker process that run
+    # uploaded strategy code under resource limits, without network access
+    SANDBOX_ENABLED: bool = True
+    SANDBOX_POOL_SIZE: int = 1
+    SANDBOX_MEMORY_BYTES: int = 4 * 1024 * 1024 * 1024
+    SANDBOX_CPU_SECONDS: int = 20 * 60  # per run
+    SANDBOX_WALL_SECONDS: float = 25 * 60  # per run, below the task time limit
+    SANDBOX_MAX_RUNS: int = 200  # runs before a sandbox is replaced
+    SANDBOX_SHM_DIR: str = os.getenv("SANDBOX_SHM_DIR", "/dev/shm")
+    SANDBOX_SHM_CACHE_BYTES: int = 512 * 1024 * 1024  # frames kept exported for later runs
+
+    # Compiled strategy code, per worker process
+    STRATEGY_CODE_CACHE_BYTES: int = 16 * 1024 * 1024
+
+    # Memoized strategy indicators, per worker process
+    INDICATOR_CACHE_BYTES: int = 256 * 1024 * 1024
+
     # CORS
     CORS_ALLOW_ORIGINS: List[str] | str = "*"
 
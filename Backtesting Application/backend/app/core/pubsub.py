@@ -0,0 +1,248 @@
+"""
+Publish/subscribe for backtest progress events.
+
+Workers publish a run's events on its channel and the API streams them to
+clients, so nobody polls the database for status changes. Brokers:
+- redis: Redis pub/sub at REDIS_URL, for workers and API in separate
+  processes (the default)
+- memory: in-process queues, for running tasks eagerly in the API process
+
+Publishing is synchronous, for the workers. Listening is asynchronous, for
+the API's event loop: all of a process's listeners share one subscription,
+whose events are fanned out to each listener's asyncio queue, so a client
+waiting for events holds neither a thread nor a Redis connection.
+
+Pub/sub delivers only to current subscribers, so each channel's latest event
+is also kept (in Redis for PROGRESS_EVENT_TTL seconds) for clients that
+connect mid-run.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import threading
+from typing import AsyncIterator
+
+import redis
+import redis.asyncio
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def progress_channel(backtest_id: int) -> str:
+    return f"quantflow:backtest:{backtest_id}:progress"
+
+
+class Listener:
+    """One client's events of a channel, fed by the shared subscription."""
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue[dict] = asyncio.Queue()
+
+    def put(self, event: dict) -> None:
+        """Queue an event; safe from any thread."""
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+        except RuntimeError:
+            pass  # The listener's event loop has closed
+
+    async def get(self, timeout: float) -> dict | None:
+        """The next event, or None if none arrived within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class PubSub:
+    def publish(self, channel: str, event: dict) -> None:
+        raise NotImplementedError
+
+    def last(self, channel: str) -> dict | None:
+        """The latest event published on the channel, if any."""
+        raise NotImplementedError
+
+    async def last_async(self, channel: str) -> dict | None:
+        """last(), for the event loop."""
+        raise NotImplementedError
+
+    def listen(self, channel: str) -> contextlib.AbstractAsyncContextManager[Listener]:
+        """Async context manager: a Listener receiving the channel's events while open."""
+        raise NotImplementedError
+
+
+class MemoryPubSub(PubSub):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners: dict[str, set[Listener]] = {}
+        self._last: dict[str, dict] = {}
+
+    def publish(self, channel: str, event: dict) -> None:
+        with self._lock:
+            self._last[channel] = event
+            listeners = list(self._listeners.get(channel, ()))
+        for listener in listeners:
+            listener.put(event)
+
+    def last(self, channel: str) -> dict | None:
+        with self._lock:
+            return self._last.get(channel)
+
+    async def last_async(self, channel: str) -> dict | None:
+        return self.last(channel)
+
+    @contextlib.asynccontextmanager
+    async def listen(self, channel: str) -> AsyncIterator[Listener]:
+        listener = Listener(channel)
+        with self._lock:
+            self._listeners.setdefault(channel, set()).add(listener)
+        try:
+            yield listener
+        finally:
+            with self._lock:
+                listeners = self._listeners.get(channel, set())
+                listeners.discard(listener)
+                if not listeners:
+                    self._listeners.pop(channel, None)
+
+
+class _RedisFanout:
+    """
+    The process's one Redis pub/sub connection, on one event loop: subscribed
+    to each channel some listener waits on, and read by a single task that
+    hands each message to the channel's listeners.
+    """
+
+    # Before reconnecting after the connection failed
+    RETRY_SECONDS = 1.0
+
+    def __init__(self, client: redis.asyncio.Redis):
+        self.loop = asyncio.get_running_loop()
+        self._pubsub = client.pubsub()
+        self._lock = asyncio.Lock()
+        self._listeners: dict[str, set[Listener]] = {}
+        self._subscribed: dict[str, asyncio.Event] = {}
+        self._reader: asyncio.Task | None = None
+
+    async def add(self, listener: Listener) -> None:
+        channel = listener.channel
+        async with self._lock:
+            listeners = self._listeners.setdefault(channel, set())
+            listeners.add(listener)
+            if len(listeners) == 1:
+                self._subscribed[channel] = asyncio.Event()
+                await self._pubsub.subscribe(channel)
+            subscribed = self._subscribed[channel]
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read())
+        # Confirmed, so no event published from now on is missed. Unconfirmed
+        # (Redis unreachable), the stream still ends by its database checks
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(subscribed.wait(), settings.PROGRESS_KEEPALIVE_SECONDS)
+
+    async def remove(self, listener: Listener) -> None:
+        channel = listener.channel
+        async with self._lock:
+            listeners = self._listeners.get(channel, set())
+            listeners.discard(listener)
+            if not listeners:
+                self._listeners.pop(channel, None)
+                self._subscribed.pop(channel, None)
+                with contextlib.suppress(redis.RedisError):
+                    await self._pubsub.unsubscribe(channel)
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=None)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Reconnecting, on the next read, subscribes to the channels again
+                logger.warning("Progress subscription failed; reconnecting", exc_info=True)
+                await asyncio.sleep(self.RETRY_SECONDS)
+                continue
+            if message is None:
+                continue
+            channel = message["channel"].decode()
+            if message["type"] == "subscribe":
+                if (subscribed := self._subscribed.get(channel)) is not None:
+                    subscribed.set()
+            elif message["type"] == "message":
+                event = json.loads(message["data"])
+                for listener in list(self._listeners.get(channel, ())):
+                    listener.put(event)
+
+
+class RedisPubSub(PubSub):
+    def __init__(self, url: str, ttl: int):
+        # Bounded waits: an unreachable Redis must not stall the backtests
+        # publishing to it
+        self._client = redis.Redis.from_url(url, socket_connect_timeout=2, socket_timeout=5)
+        self._url = url
+        self._ttl = ttl
+        self._async_client: redis.asyncio.Redis | None = None
+        self._fanout: _RedisFanout | None = None
+
+    @staticmethod
+    def _last_key(channel: str) -> str:
+        return f"{channel}:last"
+
+    def publish(self, channel: str, event: dict) -> None:
+        data = json.dumps(event)
+        # One round trip for both
+        pipeline = self._client.pipeline(transaction=False)
+        pipeline.set(self._last_key(channel), data, ex=self._ttl)
+        pipeline.publish(channel, data)
+        pipeline.execute()
+
+    def last(self, channel: str) -> dict | None:
+        data = self._client.get(self._last_key(channel))
+        return json.loads(data) if data is not None else None
+
+    def _loop_fanout(self) -> _RedisFanout:
+        # Asyncio connections belong to the loop they were opened on
+        if self._fanout is None or self._fanout.loop is not asyncio.get_running_loop():
+            # No socket_timeout: the subscription waits on reads indefinitely
+            self._async_client = redis.asyncio.Redis.from_url(self._url, socket_connect_timeout=2)
+            self._fanout = _RedisFanout(self._async_client)
+        return self._fanout
+
+    async def last_async(self, channel: str) -> dict | None:
+        self._loop_fanout()
+        data = await self._async_client.get(self._last_key(channel))
+        return json.loads(data) if data is not None else None
+
+    @contextlib.asynccontextmanager
+    async def listen(self, channel: str) -> AsyncIterator[Listener]:
+        fanout = self._loop_fanout()
+        listener = Listener(channel)
+        try:
+            await fanout.add(listener)
+            yield listener
+        finally:
+            await fanout.remove(listener)
+
+
+_pubsub: PubSub | None = None
+_pubsub_pid: int | None = None
+
+
+def get_pubsub() -> PubSub:
+    """This process's broker, chosen by PROGRESS_BROKER."""
+    global _pubsub, _pubsub_pid
+    # Redis connections must not be shared with a forked child
+    if _pubsub is None or _pubsub_pid != os.getpid():
+        if settings.PROGRESS_BROKER == "memory":
+            _pubsub = MemoryPubSub()
+        elif settings.PROGRESS_BROKER == "redis":
+            _pubsub = RedisPubSub(settings.REDIS_URL, settings.PROGRESS_EVENT_TTL)
+        else:
+            raise ValueError(f"Unknown PROGRESS_BROKER: {settings.PROGRESS_BROKER}. Expected redis or memory")
+        _pubsub_pid = os.getpid()
+    return _pubsub
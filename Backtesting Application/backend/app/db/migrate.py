@@ -0,0 +1,36 @@
+"""
+Schema migrations, with Alembic (revisions under app/db/migrations),
+applied when the API starts.
+"""
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from app.db.session import engine
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+
+# The schema create_all made before migrations existed
+INITIAL_REVISION = "0001"
+
+
+def alembic_config() -> Config:
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    return config
+
+
+def upgrade_database() -> None:
+    """
+    Migrate the database to the latest revision. One created by create_all
+    before migrations existed is first marked as at the initial revision.
+    """
+    config = alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        tables = inspect(connection).get_table_names()
+        if "backtests" in tables and "alembic_version" not in tables:
+            command.stamp(config, INITIAL_REVISION)
+        command.upgrade(config, "head")
@@ -0,0 +1,45 @@
+"""
+Alembic environment: migrates the database at settings.build_db_uri().
+
+Run at API startup by upgrade_database(), which passes its connection, or
+from backend/ with the alembic command.
+"""
+from alembic import context
+
+from app.db.models import Base
+from app.db.session import engine
+
+target_metadata = Base.metadata
+
+
+def _run(connection) -> None:
+    # Batch operations: SQLite can only alter a table by copying it
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = context.config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with engine.connect() as connection:
+        _run(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
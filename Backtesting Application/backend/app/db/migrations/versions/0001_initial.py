@@ -0,0 +1,72 @@
+"""Initial schema: users, strategies, datasets and backtests
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(length=255), nullable=False, unique=True),
+        sa.Column("hashed_password", sa.String(length=255), nullable=False),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_table(
+        "strategies",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("file_path", sa.String(length=1024), nullable=False),
+        sa.Column("description", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_table(
+        "datasets",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("type", sa.String(length=50), nullable=False),
+        sa.Column("ticker", sa.String(length=50)),
+        sa.Column("file_path", sa.String(length=1024)),
+        sa.Column("interval", sa.String(length=20)),
+        sa.Column("start_date", sa.DateTime()),
+        sa.Column("end_date", sa.DateTime()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_table(
+        "backtests",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("strategy_id", sa.Integer(), sa.ForeignKey("strategies.id")),
+        sa.Column("dataset_id", sa.Integer(), sa.ForeignKey("datasets.id")),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("status", sa.String(length=50), nullable=False),
+        sa.Column("parameters", sa.JSON(), nullable=False),
+        sa.Column("results", sa.JSON()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("started_at", sa.DateTime()),
+        sa.Column("completed_at", sa.DateTime()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("backtests")
+    op.drop_table("datasets")
+    op.drop_table("strategies")
+    op.drop_table("users")
@@ -0,0 +1,31 @@
+"""Backtest modes: single runs and parameter sweeps
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Backtests from before modes are single runs
+    op.add_column(
+        "backtests",
+        sa.Column("mode", sa.String(length=50), nullable=False, server_default="single"),
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("backtests") as batch:
+        batch.drop_column("mode")
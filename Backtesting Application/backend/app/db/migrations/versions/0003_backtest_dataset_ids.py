@@ -0,0 +1,27 @@
+"""Portfolio backtests: the datasets a backtest spans
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("backtests", sa.Column("dataset_ids", sa.JSON()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("backtests") as batch:
+        batch.drop_column("dataset_ids")
@@ -0,0 +1,27 @@
+"""Backtest artifacts: where a backtest's per-bar output is stored
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("backtests", sa.Column("artifact_path", sa.String(1024)))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("backtests") as batch:
+        batch.drop_column("artifact_path")
@@ -0,0 +1,37 @@
+"""Result cache: content hashes, backtest cache keys and task ids
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("strategies", sa.Column("content_hash", sa.String(64)))
+    op.add_column("datasets", sa.Column("content_hash", sa.String(64)))
+    op.add_column("backtests", sa.Column("cache_key", sa.String(64)))
+    op.add_column("backtests", sa.Column("task_id", sa.String(255)))
+    op.create_index("ix_backtests_cache_key", "backtests", ["cache_key"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_backtests_cache_key", table_name="backtests")
+    with op.batch_alter_table("backtests") as batch:
+        batch.drop_column("task_id")
+        batch.drop_column("cache_key")
+    with op.batch_alter_table("datasets") as batch:
+        batch.drop_column("content_hash")
+    with op.batch_alter_table("strategies") as batch:
+        batch.drop_column("content_hash")
@@ -0,0 +1,43 @@
+"""Batch submissions: the backtest_batches table and each run's batch
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "backtest_batches",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("metric", sa.String(50), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    with op.batch_alter_table("backtests") as batch:
+        batch.add_column(sa.Column("batch_id", sa.Integer()))
+        batch.create_foreign_key(
+            "fk_backtests_batch_id_backtest_batches", "backtest_batches", ["batch_id"], ["id"]
+        )
+        batch.create_index("ix_backtests_batch_id", ["batch_id"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("backtests") as batch:
+        batch.drop_index("ix_backtests_batch_id")
+        batch.drop_constraint("fk_backtests_batch_id_backtest_batches", type_="foreignkey")
+        batch.drop_column("batch_id")
+    op.drop_table("backtest_batches")
@@ -0,0 +1,29 @@
+"""Priority lanes: each run's lane and, while queued, its task to send
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("backtests", sa.Column("lane", sa.String(20)))
+    op.add_column("backtests", sa.Column("task_request", sa.JSON()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("backtests") as batch:
+        batch.drop_column("task_request")
+        batch.drop_column("lane")
@@ -0,0 +1,34 @@
+"""Walk-forward folds as runs: each fold's walk-forward
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("backtests") as batch:
+        batch.add_column(sa.Column("parent_id", sa.Integer()))
+        batch.create_foreign_key(
+            "fk_backtests_parent_id_backtests", "backtests", ["parent_id"], ["id"], ondelete="CASCADE"
+        )
+        batch.create_index("ix_backtests_parent_id", ["parent_id"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("backtests") as batch:
+        batch.drop_index("ix_backtests_parent_id")
+        batch.drop_constraint("fk_backtests_parent_id_backtests", type_="foreignkey")
+        batch.drop_column("parent_id")
@@ -0,0 +1,32 @@
+"""Extended backtests: the run each one continues
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("backtests") as batch:
+        batch.add_column(sa.Column("extends_id", sa.Integer()))
+        batch.create_foreign_key(
+            "fk_backtests_extends_id_backtests", "backtests", ["extends_id"], ["id"], ondelete="SET NULL"
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("backtests") as batch:
+        batch.drop_constraint("fk_backtests_extends_id_backtests", type_="foreignkey")
+        batch.drop_column("extends_id")
@@ -0,0 +1,34 @@
+"""Dataset ingestion: each dataset's status, row count and failure reason
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("datasets", sa.Column("rows", sa.Integer()))
+    op.add_column("datasets", sa.Column("status", sa.String(50)))
+    op.add_column("datasets", sa.Column("error", sa.Text()))
+    # Datasets stored before ingestion were parsed at upload; their row
+    # count is left unknown
+    op.execute("UPDATE datasets SET status = 'ready' WHERE status IS NULL")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("datasets") as batch:
+        batch.drop_column("error")
+        batch.drop_column("status")
+        batch.drop_column("rows")
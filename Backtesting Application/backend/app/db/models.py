@@ -1,5 +1,5 @@
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Boolean, Text
 from datetime import datetime
 
 Base = declarative_base()
@@ -18,6 +18,7 @@ class Strategy(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     name = Column(String(255), nullable=False)
     file_path = Column(String(1024), nullable=False)
+    content_hash = Column(String(64))  # blake2b of the source file
     description = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -29,9 +30,21 @@ class Dataset(Base):
     type = Column(String(50), nullable=False)  # uploaded | yfinance
     ticker = Column(String(50))
     file_path = Column(String(1024))
+    content_hash = Column(String(64))  # blake2b of the data file
     interval = Column(String(20))
     start_date = Column(DateTime)
     end_date = Column(DateTime)
+    rows = Column(Integer)
+    status = Column(String(50), default="ready")  # ingesting | ready | failed
+    error = Column(Text)  # why ingestion failed
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class BacktestBatch(Base):
+    __tablename__ = "backtest_batches"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    name = Column(String(255), nullable=False)
+    metric = Column(String(50), nullable=False)  # default leaderboard ranking
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class Backtest(Base):
@@ -40,10 +53,22 @@ class Backtest(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     strategy_id = Column(Integer, ForeignKey("strategies.id"))
     dataset_id = Column(Integer, ForeignKey("datasets.id"))
+    dataset_ids = Column(JSON)  # portfolio backtests span several datasets
+    batch_id = Column(Integer, ForeignKey("backtest_batches.id"), index=True)
+    parent_id = Column(Integer, ForeignKey("backtests.id", ondelete="CASCADE"), index=True)  # walk-forward of a fold, backtest of a Monte Carlo run
+    extends_id = Column(Integer, ForeignKey("backtests.id", ondelete="SET NULL"))  # run continued by this one
     name = Column(String(255), nullable=False)
+    mode = Column(String(50), nullable=False, default="single")  # single | sweep | walk_forward | walk_forward_fold | portfolio | monte_carlo
+    # queued (held for fair-share dispatch) | pending (sent to a worker) | running | cancelling
+    # | completed | failed | cancelled
     status = Column(String(50), nullable=False, default="pending")
+    lane = Column(String(20))  # interactive | batch | sweep
+    task_request = Column(JSON)  # queued runs: {"name", "args"}, args between the id and the config
+    cache_key = Column(String(64), index=True)  # identical runs share a key
+    task_id = Column(String(255))
     parameters = Column(JSON, nullable=False)
-    results = Column(JSON)
+    results = Column(JSON)  # summary metrics; per-bar output lives in the artifact
+    artifact_path = Column(String(1024))  # .npz under RESULTS_DIR
     created_at = Column(DateTime, default=datetime.utcnow)
     started_at = Column(DateTime)
     completed_at = Column(DateTime)
@@ -0,0 +1,178 @@
+"""
+Backtest artifacts: the full per-bar output of a run, stored as a compressed
+.npz file under RESULTS_DIR.
+
+The database row keeps the summary metrics and the artifact's path; equity,
+returns, positions, trades and the precomputed chart levels live in the
+artifact, one array per member. Members are decompressed on access, so an
+endpoint that reads the returns never touches the trade ledger.
+
+Member names:
+- equity, returns, cash, units, target, commissions, timestamps: per bar
+  (units and target are (bars, assets) for portfolio backtests)
+- trade_<field>: the columnar trade ledger (see app.engine.trades)
+- lttb_<points>: bar indices of the equity curve's LTTB view at that size,
+  with its equity (lttb_equity_<points>) and, if the run has timestamps, its
+  timestamps (lttb_timestamps_<points>), so a view is served without
+  reading the per-bar members
+- resume_state: JSON checkpoint a vectorized run can be continued from over
+  bars appended to its dataset (see app.engine.chunked.Checkpoint)
+
+Strategy signals are cached alongside, one .npy file per signal cache key
+under RESULTS_DIR/signals, so a backtest that only changes cost or
+portfolio settings skips running the strategy. The signal cache is pruned
+least recently used first once it outgrows SIGNAL_CACHE_MAX_BYTES.
+"""
+import os
+import shutil
+import zipfile
+import zlib
+
+import numpy as np
+
+from app.core.config import settings
+
+TRADE_PREFIX = "trade_"
+LEVEL_PREFIX = "lttb_"
+LEVEL_EQUITY_PREFIX = "lttb_equity_"
+LEVEL_TIME_PREFIX = "lttb_timestamps_"
+RESUME_MEMBER = "resume_state"
+
+# Members whose leading bytes deflate to more than this fraction of their size
+# (equity and returns: float noise) are stored uncompressed
+_STORE_RATIO = 0.9
+_SAMPLE_BYTES = 1 << 16
+
+
+def artifact_path(backtest_id: int) -> str:
+    return os.path.join(settings.RESULTS_DIR, f"backtest_{backtest_id}.npz")
+
+
+def _compression(values: np.ndarray) -> int:
+    sample = values.reshape(-1)[: _SAMPLE_BYTES // max(values.itemsize, 1)].tobytes()
+    if len(zlib.compress(sample, 1)) > _STORE_RATIO * len(sample):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def save_artifact(path: str, arrays: dict[str, np.ndarray]) -> str:
+    """
+    Write arrays to path atomically as an .npz np.load can read; returns the
+    path. Members are deflated at the fastest level, or stored when a sample
+    shows they would barely shrink.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with zipfile.ZipFile(tmp_path, "w", compresslevel=1, allowZip64=True) as archive:
+        for name, values in arrays.items():
+            values = np.ascontiguousarray(values)
+            # Object arrays would need pickling to load; store them as strings
+            if values.dtype == object:
+                values = values.astype(str)
+            # Members opened by name take the archive's current compression
+            archive.compression = _compression(values)
+            with archive.open(f"{name}.npy", "w", force_zip64=True) as member:
+                np.lib.format.write_array(member, values, allow_pickle=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def artifact_fields(path: str) -> list[str]:
+    with np.load(path) as artifact:
+        return list(artifact.files)
+
+
+def load_artifact(path: str, fields: list[str]) -> dict[str, np.ndarray]:
+    """Read the named members; names missing from the artifact are skipped."""
+    with np.load(path) as artifact:
+        return {name: artifact[name] for name in fields if name in artifact.files}
+
+
+def copy_member(path: str, name: str, out) -> np.dtype | None:
+    """
+    Append a member's raw array data to the binary file `out`, decompressed a
+    block at a time; returns its dtype, or None if the artifact lacks it.
+    """
+    with zipfile.ZipFile(path) as archive:
+        if f"{name}.npy" not in archive.namelist():
+            return None
+        with archive.open(f"{name}.npy") as member:
+            version = np.lib.format.read_magic(member)
+            if version == (1, 0):
+                _, _, dtype = np.lib.format.read_array_header_1_0(member)
+            else:
+                _, _, dtype = np.lib.format.read_array_header_2_0(member)
+            shutil.copyfileobj(member, out, 1 << 20)
+    return dtype
+
+
+def load_trades(path: str) -> dict[str, np.ndarray]:
+    with np.load(path) as artifact:
+        return {
+            name[len(TRADE_PREFIX):]: artifact[name]
+            for name in artifact.files
+            if name.startswith(TRADE_PREFIX)
+        }
+
+
+def equity_level_sizes(fields: list[str]) -> list[int]:
+    return sorted(
+        int(name[len(LEVEL_PREFIX):])
+        for name in fields
+        if name.startswith(LEVEL_PREFIX) and name[len(LEVEL_PREFIX):].isdigit()
+    )
+
+
+def _signal_dir() -> str:
+    return os.path.join(settings.RESULTS_DIR, "signals")
+
+
+def load_signals(key: str) -> np.ndarray | None:
+    path = os.path.join(_signal_dir(), f"{key}.npy")
+    try:
+        signals = np.load(path)
+    except (FileNotFoundError, ValueError):
+        return None
+    # Hits refresh the modification time that pruning orders by
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass  # Pruned by another worker since it was read
+    return signals
+
+
+def save_signals(key: str, signals: np.ndarray) -> None:
+    directory = _signal_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{key}.npy")
+    # Per-process temporary name: workers may cache the same key at once
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.asarray(signals, dtype=np.float64))
+    os.replace(tmp_path, path)
+    _prune_signals(directory, settings.SIGNAL_CACHE_MAX_BYTES)
+
+
+def _prune_signals(directory: str, max_bytes: int) -> None:
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".npy"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # Pruned by another worker
+        total -= size
+
+
+def delete_artifact(path: str | None) -> None:
+    if path and os.path.exists(path):
+        os.remove(path)
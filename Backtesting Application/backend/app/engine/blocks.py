@@ -0,0 +1,30 @@
+"""
+Blockwise passes over per-bar arrays that may not fit in memory, such as the
+memory-mapped output of a chunked backtest. Each pass holds one block of
+BLOCK_BARS bars at a time and returns what a whole-array expression would,
+bit for bit.
+"""
+import numpy as np
+
+BLOCK_BARS = 1 << 20
+
+
+def prefix_sums(values: np.ndarray, positions: np.ndarray, squared: bool = False) -> np.ndarray:
+    """
+    sum(values[:p]) (of squares if `squared`) at each position p, equal to
+    indexing np.concatenate([[0.0], np.cumsum(values)]) without building it.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    sums = np.zeros(len(positions))
+    n = len(values)
+    total = 0.0
+    for start in range(0, max(n, 1), BLOCK_BARS):
+        block = np.asarray(values[start:start + BLOCK_BARS], dtype=np.float64)
+        if squared:
+            block = block * block
+        # Carry the running total in front, so the block adds on in order
+        cumulative = np.cumsum(np.concatenate([[total], block]))
+        inside = (positions >= start) & (positions <= start + len(block))
+        sums[inside] = cumulative[positions[inside] - start]
+        total = cumulative[-1]
+    return sums
@@ -0,0 +1,315 @@
+"""
+Out-of-core backtests for datasets larger than a worker's memory.
+
+The dataset is read in windows of chunk_bars rows. Each window is handed to
+the strategy with the last warmup_bars rows of the one before in front, so
+rolling indicators start warm, and only the window's own bars are traded.
+The account (position, holding period, equity), the trade ledger and the
+metrics carry from one window to the next (see simulate_window, TradeLedger
+and MetricsAccumulator), and the per-bar output is appended to files on
+disk and read back memory-mapped. Peak memory therefore follows the window
+size, not the dataset size.
+
+Results equal an in-memory run bit for bit when each signal depends on at
+most warmup_bars earlier bars (rolling windows, crossovers); summed metrics
+can differ in the last digits. Strategies whose signals depend on the whole
+history (expanding statistics, long exponential averages) can differ near
+the start of each window and need a longer warm-up. So can indicators whose
+rounding depends on where their input starts (rolling_std centres on the
+first price), on prices that move by orders of magnitude.
+
+A run can also continue from a Checkpoint over rows appended to its dataset
+since: it reads only the new rows, with the warm-up rows before them, and
+starts from the saved account, ledger and metrics state.
+"""
+import json
+import os
+from dataclasses import dataclass, fields
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from app.engine.artifacts import RESUME_MEMBER, copy_member, load_artifact, load_trades
+from app.engine.data import date_index, date_mask, find_date_column, iter_dataset, read_rows, tail_offset
+from app.engine.fingerprint import file_hash
+from app.engine.metrics import MetricsAccumulator
+from app.engine.simulator import SimulationCarry, signals_to_target, simulate_window, start_carry
+from app.engine.trades import TradeLedger
+
+# Per-bar output written for each window, as in an in-memory backtest's artifact
+OUTPUT_FIELDS = ["equity", "returns", "cash", "units", "target", "commissions"]
+
+
+@dataclass
+class Checkpoint:
+    """
+    Where a vectorized run stopped, kept in its artifact so the run can
+    continue over rows appended to its dataset later: the dataset bytes run
+    (their length and hash), the byte offset of the warm-up rows at their
+    end, the hash of the strategy run, and the account, trade ledger and
+    metrics state after the last bar.
+    """
+    bars: int
+    data_bytes: int
+    data_hash: str
+    warmup_offset: int
+    strategy_hash: str
+    carry: SimulationCarry
+    ledger: dict  # TradeLedger.state()
+    metrics: dict  # MetricsAccumulator.state()
+
+    def to_json(self) -> str:
+        state = {field.name: getattr(self, field.name) for field in fields(self)}
+        state["carry"] = {name: np.asarray(value).tolist() for name, value in vars(self.carry).items()}
+        return json.dumps(state)
+
+    @classmethod
+    def from_json(cls, text: str) -> "Checkpoint":
+        state = json.loads(text)
+        state["carry"] = SimulationCarry(**{
+            name: np.asarray(value, dtype=np.float64) for name, value in state["carry"].items()
+        })
+        return cls(**state)
+
+    @classmethod
+    def load(cls, artifact: str) -> "Checkpoint | None":
+        """The checkpoint kept in an artifact, if the run saved one."""
+        member = load_artifact(artifact, [RESUME_MEMBER]).get(RESUME_MEMBER)
+        return None if member is None else cls.from_json(member.item())
+
+    @classmethod
+    def after(
+        cls,
+        dataset_path: str,
+        data_bytes: int,
+        strategy_hash: str,
+        warmup_bars: int,
+        bars: int,
+        carry: SimulationCarry,
+        ledger: TradeLedger,
+        accumulator: MetricsAccumulator,
+    ) -> "Checkpoint":
+        """Checkpoint of a run over the first `data_bytes` bytes of the dataset."""
+        return cls(
+            bars=bars,
+            data_bytes=data_bytes,
+            data_hash=file_hash(dataset_path, data_bytes),
+            warmup_offset=tail_offset(dataset_path, data_bytes, warmup_bars),
+            strategy_hash=strategy_hash,
+            carry=carry,
+            ledger=ledger.state(),
+            metrics=accumulator.state(),
+        )
+
+    def matches(self, dataset_path: str) -> bool:
+        """Whether the dataset still starts with the bytes the run read."""
+        return (
+            os.path.getsize(dataset_path) >= self.data_bytes
+            and file_hash(dataset_path, self.data_bytes) == self.data_hash
+        )
+
+
+@dataclass
+class ChunkedResult:
+    bars: int
+    arrays: dict[str, np.ndarray]  # per-bar output, memory-mapped
+    trades: dict[str, np.ndarray]
+    metrics: dict
+    periods_per_year: float  # the metrics' annualization
+    # State after the last bar, for a Checkpoint
+    carry: SimulationCarry
+    ledger: TradeLedger
+    accumulator: MetricsAccumulator
+
+
+class _ColumnFiles:
+    """Per-bar arrays appended window by window to raw files in `directory`."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._files = {}
+        self._dtypes = {}
+
+    def append(self, name: str, values: np.ndarray) -> None:
+        if name not in self._files:
+            self._files[name] = open(os.path.join(self.directory, f"{name}.bin"), "wb")
+            self._dtypes[name] = values.dtype
+        np.ascontiguousarray(values, dtype=self._dtypes[name]).tofile(self._files[name])
+
+    def copy_from(self, artifact: str, names: list[str]) -> None:
+        """Start the files with an artifact's members of the same names."""
+        for name in names:
+            f = open(os.path.join(self.directory, f"{name}.bin"), "wb")
+            dtype = copy_member(artifact, name, f)
+            if dtype is None:
+                f.close()
+                continue
+            self._files[name] = f
+            self._dtypes[name] = dtype
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        """Close the files and map them back read-only."""
+        self.close()
+        arrays = {}
+        for name, f in self._files.items():
+            dtype = self._dtypes[name]
+            if os.path.getsize(f.name) == 0:
+                arrays[name] = np.zeros(0, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(f.name, dtype=dtype, mode="r")
+        return arrays
+
+
+def run_chunked(
+    dataset_path: str,
+    strategy_signals: Callable[[pd.DataFrame], np.ndarray],
+    output_dir: str,
+    initial_capital: float,
+    commission: float,
+    signal_mode: str = "hold",
+    chunk_bars: int = 1_000_000,
+    warmup_bars: int = 0,
+    check: Callable[[], None] | None = None,
+    progress: Callable[[int, float, dict], None] | None = None,
+    periods_per_year: float | None = None,
+    resume: Checkpoint | None = None,
+    resume_artifact: str | None = None,
+    start_date: str | None = None,
+    end_date: str | None = None,
+) -> ChunkedResult:
+    """
+    Backtest `strategy_signals` over a CSV dataset read in windows.
+
+    `strategy_signals` takes a window in the engine's lowercase layout
+    (warm-up rows first, index from 0) and returns one signal per row.
+    Per-bar output files go in `output_dir`, which the caller removes once
+    done with the result. `check` is called after every window and may
+    raise to stop the run; `progress` gets the bars run, the fraction of
+    the file read and the metrics so far. Without `periods_per_year`,
+    metrics are annualized by the bars per year the dataset's dates imply.
+
+    With `resume`, the run continues from that checkpoint over the rows
+    appended since, and `resume_artifact` (the checkpointed run's artifact)
+    supplies the bars and trades before them. The caller checks that the
+    checkpoint matches the dataset.
+
+    With `start_date`/`end_date`, only bars dated in that range are traded,
+    with the rows before it as warm-up. A date index lets the run seek to
+    the range instead of reading the file from the start.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    columns = _ColumnFiles(output_dir)
+    ledger = TradeLedger()
+    accumulator = MetricsAccumulator(initial_capital, periods_per_year)
+    carry = None
+    target_before = 0.0
+    warmup = None
+    bars = 0
+    start = 0
+    if resume is not None:
+        ledger = TradeLedger.from_state(resume.ledger)
+        accumulator = MetricsAccumulator.from_state(resume.metrics)
+        carry = resume.carry
+        target_before = carry.target
+        bars = resume.bars
+        start = resume.data_bytes
+        warmup = read_rows(dataset_path, resume.warmup_offset, resume.data_bytes)
+        warmup = warmup.iloc[max(len(warmup) - warmup_bars, 0):] if warmup_bars and len(warmup) else None
+    dated = start_date is not None or end_date is not None
+    if dated and resume is None:
+        index = date_index(dataset_path)
+        start = index.start_offset(start_date, warmup_bars) if index is not None else 0
+    finished = False
+
+    try:
+        if resume_artifact is not None:
+            columns.copy_from(resume_artifact, OUTPUT_FIELDS + ["timestamps"])
+        for chunk, fraction in iter_dataset(dataset_path, chunk_bars, start):
+            if dated:
+                date_col = find_date_column(chunk)
+                if date_col is None:
+                    raise ValueError("The dataset has no date column to select a date range from")
+                before, after = date_mask(chunk[date_col], start_date, end_date)
+                if warmup_bars and before.any():
+                    warmup = pd.concat([warmup, chunk[before]], ignore_index=True).iloc[-warmup_bars:]
+                # Dates are sorted: no later row is in range
+                finished = bool(after.any())
+                chunk = chunk[~before & ~after]
+            if chunk.empty:
+                if finished:
+                    break
+                continue  # Only blank lines, or rows before the range
+            chunk = chunk.reset_index(drop=True)
+            window = chunk if warmup is None else pd.concat([warmup, chunk], ignore_index=True)
+            lead = len(window) - len(chunk)
+            signals = np.asarray(strategy_signals(window), dtype=np.float64)[lead:]
+
+            close = chunk['close'].to_numpy(dtype=np.float64)
+            if carry is None:
+                carry = start_carry(close[0], initial_capital)
+            target = signals_to_target(signals, signal_mode, target_before)
+            sim, carry = simulate_window(close, target, initial_capital, commission, carry)
+            target_before = target[-1]
+
+            date_col = find_date_column(chunk)
+            timestamps = chunk[date_col].to_numpy() if date_col is not None else None
+            ledger.add(
+                close,
+                sim.units,
+                sim.commissions,
+                high=chunk['high'].to_numpy(dtype=np.float64) if 'high' in chunk.columns else None,
+                low=chunk['low'].to_numpy(dtype=np.float64) if 'low' in chunk.columns else None,
+                timestamps=timestamps,
+            )
+            accumulator.add(sim, close, chunk[date_col] if date_col is not None else None)
+            for name in OUTPUT_FIELDS:
+                columns.append(name, getattr(sim, name))
+            if timestamps is not None:
+                columns.append("timestamps", timestamps)
+
+            bars += len(chunk)
+            # A copy, so the window itself can be freed
+            warmup = window.iloc[max(len(window) - warmup_bars, 0):].copy() if warmup_bars else None
+            if check is not None:
+                check()
+            if progress is not None:
+                progress(bars, fraction, accumulator.metrics())
+            if finished:
+                break
+    finally:
+        columns.close()
+
+    if bars == 0:
+        raise ValueError("The dataset has no bars in the date range" if dated else "Dataset has no rows")
+    trades = ledger.trades()
+    if resume_artifact is not None:
+        trades = _after_closed_trades(load_trades(resume_artifact), trades)
+    return ChunkedResult(
+        bars=bars,
+        arrays=columns.arrays(),
+        trades=trades,
+        metrics=accumulator.metrics(),
+        carry=carry,
+        ledger=ledger,
+        accumulator=accumulator,
+        periods_per_year=accumulator.annualization(),
+    )
+
+
+def _after_closed_trades(before: dict[str, np.ndarray], after: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """
+    A resumed run's ledger: the trades closed before the checkpoint, then the
+    ledger since (which carries the trade that was open at the checkpoint).
+    """
+    if "open" not in before:
+        return after
+    closed = ~before["open"]
+    return {
+        name: np.concatenate([before[name][closed], values]) if name in before else values
+        for name, values in after.items()
+    }
@@ -0,0 +1,173 @@
+"""
+Typed columnar copies of CSV datasets, memory-mapped instead of parsed.
+
+A dataset's copy holds each column of the engine frame (lowercase names,
+as load_dataset() returns it) as a raw binary file, with a JSON file
+describing them, under <dataset>.columns/<version>. The version names the
+CSV's size and modification time and the storage precision, so a copy is
+only used while its CSV is unchanged; an outdated one is replaced on the
+next conversion. Dates are stored as int64 nanoseconds since the epoch in
+UTC, with the dataset's time zone in the metadata.
+
+Loading maps the files read-only: it costs about as much as reading the
+metadata, and workers on one host share the pages. Datasets with text
+columns (other than the date) are not converted and are parsed as before.
+
+With DATASET_FLOAT32, float columns are stored in single precision, which
+halves the copy and the memory its pages take at the cost of precision.
+Runs that read the CSV itself (chunked runs resuming mid-file or starting
+at a date, and extended runs) still see double precision.
+"""
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+
+_META = "columns.json"
+
+
+@dataclass
+class ColumnarDataset:
+    frame: pd.DataFrame  # engine frame over the mapped files
+    dates: np.ndarray | None  # datetime64[ns] in UTC, mapped
+    sorted: bool  # dates ascending, none missing
+
+
+def columnar_dir(dataset_path: str) -> str:
+    return f"{dataset_path}.columns"
+
+
+def _version(stat: os.stat_result) -> str:
+    precision = "f32" if settings.DATASET_FLOAT32 else "f64"
+    return f"{stat.st_size}-{stat.st_mtime_ns}-{precision}"
+
+
+def write_columnar(
+    dataset_path: str, stat: os.stat_result, frames: Iterable[pd.DataFrame], date_col: str | None
+) -> bool:
+    """
+    Write the columnar copy of the CSV as it was at `stat`, from its engine
+    frame in consecutive parts. False (and nothing written) if a column holds
+    text or changes type between parts.
+    """
+    root = columnar_dir(dataset_path)
+    os.makedirs(root, exist_ok=True)
+    # Per-process temporary directory: workers may convert the same file at once
+    tmp = os.path.join(root, f"tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        meta = _write_parts(tmp, frames, date_col)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    if meta is None:
+        shutil.rmtree(tmp, ignore_errors=True)
+        return False
+    with open(os.path.join(tmp, _META), "w") as f:
+        json.dump(meta, f)
+
+    try:
+        os.rename(tmp, os.path.join(root, _version(stat)))
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)  # Written by another worker meanwhile
+    # Copies of earlier versions of the file
+    for entry in os.scandir(root):
+        size, _, rest = entry.name.partition("-")
+        mtime = rest.partition("-")[0]
+        if size.isdigit() and mtime.isdigit() and int(mtime) < stat.st_mtime_ns:
+            shutil.rmtree(entry.path, ignore_errors=True)
+    return True
+
+
+def _write_parts(directory: str, frames: Iterable[pd.DataFrame], date_col: str | None) -> dict | None:
+    """Append each part's columns to the files in `directory`; returns the metadata, or None if unstorable."""
+    files, columns = [], []
+    tz = None
+    rows = 0
+    ordered, last = True, None
+    try:
+        for frame in frames:
+            if not files:
+                for i, name in enumerate(frame.columns):
+                    files.append(open(os.path.join(directory, f"{i}.bin"), "wb"))
+                    columns.append({"name": name, "dtype": None})
+            elif list(frame.columns) != [column["name"] for column in columns]:
+                return None
+            for f, column in zip(files, columns):
+                values = frame[column["name"]]
+                if column["name"] == date_col:
+                    if not pd.api.types.is_datetime64_any_dtype(values):
+                        return None  # Mixed time zones or unparsed dates
+                    part_tz = getattr(values.dtype, "tz", None)
+                    if column["dtype"] is not None and str(part_tz) != str(tz):
+                        return None
+                    tz = part_tz
+                    if part_tz is not None:
+                        values = values.dt.tz_convert("UTC").dt.tz_localize(None)
+                    values = values.to_numpy(dtype="datetime64[ns]").view(np.int64)
+                    if len(values):
+                        missing = values == np.iinfo(np.int64).min
+                        ordered = ordered and not missing.any() and bool(np.all(np.diff(values) >= 0))
+                        ordered = ordered and (last is None or bool(values[0] >= last))
+                        last = values[-1]
+                    column["dtype"] = "<i8"
+                elif values.dtype.kind in "biuf":
+                    values = values.to_numpy()
+                    if settings.DATASET_FLOAT32 and values.dtype == np.float64:
+                        values = values.astype(np.float32)
+                    if column["dtype"] is None:
+                        column["dtype"] = values.dtype.str
+                    elif not np.can_cast(values.dtype, np.dtype(column["dtype"]), "safe"):
+                        return None
+                else:
+                    return None
+                np.ascontiguousarray(values, dtype=np.dtype(column["dtype"])).tofile(f)
+            rows += len(frame)
+    finally:
+        for f in files:
+            f.close()
+    if not files:
+        return None
+    return {
+        "columns": columns,
+        "date_column": date_col,
+        "tz": str(tz) if tz is not None else None,
+        "rows": rows,
+        "sorted": date_col is not None and rows > 0 and ordered,
+    }
+
+
+def load_columnar(dataset_path: str, stat: os.stat_result | None = None) -> ColumnarDataset | None:
+    """The dataset's columnar copy, mapped read-only; None if it has no current one."""
+    stat = stat or os.stat(dataset_path)
+    directory = os.path.join(columnar_dir(dataset_path), _version(stat))
+    try:
+        with open(os.path.join(directory, _META)) as f:
+            meta = json.load(f)
+    except (FileNotFoundError, NotADirectoryError, ValueError):
+        return None
+
+    columns = {}
+    dates = None
+    for i, column in enumerate(meta["columns"]):
+        dtype = np.dtype(column["dtype"])
+        path = os.path.join(directory, f"{i}.bin")
+        # Empty files cannot be mapped; plain arrays over the map, not np.memmap
+        values = np.memmap(path, dtype=dtype, mode="r").view(np.ndarray) if meta["rows"] else np.zeros(0, dtype=dtype)
+        if column["name"] == meta["date_column"]:
+            values = dates = values.view("datetime64[ns]")
+            if meta["tz"] is not None:
+                values = pd.Series(values).dt.tz_localize("UTC").dt.tz_convert(meta["tz"])
+        columns[column["name"]] = values
+    return ColumnarDataset(pd.DataFrame(columns, copy=False), dates, meta["sorted"])
+
+
+def delete_columnar(dataset_path: str) -> None:
+    shutil.rmtree(columnar_dir(dataset_path), ignore_errors=True)
@@ -0,0 +1,534 @@
+import csv
+import hashlib
+import io
+import logging
+import os
+import weakref
+from dataclasses import dataclass
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.engine.cache import LRUCache
+from app.engine.columnar import load_columnar, write_columnar
+from app.engine.indicators import forget_source, register_source
+
+logger = logging.getLogger(__name__)
+
+DATE_COLUMNS = ["date", "datetime", "timestamp"]
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# Rows per date index entry
+DATE_INDEX_STRIDE = 4096
+
+_TAIL_BLOCK_BYTES = 1 << 20
+# Rows parsed at a time when checking rows to append, and bytes copied at a
+# time when appending them
+_APPEND_ROWS = 1_000_000
+_APPEND_BLOCK_BYTES = 1 << 20
+_SCAN_BLOCK_BYTES = 1 << 24
+# Rows parsed at a time when converting a dataset to its columnar copy
+_CONVERT_ROWS = 1_000_000
+
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+# Parsed datasets, per worker process, keyed by file path, mtime and size
+_datasets = LRUCache(settings.DATASET_CACHE_BYTES, sizeof=_frame_bytes)
+
+
+def dataset_cache_stats() -> dict:
+    return _datasets.stats()
+
+
+def load_dataset(dataset_path: str) -> pd.DataFrame:
+    """
+    Load a CSV dataset with lowercase column names.
+
+    The first date-like column (date/datetime/timestamp) is parsed to datetime
+    so the engine can stamp fills and trades with real timestamps.
+
+    With DATASET_COLUMNAR, the frame maps the dataset's columnar copy (see
+    app.engine.columnar) instead of parsing the CSV; datasets stored before
+    ingest wrote copies get one on first load.
+
+    Frames are cached per process until the file's mtime or size changes,
+    so tasks on the same file share one frame: like every engine frame it
+    must not be modified (mapped columns are read-only).
+    """
+    stat = os.stat(dataset_path)
+    key = (os.path.realpath(dataset_path), stat.st_mtime_ns, stat.st_size)
+    return _datasets.get_or_compute(key, lambda: _parse_dataset(dataset_path, stat))
+
+
+def _parse_dataset(dataset_path: str, stat: os.stat_result) -> pd.DataFrame:
+    if not settings.DATASET_COLUMNAR:
+        return _normalize(pd.read_csv(dataset_path))
+    columnar = load_columnar(dataset_path, stat)
+    if columnar is None:
+        df = _normalize(pd.read_csv(dataset_path))
+        try:
+            if not write_columnar(dataset_path, stat, [df], find_date_column(df)):
+                return df
+        except OSError:
+            logger.warning("Could not write the columnar copy of %s", dataset_path, exc_info=True)
+            return df
+        columnar = load_columnar(dataset_path, stat)
+    return columnar.frame
+
+
+def convert_dataset(dataset_path: str) -> bool:
+    """
+    Write the dataset's columnar copy, parsing the CSV a part at a time;
+    False if it cannot have one (see app.engine.columnar).
+    """
+    stat = os.stat(dataset_path)
+    if load_columnar(dataset_path, stat) is not None:
+        return True
+    names = [name.lower() for name in _header(dataset_path)]
+    date_col = next((name for name in names if name in DATE_COLUMNS), None)
+    parts = (chunk for chunk, _ in _read_csv_parts(dataset_path, _CONVERT_ROWS))
+    return write_columnar(dataset_path, stat, parts, date_col)
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [col.lower() for col in df.columns]
+
+    date_col = find_date_column(df)
+    if date_col is not None:
+        df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
+
+    return df
+
+
+def count_rows(dataset_path: str) -> int:
+    """
+    Number of rows load_dataset would return, counted from the file's
+    non-blank lines (less the header) without parsing them.
+    """
+    with open(dataset_path, "rb") as f:
+        return max(sum(1 for line in f if line.strip()) - 1, 0)
+
+
+def iter_dataset(dataset_path: str, chunk_bars: int, start: int = 0) -> Iterator[tuple[pd.DataFrame, float]]:
+    """
+    Read a CSV dataset in frames of up to `chunk_bars` rows, parsed like
+    load_dataset() (with an index counting from the first row read), for
+    datasets too large to hold in memory. `start` is the byte offset of the
+    first row to read; 0 reads from the header. Each frame comes with the
+    fraction of the rows after `start` read so far. Frames are not cached.
+    """
+    if not start and settings.DATASET_COLUMNAR and (columnar := load_columnar(dataset_path)) is not None:
+        # Slices of the mapped copy: nothing to parse
+        frame = columnar.frame
+        for begin in range(0, len(frame), chunk_bars):
+            yield frame.iloc[begin:begin + chunk_bars].reset_index(drop=True), min((begin + chunk_bars) / len(frame), 1.0)
+        return
+    yield from _read_csv_parts(dataset_path, chunk_bars, start)
+
+
+def _read_csv_parts(dataset_path: str, chunk_bars: int, start: int = 0) -> Iterator[tuple[pd.DataFrame, float]]:
+    size = os.path.getsize(dataset_path)
+    names = _header(dataset_path) if start else None
+    with open(dataset_path, "rb") as f:
+        if start and start >= size:
+            return
+        f.seek(start)
+        reader = pd.read_csv(f, chunksize=chunk_bars, header=None if names else "infer", names=names)
+        for chunk in reader:
+            # The reader buffers ahead, so the position runs early by a block
+            yield _normalize(chunk), min((f.tell() - start) / max(size - start, 1), 1.0)
+
+
+def read_rows(dataset_path: str, start: int, stop: int) -> pd.DataFrame:
+    """The rows between byte offsets `start` and `stop`, parsed like load_dataset()."""
+    with open(dataset_path, "rb") as f:
+        f.seek(start)
+        content = f.read(max(stop - start, 0))
+    names = _header(dataset_path)
+    if not content.strip():
+        return _normalize(pd.DataFrame(columns=names))
+    return _normalize(pd.read_csv(io.BytesIO(content), header=None, names=names))
+
+
+def _header(dataset_path: str) -> list[str]:
+    with open(dataset_path, newline="") as f:
+        return next(csv.reader([f.readline()]))
+
+
+def tail_offset(dataset_path: str, end: int, rows: int) -> int:
+    """
+    Byte offset where the last `rows` rows before byte `end` start (at the
+    earliest, the first row after the header).
+    """
+    if rows <= 0:
+        return end
+    with open(dataset_path, "rb") as f:
+        first_row = len(f.readline())
+        if end <= first_row:
+            return first_row
+        f.seek(end - 1)
+        # A final newline ends the last row rather than starting another
+        wanted = rows + (f.read(1) == b"\n")
+        seen = 0
+        stop = end
+        while stop > first_row:
+            begin = max(stop - _TAIL_BLOCK_BYTES, first_row)
+            f.seek(begin)
+            block = f.read(stop - begin)
+            position = len(block)
+            while (position := block.rfind(b"\n", 0, position)) >= 0:
+                seen += 1
+                if seen == wanted:
+                    return begin + position + 1
+            stop = begin
+    return first_row
+
+
+@dataclass
+class AppendedRows:
+    rows: int
+    end_date: pd.Timestamp | None  # last appended date, if the rows have dates
+
+
+def append_rows(dataset_path: str, source_path: str) -> AppendedRows:
+    """
+    Append the rows of the CSV file at `source_path`, which must have the
+    dataset's header and, if the dataset has dates, start after its last
+    one. The rows are checked a part at a time, then written to the end of
+    the dataset in place; if writing fails, the dataset is truncated back.
+    Runs reading the dataset meanwhile may see some of the new rows, and
+    then find it changed when they compare its file_snapshot().
+    """
+    names = _header(dataset_path)
+    if _header(source_path) != names:
+        raise ValueError(f"Appended rows must have the dataset's columns: {names}")
+
+    size = os.path.getsize(dataset_path)
+    rows = 0
+    end_date = None
+    for chunk in pd.read_csv(source_path, chunksize=_APPEND_ROWS):
+        chunk = _normalize(chunk)
+        date_col = find_date_column(chunk)
+        if date_col is not None and rows == 0 and len(chunk):
+            last = read_rows(dataset_path, tail_offset(dataset_path, size, 1), size)
+            try:
+                overlaps = len(last) > 0 and chunk[date_col].iloc[0] <= last[date_col].iloc[-1]
+            except TypeError:
+                raise ValueError("Appended dates must be in the dataset's date format") from None
+            if overlaps:
+                raise ValueError(f"Appended rows must start after the dataset's last date, {last[date_col].iloc[-1]}")
+        if date_col is not None and chunk[date_col].notna().any():
+            end_date = chunk[date_col].max()
+        rows += len(chunk)
+    if rows == 0:
+        raise ValueError("No rows to append")
+
+    with open(dataset_path, "rb") as f:
+        f.seek(max(size - 1, 0))
+        ends_line = f.read(1) in (b"\n", b"")
+    # Unbuffered, so nothing is left to be written after a truncation
+    with open(dataset_path, "ab", buffering=0) as f, open(source_path, "rb") as source:
+        try:
+            source.readline()  # The header
+            if not ends_line:
+                _write_all(f, b"\n")
+            tail = b"\n"
+            while block := source.read(_APPEND_BLOCK_BYTES):
+                _write_all(f, block)
+                tail = block[-1:]
+            if tail != b"\n":
+                _write_all(f, b"\n")
+            os.fsync(f.fileno())
+        except BaseException:
+            os.ftruncate(f.fileno(), size)
+            raise
+    return AppendedRows(rows, end_date)
+
+
+def _write_all(f, data: bytes) -> None:
+    """Write all of `data` to an unbuffered file, which may take several writes."""
+    view = memoryview(data)
+    while view:
+        view = view[f.write(view):]
+
+
+def file_snapshot(dataset_path: str) -> tuple[int, int, int]:
+    """Identity of a file's current content: inode, size and modification time."""
+    stat = os.stat(dataset_path)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _utc_naive(dates: pd.Series) -> pd.Series:
+    """
+    Dates as naive UTC, so dates with and without zones (or with several
+    UTC offsets, parsed as objects) compare. Dates without a zone count as UTC.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors="coerce", utc=True)
+    if getattr(dates.dtype, "tz", None) is None:
+        return dates
+    return dates.dt.tz_convert("UTC").dt.tz_localize(None)
+
+
+def _bound(value) -> pd.Timestamp | None:
+    """A start or end date as naive UTC."""
+    if value is None:
+        return None
+    bound = pd.Timestamp(value)
+    return bound if bound.tzinfo is None else bound.tz_convert("UTC").tz_localize(None)
+
+
+def date_mask(dates: pd.Series, start=None, end=None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Which dates fall before `start` and which after `end` (an inclusive
+    range; None leaves that end open), compared in UTC.
+    """
+    start, end = _bound(start), _bound(end)
+    values = _utc_naive(dates)
+    before = (values < start).to_numpy() if start is not None else np.zeros(len(dates), dtype=bool)
+    after = (values > end).to_numpy() if end is not None else np.zeros(len(dates), dtype=bool)
+    return before, after
+
+
+@dataclass
+class DateIndex:
+    """
+    Sparse index of a dataset sorted by date: the byte offset and date (naive
+    UTC) of every DATE_INDEX_STRIDE-th row. Range reads seek with it to the
+    blocks of rows around a date range instead of parsing the whole file.
+    """
+    offsets: np.ndarray  # int64
+    dates: np.ndarray  # datetime64[ns]
+    size: int  # file size indexed
+
+    def start_offset(self, start=None, rows_before: int = 0) -> int:
+        """Offset of a row at or before the first dated `start` or later, at least `rows_before` rows earlier."""
+        if start is None:
+            return int(self.offsets[0])
+        block = np.searchsorted(self.dates, np.datetime64(_bound(start)), side="left") - 1
+        block -= -(-rows_before // DATE_INDEX_STRIDE)
+        return int(self.offsets[max(block, 0)])
+
+    def stop_offset(self, end=None) -> int:
+        """Offset of a row after the last dated `end` or earlier (the file size if none)."""
+        if end is None:
+            return self.size
+        block = np.searchsorted(self.dates, np.datetime64(_bound(end)), side="right")
+        return int(self.offsets[block]) if block < len(self.offsets) else self.size
+
+
+def date_index_path(dataset_path: str) -> str:
+    return f"{dataset_path}.dates.npz"
+
+
+def date_index(dataset_path: str) -> DateIndex | None:
+    """
+    The dataset's date index, built on first use and kept next to it until
+    the file changes. None if the dataset has no date column or the sampled
+    dates are out of order (the dataset is then read whole).
+    """
+    stat = os.stat(dataset_path)
+    path = date_index_path(dataset_path)
+    try:
+        with np.load(path) as stored:
+            if stored["stat"].tolist() == [stat.st_size, stat.st_mtime_ns]:
+                if not stored["sorted"]:
+                    return None
+                return DateIndex(stored["offsets"], stored["dates"], stat.st_size)
+    except (FileNotFoundError, KeyError, ValueError, OSError):
+        pass  # Missing, unreadable or from an older layout: rebuild
+
+    names = _header(dataset_path)
+    column = next((i for i, name in enumerate(names) if name.lower() in DATE_COLUMNS), None)
+    if column is None:
+        return None
+    offsets, dates = _sample_rows(dataset_path, column, stat.st_size)
+    keep = dates.notna().to_numpy()
+    offsets, dates = offsets[keep], dates[keep].to_numpy(dtype="datetime64[ns]")
+    ordered = len(dates) > 0 and bool(np.all(dates[1:] >= dates[:-1]))
+
+    # Per-process temporary name: workers may build the same index at once
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, stat=np.array([stat.st_size, stat.st_mtime_ns]), sorted=ordered, offsets=offsets, dates=dates)
+    os.replace(tmp_path, path)
+    return DateIndex(offsets, dates, stat.st_size) if ordered else None
+
+
+def _sample_rows(dataset_path: str, column: int, size: int) -> tuple[np.ndarray, pd.Series]:
+    """
+    Byte offsets of every DATE_INDEX_STRIDE-th row, found by scanning for
+    newlines, and their dates as naive UTC.
+    """
+    offsets = []
+    with open(dataset_path, "rb") as f:
+        position = len(f.readline())
+        starts = np.array([position], dtype=np.int64)
+        row = 0
+        while block := f.read(_SCAN_BLOCK_BYTES):
+            # Rows start after each newline
+            starts = np.concatenate([starts, np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == 10) + position + 1])
+            position += len(block)
+            keep = (row + np.arange(len(starts))) % DATE_INDEX_STRIDE == 0
+            offsets.append(starts[keep])
+            row += len(starts)
+            starts = starts[:0]
+        offsets = np.concatenate(offsets) if offsets else np.zeros(0, dtype=np.int64)
+        offsets = offsets[offsets < size]
+
+        values = []
+        for offset in offsets:
+            f.seek(offset)
+            fields = next(csv.reader([f.readline().decode("utf-8", "replace")]), [])
+            values.append(fields[column] if column < len(fields) else None)
+    return offsets, _utc_naive(pd.Series(values, dtype=object))
+
+
+def load_range(dataset_path: str, start=None, end=None, warmup_bars: int = 0) -> tuple[pd.DataFrame, int]:
+    """
+    Rows dated from `start` to `end` (inclusive; None is open), parsed like
+    load_dataset() with an index from 0, after up to `warmup_bars` rows
+    before them. Returns the frame and how many warm-up rows lead it.
+
+    A columnar copy with sorted dates is binary-searched, and a date index
+    lets only the blocks of CSV rows around the range be read, so a month of
+    a long minute series costs about a month of I/O; otherwise the dataset
+    is loaded whole and sliced.
+    """
+    columnar = load_columnar(dataset_path) if settings.DATASET_COLUMNAR else None
+    if columnar is not None and columnar.sorted:
+        first = np.searchsorted(columnar.dates, np.datetime64(_bound(start)), side="left") if start is not None else 0
+        stop = (
+            np.searchsorted(columnar.dates, np.datetime64(_bound(end)), side="right")
+            if end is not None else len(columnar.dates)
+        )
+        if first >= stop:
+            raise ValueError(f"The dataset has no bars from {start or 'its start'} to {end or 'its end'}")
+        lead = min(warmup_bars, int(first))
+        return columnar.frame.iloc[first - lead:stop].reset_index(drop=True), lead
+
+    index = date_index(dataset_path)
+    if index is None:
+        df = load_dataset(dataset_path)
+    else:
+        df = read_rows(dataset_path, index.start_offset(start, warmup_bars), index.stop_offset(end))
+    date_col = find_date_column(df)
+    if date_col is None:
+        raise ValueError("The dataset has no date column to select a date range from")
+    before, after = date_mask(df[date_col], start, end)
+    inside = np.flatnonzero(~before & ~after)
+    if len(inside) == 0:
+        raise ValueError(f"The dataset has no bars from {start or 'its start'} to {end or 'its end'}")
+    lead = min(warmup_bars, int(inside[0]))
+    return df.iloc[inside[0] - lead:inside[-1] + 1].reset_index(drop=True), lead
+
+
+def find_date_column(df: pd.DataFrame) -> str | None:
+    for col in df.columns:
+        if col in DATE_COLUMNS:
+            return col
+    return None
+
+
+# id(DataFrame) -> content hash, for frames that are still alive
+_content_hashes: dict[int, str] = {}
+
+
+def content_hash(df: pd.DataFrame) -> str:
+    """
+    Hash of a frame's price, volume and date columns.
+
+    Memoized per frame object, so handing the same engine frame to a strategy
+    many times (one run per sweep combination) hashes it once. Engine frames
+    are never modified after loading.
+    """
+    cached = _content_hashes.get(id(df))
+    if cached is not None:
+        return cached
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((list(df.columns), len(df))).encode())
+    for col in df.columns:
+        if col not in OHLCV_COLUMNS and col not in DATE_COLUMNS:
+            continue
+        values = df[col].to_numpy()
+        if values.dtype.kind not in "biufmM":
+            values = pd.util.hash_pandas_object(df[col], index=False).to_numpy()
+        digest.update(np.ascontiguousarray(values).view(np.uint8))
+
+    assume_content_hash(df, digest.hexdigest())
+    return _content_hashes[id(df)]
+
+
+def assume_content_hash(df: pd.DataFrame, value: str) -> None:
+    """
+    Record `value` as the frame's content hash without computing it, for a
+    frame rebuilt from data hashed elsewhere (a sandbox's mapped columns).
+    """
+    _content_hashes[id(df)] = value
+    weakref.finalize(df, _content_hashes.pop, id(df), None)
+
+
+class StrategyFrame(pd.DataFrame):
+    """
+    DataFrame handed to strategy code.
+
+    Columns use the documented Date/Open/High/Low/Close/Volume spelling, but
+    lookups fall back to a case-insensitive match so strategies written
+    against lowercase names (data['close']) keep working.
+
+    Price and volume columns are registered with the indicator cache under
+    the dataset's content hash until the strategy overwrites them, so
+    indicators computed on them are shared between runs over the same data.
+    Frames derived from this one (copies, slices) are not registered.
+    """
+
+    @property
+    def _constructor(self):
+        return StrategyFrame
+
+    def _resolve(self, key):
+        if isinstance(key, str) and key not in self.columns:
+            for col in self.columns:
+                if isinstance(col, str) and col.lower() == key.lower():
+                    return col
+        return key
+
+    def __getitem__(self, key):
+        key = self._resolve(key)
+        result = super().__getitem__(key)
+        source = self.__dict__.get("_indicator_sources", {}).get(key) if isinstance(key, str) else None
+        if source is not None and isinstance(result, pd.Series):
+            register_source(result, source)
+        return result
+
+    def __setitem__(self, key, value):
+        key = self._resolve(key)
+        sources = self.__dict__.get("_indicator_sources", {})
+        if isinstance(key, str) and key in sources:
+            forget_source(sources.pop(key))
+        super().__setitem__(key, value)
+
+
+def strategy_frame(df: pd.DataFrame) -> StrategyFrame:
+    """
+    Copy the engine's lowercase frame into a StrategyFrame.
+
+    The copy lets strategies add or overwrite columns without touching the
+    data the simulator prices fills from.
+    """
+    data = StrategyFrame(df.copy())
+    data.columns = [
+        col.capitalize() if col in OHLCV_COLUMNS or col in DATE_COLUMNS else col
+        for col in df.columns
+    ]
+    frame_hash = content_hash(df)
+    object.__setattr__(data, "_indicator_sources", {
+        col.capitalize(): f"{frame_hash}:{col}" for col in df.columns if col in OHLCV_COLUMNS
+    })
+    return data
@@ -0,0 +1,84 @@
+"""
+Equity curve decimation for charts.
+
+Both decimators return the indices of the bars to keep, always including the
+first and last bar, so the chosen points can be paired with any per-bar
+array (equity, timestamps, drawdown).
+
+- lttb: largest-triangle-three-buckets. One point per bucket, chosen to keep
+  the visual shape of the line.
+- minmax: the lowest and highest bar of each bucket, so no spike or
+  drawdown is lost however far the curve is zoomed out.
+"""
+import numpy as np
+
+from app.engine.blocks import prefix_sums
+
+DECIMATION_METHODS = ["lttb", "minmax"]
+
+
+def lttb(values: np.ndarray, points: int) -> np.ndarray:
+    """Indices of `points` bars picked by largest-triangle-three-buckets."""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if points >= n:
+        return np.arange(n)
+    if points < 3:
+        return np.array([0, n - 1])[:points]
+
+    # Buckets split bars 1..n-2; the last "next bucket" is the final bar
+    bounds = np.append((np.arange(points - 1) * ((n - 2) / (points - 2))).astype(np.int64) + 1, n)
+    # Prefix sums at the bucket bounds only, so the values may be memory-mapped
+    cum = prefix_sums(values, bounds)
+    bucket_x = (bounds[:-1] + bounds[1:] - 1) / 2.0
+    bucket_y = (cum[1:] - cum[:-1]) / (bounds[1:] - bounds[:-1])
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(points - 2):
+        start, stop = bounds[i], bounds[i + 1]
+        # Twice the triangle area between the last pick, each candidate and
+        # the mean of the next bucket
+        x = np.arange(start, stop)
+        area = np.abs(
+            (a - bucket_x[i + 1]) * (values[start:stop] - values[a])
+            - (a - x) * (bucket_y[i + 1] - values[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(values: np.ndarray, points: int) -> np.ndarray:
+    """Indices of the lowest and highest bar in each of points / 2 buckets."""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if points >= n:
+        return np.arange(n)
+    if points < 4:
+        # No room for a bucket's low and high next to the endpoints
+        return np.array([0, n - 1])[:points]
+
+    buckets = (points - 2) // 2
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = values
+    padded = padded.reshape(buckets, size)
+    filled = ~np.isnan(padded).all(axis=1)
+    offsets = np.arange(buckets)[filled] * size
+    lows = offsets + np.nanargmin(padded[filled], axis=1)
+    highs = offsets + np.nanargmax(padded[filled], axis=1)
+    return np.unique(np.concatenate([[0, n - 1], lows, highs]))
+
+
+def decimate(values: np.ndarray, points: int, method: str = "lttb") -> np.ndarray:
+    if method not in DECIMATION_METHODS:
+        raise ValueError(f"Unknown decimation method: {method}. Expected one of {DECIMATION_METHODS}")
+    return lttb(values, points) if method == "lttb" else minmax(values, points)
+
+
+def equity_levels(equity: np.ndarray, levels: list[int]) -> dict[int, np.ndarray]:
+    """Bar indices of the LTTB view of the equity curve at each resolution."""
+    return {level: lttb(equity, level) for level in sorted(levels)}
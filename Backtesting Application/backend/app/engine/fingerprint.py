@@ -0,0 +1,56 @@
+"""
+Content fingerprints for caching backtest work.
+
+Strategy and dataset files are hashed once, when they are stored, and the
+hash is kept on their rows. Cache keys combine those hashes with the run's
+normalized settings, so two requests share a key exactly when they would
+compute the same result - whatever their names, and even when the same file
+was uploaded twice.
+"""
+import hashlib
+import json
+
+from app.core.config import settings
+
+# Bump when engine changes alter the results of an unchanged request, so
+# results cached by the previous version are not served
+CACHE_VERSION = 1
+
+_CHUNK_BYTES = 1 << 20
+
+
+def bytes_hash(content: bytes) -> str:
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def file_hash(path: str, limit: int | None = None) -> str:
+    """Hash of the file's content, or of its first `limit` bytes."""
+    digest = hashlib.blake2b(digest_size=16)
+    remaining = limit
+    with open(path, "rb") as f:
+        while chunk := f.read(_CHUNK_BYTES if remaining is None else min(_CHUNK_BYTES, remaining)):
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(mode: str, strategy_hash: str, dataset_hashes: list[str], config: dict) -> str:
+    """Key of a backtest run; `config` must exclude names and database ids."""
+    key = {
+        "version": CACHE_VERSION,
+        "mode": mode,
+        "strategy": strategy_hash,
+        "datasets": dataset_hashes,
+        "config": config,
+    }
+    if settings.DATASET_FLOAT32:
+        # Runs on single-precision copies of the data give other results
+        key["float32"] = True
+    payload = json.dumps(
+        key,
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
@@ -0,0 +1,276 @@
+"""
+Shared technical indicators for strategy code.
+
+    from app.engine.indicators import sma, ema, rsi
+
+Every indicator is an O(n) NumPy kernel that matches the equivalent pandas
+expression (rolling(window).mean(), ewm(span, adjust=False).mean(), ...),
+including NaN handling. Functions accept a Series or a 1D array and return
+the same kind, aligned to the input.
+
+Results are memoized in a per-process LRU cache keyed on (input, indicator,
+params). Columns read from the strategy's data frame are identified by the
+dataset's content hash, so repeated runs over the same data in one process -
+every combination of a parameter sweep - reuse indicators whose parameters
+did not change; other processes keep caches of their own. Strategies run in
+a sandbox process, whose cache lasts for its SANDBOX_MAX_RUNS runs. Any
+other input is identified by hashing its values. Cached arrays are never
+handed out directly; callers always receive a copy.
+"""
+import hashlib
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.engine.cache import LRUCache
+
+# Block length for the blockwise EMA is chosen so that decay**-length stays
+# around 1e150, far from float64 overflow
+EMA_BLOCK_LOG_SCALE = 345.0
+
+_cache = LRUCache(settings.INDICATOR_CACHE_BYTES, sizeof=lambda values: values.nbytes)
+
+# id(Series) -> source key for unmodified dataset columns
+_sources: dict[int, str] = {}
+
+
+def register_source(series: pd.Series, key: str) -> None:
+    """Identify `series` by `key` instead of hashing its values."""
+    if _sources.get(id(series)) == key:
+        return
+    _sources[id(series)] = key
+    weakref.finalize(series, _sources.pop, id(series), None)
+
+
+def forget_source(key: str) -> None:
+    """Stop identifying any series by `key` (its column was overwritten)."""
+    for series_id in [series_id for series_id, source in _sources.items() if source == key]:
+        _sources.pop(series_id, None)
+
+
+def cache_stats() -> dict:
+    return _cache.stats()
+
+
+def _input(values) -> tuple[np.ndarray, str]:
+    key = _sources.get(id(values))
+    array = np.asarray(values, dtype=np.float64)
+    if array.ndim != 1:
+        raise ValueError("Indicators take a single column of values")
+    if key is None:
+        digest = hashlib.blake2b(np.ascontiguousarray(array).view(np.uint8), digest_size=16)
+        key = f"{digest.hexdigest()}:{len(array)}"
+    return array, key
+
+
+def _output(values: np.ndarray, like):
+    values = values.copy()
+    if isinstance(like, pd.Series):
+        return pd.Series(values, index=like.index)
+    return values
+
+
+def _memoized(key: tuple, compute) -> np.ndarray:
+    def frozen():
+        values = compute()
+        values.flags.writeable = False
+        return values
+
+    return _cache.get_or_compute(key, frozen)
+
+
+# Kernels. Each takes and returns (values, key) so composite indicators can
+# chain cached intermediates without rehashing them.
+
+def _window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Sum of each trailing `window` of values, in O(n).
+
+    The series is cut into blocks of `window` bars. A window ending at offset
+    o of block b is the prefix of block b up to o plus the part of block
+    b - 1 after o, so every sum is taken from cumulative sums over at most
+    `window` terms and rounding error does not build up along the series the
+    way it does with one global cumsum.
+    """
+    n = len(values)
+    blocks = -(-n // window)
+    padded = np.zeros(blocks * window)
+    padded[:n] = values
+    prefix = np.cumsum(padded.reshape(blocks, window), axis=1)
+    prefix[1:] += prefix[:-1, -1:] - prefix[:-1]
+    return prefix.ravel()[window - 1:n]
+
+
+def _rolling(values: np.ndarray, window: int, powers: int) -> list[np.ndarray]:
+    """
+    Trailing-window sums of values**1..powers, NaN until the window is full
+    or while it contains a NaN (pandas' default min_periods).
+    """
+    n = len(values)
+    results = [np.full(n, np.nan) for _ in range(powers)]
+    if window > n:
+        return results
+
+    missing = np.isnan(values)
+    gaps = None
+    if missing.any():
+        values = np.where(missing, 0.0, values)
+        counts = np.concatenate([[0], np.cumsum(missing)])
+        gaps = counts[window:] - counts[:-window] > 0
+    for power, result in enumerate(results, start=1):
+        result[window - 1:] = _window_sums(values if power == 1 else values ** power, window)
+        if gaps is not None:
+            result[window - 1:][gaps] = np.nan
+    return results
+
+
+def _sma(src: tuple[np.ndarray, str], window: int) -> tuple[np.ndarray, str]:
+    values, key = src
+
+    def compute():
+        (sums,) = _rolling(values, window, 1)
+        return sums / window
+
+    return _memoized((key, "sma", window), compute), f"sma({key},{window})"
+
+
+def _std(src: tuple[np.ndarray, str], window: int, ddof: int = 1) -> tuple[np.ndarray, str]:
+    values, key = src
+
+    def compute():
+        if window <= ddof:
+            return np.full(len(values), np.nan)
+        # Variance is shift-invariant; centring on a typical value keeps the
+        # sum of squares from swamping small deviations of large prices
+        finite = values[np.isfinite(values)]
+        shift = finite[0] if len(finite) else 0.0
+        sums, squares = _rolling(values - shift, window, 2)
+        mean = sums / window
+        var = (squares - window * mean ** 2) / (window - ddof)
+        return np.sqrt(np.maximum(var, 0.0))
+
+    return _memoized((key, "std", window, ddof), compute), f"std({key},{window},{ddof})"
+
+
+def _ema(src: tuple[np.ndarray, str], span: float) -> tuple[np.ndarray, str]:
+    """
+    y[t] = alpha * x[t] + (1 - alpha) * y[t - 1], seeded with the first value.
+
+    Within a block the recursion has the closed form
+    y[s + j] = decay**(j + 1) * y[s - 1] + alpha * decay**j * cumsum(x * decay**-k)[j],
+    so the series is solved one block at a time with a cumulative sum each.
+    """
+    values, key = src
+
+    def compute():
+        alpha = 2.0 / (span + 1.0)
+        decay = 1.0 - alpha
+        n = len(values)
+        result = np.full(n, np.nan)
+        valid = np.flatnonzero(~np.isnan(values))
+        if len(valid) == 0:
+            return result
+        first = valid[0]
+        x = values[first:]
+        if np.isnan(x).any():
+            # Interior gaps reweight later observations; defer to pandas
+            result[first:] = pd.Series(x).ewm(span=span, adjust=False).mean().to_numpy()
+            return result
+        if decay == 0.0:
+            result[first:] = x
+            return result
+
+        block = max(1, min(len(x), int(EMA_BLOCK_LOG_SCALE / -np.log(decay))))
+        steps = np.arange(block)
+        growth = decay ** -steps
+        shrink = decay ** steps
+        carry = x[0]
+        for start in range(0, len(x), block):
+            chunk = x[start:start + block]
+            m = len(chunk)
+            local = alpha * shrink[:m] * np.cumsum(chunk * growth[:m])
+            local += decay * shrink[:m] * carry
+            result[first + start:first + start + m] = local
+            carry = local[-1]
+        return result
+
+    return _memoized((key, "ema", float(span)), compute), f"ema({key},{span})"
+
+
+# Public indicators
+
+def sma(values, window: int):
+    """Simple moving average, like `rolling(window).mean()`."""
+    return _output(_sma(_input(values), window)[0], values)
+
+
+def rolling_std(values, window: int, ddof: int = 1):
+    """Rolling standard deviation, like `rolling(window).std(ddof=ddof)`."""
+    return _output(_std(_input(values), window, ddof)[0], values)
+
+
+def ema(values, span: float):
+    """Exponential moving average, like `ewm(span=span, adjust=False).mean()`."""
+    return _output(_ema(_input(values), span)[0], values)
+
+
+def rsi(values, period: int = 14):
+    """
+    Relative Strength Index from simple averages of gains and losses
+    (Cutler's RSI). NaN while the average loss is zero.
+    """
+    src = _input(values)
+
+    def compute():
+        delta = np.diff(src[0], prepend=np.nan)
+        gain = _sma((np.where(delta > 0, delta, 0.0), f"gain({src[1]})"), period)[0]
+        loss = _sma((np.where(delta < 0, -delta, 0.0), f"loss({src[1]})"), period)[0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = gain / np.where(loss == 0, np.nan, loss)
+        return 100.0 - 100.0 / (1.0 + rs)
+
+    return _output(_memoized((src[1], "rsi", period), compute), values)
+
+
+def bollinger_bands(values, window: int = 20, num_std: float = 2.0):
+    """Middle (SMA), upper and lower bands `num_std` rolling deviations away."""
+    src = _input(values)
+    middle = _sma(src, window)[0]
+    width = _std(src, window)[0] * num_std
+    return _output(middle, values), _output(middle + width, values), _output(middle - width, values)
+
+
+def macd(values, fast_period: int = 12, slow_period: int = 26, signal_period: int = 9):
+    """MACD line (fast EMA - slow EMA), its signal-line EMA, and the histogram."""
+    src = _input(values)
+    line = _ema(src, fast_period)[0] - _ema(src, slow_period)[0]
+    line_src = (line, f"macd({src[1]},{fast_period},{slow_period})")
+    signal = _ema(line_src, signal_period)[0]
+    return _output(line, values), _output(signal, values), _output(line - signal, values)
+
+
+def _median_price(high, low) -> tuple[np.ndarray, str]:
+    high, high_key = _input(high)
+    low, low_key = _input(low)
+    return (high + low) / 2.0, f"median({high_key},{low_key})"
+
+
+def median_price(high, low):
+    """(High + Low) / 2."""
+    return _output(_median_price(high, low)[0], high)
+
+
+def awesome_oscillator(high, low, short_period: int = 5, long_period: int = 34):
+    """Short SMA minus long SMA of the median price."""
+    median = _median_price(high, low)
+    return _output(_sma(median, short_period)[0] - _sma(median, long_period)[0], high)
+
+
+def accelerator_oscillator(high, low, short_period: int = 5, long_period: int = 34, ao_period: int = 5):
+    """Awesome Oscillator minus its own `ao_period` SMA."""
+    median = _median_price(high, low)
+    ao = _sma(median, short_period)[0] - _sma(median, long_period)[0]
+    ao_src = (ao, f"ao({median[1]},{short_period},{long_period})")
+    return _output(ao - _sma(ao_src, ao_period)[0], high)
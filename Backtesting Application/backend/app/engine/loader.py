@@ -0,0 +1,123 @@
+import hashlib
+import inspect
+import types
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.engine.cache import LRUCache
+
+# Entry points accepted by validate_strategy_file in the strategies endpoint
+CLASS_ENTRY_METHODS = ["run", "execute", "backtest"]
+FUNCTION_ENTRY_POINTS = ["strategy", "run_strategy", "backtest"]
+EVENT_ENTRY_METHOD = "on_bar"
+
+
+class StrategyLoadError(Exception):
+    pass
+
+
+# Compiled strategy code, per worker process, keyed by a hash of the source;
+# values are (code, source size)
+_compiled = LRUCache(settings.STRATEGY_CODE_CACHE_BYTES, sizeof=lambda entry: entry[1])
+
+
+def strategy_code_cache_stats() -> dict:
+    return _compiled.stats()
+
+
+def _compile_strategy(strategy_path: str):
+    try:
+        with open(strategy_path, "rb") as f:
+            source = f.read()
+    except OSError as e:
+        raise StrategyLoadError(f"Cannot import strategy file: {strategy_path}") from e
+
+    key = hashlib.blake2b(source, digest_size=16).hexdigest()
+    entry = _compiled.get(key)
+    if entry is None:
+        entry = (compile(source, strategy_path, "exec", dont_inherit=True), len(source))
+        _compiled.put(key, entry)
+    return entry[0]
+
+
+def load_strategy_module(strategy_path: str):
+    """
+    Import a strategy file as a fresh, uniquely named module.
+
+    The source is compiled once per content hash; each call runs the cached
+    code in a new module, so module-level state is never shared between runs.
+    """
+    module = types.ModuleType(f"quantflow_strategy_{uuid.uuid4().hex}")
+    module.__file__ = strategy_path
+    exec(_compile_strategy(strategy_path), module.__dict__)
+    return module
+
+
+def strategy_entry(module, params: dict | None = None):
+    """
+    Return a callable taking the data frame for an imported strategy module.
+
+    Classes with a run()/execute()/backtest() method take precedence over
+    module level strategy()/run_strategy()/backtest() functions, matching the
+    recommended format. `params` are passed to the class constructor or as
+    keyword arguments to the function.
+    """
+    params = params or {}
+
+    # Definition order, so the class picked matches the upload validation
+    for cls in list(vars(module).values()):
+        if not inspect.isclass(cls) or cls.__module__ != module.__name__:
+            continue
+        for method_name in CLASS_ENTRY_METHODS:
+            if callable(getattr(cls, method_name, None)):
+                instance = cls(**params)
+                return getattr(instance, method_name)
+
+    for func_name in FUNCTION_ENTRY_POINTS:
+        func = getattr(module, func_name, None)
+        if inspect.isfunction(func):
+            return lambda data: func(data, **params)
+
+    raise StrategyLoadError(
+        "Strategy file must contain either a class with run()/execute()/backtest() "
+        "method or a function named strategy()/run_strategy()/backtest()"
+    )
+
+
+def event_strategy(module, params: dict | None = None):
+    """
+    Instantiate the first class with an on_bar() method, for the event-driven
+    engine. `params` are passed to its constructor.
+    """
+    for cls in list(vars(module).values()):
+        if inspect.isclass(cls) and cls.__module__ == module.__name__ and callable(getattr(cls, EVENT_ENTRY_METHOD, None)):
+            return cls(**(params or {}))
+
+    raise StrategyLoadError("Event-driven backtests need a strategy class with an on_bar(bar, broker) method")
+
+
+def load_strategy(strategy_path: str, params: dict | None = None):
+    """Import a strategy file and return its entry point bound to `params`."""
+    return strategy_entry(load_strategy_module(strategy_path), params)
+
+
+def run_strategy(strategy, data: pd.DataFrame) -> np.ndarray:
+    """Call the strategy and return its signals as a float64 array aligned to `data`."""
+    signals = strategy(data)
+
+    if isinstance(signals, pd.DataFrame):
+        if signals.shape[1] != 1:
+            raise ValueError("Strategy must return a single column of signals")
+        signals = signals.iloc[:, 0]
+    if isinstance(signals, pd.Series):
+        signals = signals.reindex(data.index)
+
+    values = np.asarray(signals, dtype=np.float64).reshape(-1)
+    if len(values) != len(data):
+        raise ValueError(
+            f"Strategy returned {len(values)} signals for {len(data)} bars"
+        )
+    return values
@@ -0,0 +1,352 @@
+"""
+Performance metrics from simulator output.
+
+Metrics are computed straight from the simulator's equity, returns and
+units arrays: the return moments come from one reduction each over the
+returns (sums and sums of squares rather than separate mean/std passes), and
+the drawdown series is accumulated once and shared by max drawdown, drawdown
+duration and recovery time. No intermediate Series are built.
+
+Arrays may be (bars,) or (bars, columns); summary metrics are per column.
+Ratios are annualized by the bars per year of the data (periods_per_year()).
+"""
+import numpy as np
+import pandas as pd
+
+from app.engine.blocks import prefix_sums
+from app.engine.simulator import SimulationResult
+
+# Daily bars on trading days; used when the data has no usable dates
+PERIODS_PER_YEAR = 252
+
+SECONDS_PER_YEAR = 365.25 * 24 * 60 * 60
+
+
+def periods_per_year(timestamps) -> float:
+    """
+    Bars per year implied by the bars' timestamps: bar intervals over the
+    years they span. Daily bars on trading days give about 252, hourly bars
+    around the clock about 8,766, whatever the dataset's interval.
+    PERIODS_PER_YEAR when there are not two distinct dates.
+    """
+    if timestamps is None or not pd.api.types.is_datetime64_any_dtype(timestamps):
+        return PERIODS_PER_YEAR
+    stamps = pd.DatetimeIndex(timestamps).dropna()
+    if len(stamps) < 2:
+        return PERIODS_PER_YEAR
+    span = (stamps.max() - stamps.min()).total_seconds()
+    if span <= 0:
+        return PERIODS_PER_YEAR
+    return (len(stamps) - 1) * SECONDS_PER_YEAR / span
+
+
+def _sums(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Sum and sum of squares of each column."""
+    return values.sum(axis=0), np.einsum("i...,i...->...", values, values)
+
+
+def _moments(
+    total: np.ndarray,
+    squares: np.ndarray,
+    count: np.ndarray | int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Mean and sample standard deviation from the sums over `count` entries of each column."""
+    total = np.asarray(total, dtype=np.float64)
+    mean = np.divide(total, count, out=np.zeros_like(total), where=np.asarray(count) > 0)
+    ss = squares - count * mean ** 2
+    var = np.divide(ss, np.asarray(count) - 1, out=np.zeros_like(total), where=np.asarray(count) > 1)
+    return mean, np.sqrt(var.clip(min=0))
+
+
+def _summary(
+    equity: np.ndarray,
+    returns: np.ndarray,
+    drawdown: np.ndarray,
+    initial_capital: float,
+    periods_per_year: float,
+) -> dict:
+    mean, std = _moments(*_sums(returns), returns.shape[0])
+    # Sortino uses the deviation of the negative returns only
+    downside = np.minimum(returns, 0.0)
+    _, down_std = _moments(*_sums(downside), np.count_nonzero(downside, axis=0))
+    return _ratios(equity[-1], mean, std, down_std, drawdown.min(axis=0), initial_capital, periods_per_year)
+
+
+def _ratios(
+    final_equity: np.ndarray,
+    mean: np.ndarray,
+    std: np.ndarray,
+    down_std: np.ndarray,
+    max_drawdown: np.ndarray,
+    initial_capital: float,
+    periods_per_year: int,
+) -> dict:
+    annualize = np.sqrt(periods_per_year)
+    total_return = (final_equity - initial_capital) / initial_capital
+    sharpe = np.divide(mean, std, out=np.zeros_like(mean), where=std > 0) * annualize
+    sortino = np.divide(mean, down_std, out=np.zeros_like(mean), where=down_std > 0) * annualize
+
+    calmar = np.divide(total_return, np.abs(max_drawdown), out=np.zeros_like(mean), where=max_drawdown != 0)
+
+    return {
+        "total_return": total_return,
+        "sharpe_ratio": sharpe,
+        "sortino_ratio": sortino,
+        "max_drawdown": max_drawdown,
+        "calmar_ratio": calmar,
+        "volatility": std * annualize,
+    }
+
+
+def _drawdown(equity: np.ndarray, initial_capital: float) -> np.ndarray:
+    """Fall from the peak equity so far (the initial capital counts as a peak)."""
+    running_max = np.maximum.accumulate(equity, axis=0)
+    np.maximum(running_max, initial_capital, out=running_max)
+    np.divide(equity, running_max, out=running_max)
+    running_max -= 1.0
+    return running_max
+
+
+def column_metrics(
+    equity: np.ndarray,
+    returns: np.ndarray,
+    initial_capital: float,
+    periods_per_year: float = PERIODS_PER_YEAR,
+) -> dict:
+    """Summary metrics for each column of (bars, columns) equity and returns."""
+    drawdown = _drawdown(equity, initial_capital)
+    return _summary(equity, returns, drawdown, initial_capital, periods_per_year)
+
+
+def equity_metrics(
+    equity: np.ndarray,
+    initial_capital: float,
+    periods_per_year: float = PERIODS_PER_YEAR,
+) -> dict:
+    """Summary metrics of an equity curve alone, e.g. of a run still in progress."""
+    equity = np.asarray(equity, dtype=np.float64)
+    if len(equity) == 0:
+        return {}
+    returns = np.empty_like(equity)
+    returns[0] = equity[0] / initial_capital - 1.0
+    returns[1:] = equity[1:] / equity[:-1] - 1.0
+    summary = column_metrics(equity, returns, initial_capital, periods_per_year)
+    return {name: float(value) for name, value in summary.items()}
+
+
+def drawdown_stats(drawdown: np.ndarray) -> dict:
+    """
+    Longest time under water and the recovery of the deepest drawdown, in bars.
+
+    Recovery is counted from the trough back to the previous peak; it is None
+    when the deepest drawdown has not recovered by the last bar.
+    """
+    under = np.concatenate([[False], drawdown < 0, [False]])
+    # Underwater runs start where `under` turns on and end where it turns off
+    edges = np.flatnonzero(under[1:] != under[:-1])
+    if len(edges) == 0:
+        return {"max_drawdown_duration": 0, "max_drawdown_recovery": 0}
+    duration = int((edges[1::2] - edges[0::2]).max())
+
+    trough = int(np.argmin(drawdown))
+    run_end = edges[1::2][np.searchsorted(edges[1::2], trough, side="right")]
+    recovery = int(run_end - trough) if run_end < len(drawdown) else None
+    return {"max_drawdown_duration": duration, "max_drawdown_recovery": recovery}
+
+
+def rolling_metrics(
+    returns: np.ndarray,
+    window: int,
+    periods_per_year: float = PERIODS_PER_YEAR,
+    points: int = 500,
+) -> dict:
+    """
+    Annualized rolling Sharpe ratio and volatility over trailing `window` bars,
+    sampled at up to `points` evenly spaced bars.
+    """
+    n = len(returns)
+    if window < 2 or window > n:
+        return {"window": window, "bars": [], "sharpe_ratio": [], "volatility": []}
+
+    ends = np.unique(np.linspace(window, n, min(points, n - window + 1)).astype(np.int64))
+    # Prefix sums at the window bounds only, so the returns may be memory-mapped
+    bounds = np.concatenate([ends, ends - window])
+    sums = prefix_sums(returns, bounds)
+    squares = prefix_sums(returns, bounds, squared=True)
+
+    total = sums[: len(ends)] - sums[len(ends):]
+    mean = total / window
+    var = (squares[: len(ends)] - squares[len(ends):] - window * mean ** 2) / (window - 1)
+    std = np.sqrt(var.clip(min=0))
+    annualize = np.sqrt(periods_per_year)
+    sharpe = np.divide(mean, std, out=np.zeros_like(mean), where=std > 1e-12) * annualize
+
+    return {
+        "window": window,
+        "bars": (ends - 1).tolist(),
+        "sharpe_ratio": sharpe.tolist(),
+        "volatility": (std * annualize).tolist(),
+    }
+
+
+def backtest_metrics(
+    sim: SimulationResult,
+    close: np.ndarray,
+    initial_capital: float,
+    periods_per_year: float = PERIODS_PER_YEAR,
+) -> dict:
+    """
+    Full metric set for a single-account simulation.
+
+    Adds to the summary metrics: drawdown duration and recovery, exposure
+    (share of bars holding a position) and turnover (traded value over
+    average equity).
+    """
+    drawdown = _drawdown(sim.equity, initial_capital)
+    summary = _summary(sim.equity, sim.returns, drawdown, initial_capital, periods_per_year)
+    metrics = {name: float(value) for name, value in summary.items()}
+    metrics.update(drawdown_stats(drawdown))
+
+    holding = sim.units != 0 if sim.units.ndim == 1 else (sim.units != 0).any(axis=1)
+    metrics["exposure"] = float(holding.mean())
+
+    traded = np.abs(np.diff(sim.units, axis=0, prepend=0.0)) * np.asarray(close, dtype=np.float64)
+    metrics["turnover"] = float(traded.sum() / sim.equity.mean())
+    return metrics
+
+
+class MetricsAccumulator:
+    """
+    backtest_metrics() for a single-account simulation fed in consecutive
+    windows of bars, for runs too long to hold at once. Sums, the equity
+    peak and the open drawdown carry from one window to the next. Drawdown,
+    exposure and total return equal one pass; summed metrics (Sharpe,
+    Sortino, volatility, turnover) are added window by window, so they can
+    differ from one pass in the last digits.
+
+    Without `periods_per_year`, metrics are annualized by the bars per year
+    the timestamps passed to add() imply, as periods_per_year() would from
+    all of them at once.
+    """
+
+    def __init__(self, initial_capital: float, periods_per_year: float | None = None):
+        self.initial_capital = initial_capital
+        self.periods_per_year = periods_per_year
+        # Dated bars so far and their first and last dates (epoch nanoseconds)
+        self._dated = 0
+        self._first_date: int | None = None
+        self._last_date: int | None = None
+        self._bars = 0
+        self._returns = np.zeros(2)  # sum, sum of squares
+        self._downside = np.zeros(2)
+        self._downside_count = 0
+        self._equity_sum = 0.0
+        self._final_equity = initial_capital
+        self._holding = 0
+        self._traded = 0.0
+        self._units = 0.0
+        # Peak equity so far (the initial capital counts as a peak)
+        self._peak = initial_capital
+        self._max_drawdown = 0.0
+        # Underwater runs: the start of the one still open, the longest, and
+        # the deepest point with the end of its run once known
+        self._run_start: int | None = None
+        self._longest = 0
+        self._trough: int | None = None
+        self._trough_end: int | None = None
+
+    def add(self, sim: SimulationResult, close: np.ndarray, timestamps=None) -> None:
+        """Append the next window's simulation output, closes and (optionally) bar timestamps."""
+        n = len(sim.equity)
+        if n == 0:
+            return
+        if timestamps is not None and pd.api.types.is_datetime64_any_dtype(timestamps):
+            stamps = pd.DatetimeIndex(timestamps).dropna().asi8
+            if len(stamps):
+                self._dated += len(stamps)
+                first, last = int(stamps.min()), int(stamps.max())
+                self._first_date = first if self._first_date is None else min(self._first_date, first)
+                self._last_date = last if self._last_date is None else max(self._last_date, last)
+        offset = self._bars
+        self._returns += _sums(sim.returns)
+        downside = np.minimum(sim.returns, 0.0)
+        self._downside += _sums(downside)
+        self._downside_count += np.count_nonzero(downside)
+        self._equity_sum += sim.equity.sum()
+        self._final_equity = sim.equity[-1]
+        self._holding += np.count_nonzero(sim.units)
+        traded = np.abs(np.diff(sim.units, prepend=self._units)) * np.asarray(close, dtype=np.float64)
+        self._traded += traded.sum()
+        self._units = sim.units[-1]
+
+        drawdown = _drawdown(sim.equity, self._peak)
+        self._peak = max(self._peak, sim.equity.max())
+        deepest = int(np.argmin(drawdown))
+        if drawdown[deepest] < self._max_drawdown:
+            self._max_drawdown = drawdown[deepest]
+            self._trough = offset + deepest
+            self._trough_end = None
+
+        # Bars where a run starts (goes under water) or ends (recovers)
+        under = np.concatenate([[self._run_start is not None], drawdown < 0])
+        edges = np.flatnonzero(under[1:] != under[:-1])
+        starts = offset + edges[under[1:][edges]]
+        ends = offset + edges[~under[1:][edges]]
+        if self._run_start is not None:
+            starts = np.concatenate([[self._run_start], starts])
+        if len(ends):
+            self._longest = max(self._longest, int((ends - starts[: len(ends)]).max()))
+        self._run_start = int(starts[-1]) if len(starts) > len(ends) else None
+        if self._trough is not None and self._trough_end is None:
+            after = ends[ends > self._trough]
+            if len(after):
+                self._trough_end = int(after[0])
+        self._bars += n
+
+    def annualization(self) -> float:
+        """Bars per year the metrics are annualized by."""
+        if self.periods_per_year is not None:
+            return self.periods_per_year
+        if self._dated < 2 or self._last_date <= self._first_date:
+            return PERIODS_PER_YEAR
+        return (self._dated - 1) * SECONDS_PER_YEAR / ((self._last_date - self._first_date) / 1e9)
+
+    def metrics(self) -> dict:
+        n = self._bars
+        mean, std = _moments(self._returns[0], self._returns[1], n)
+        _, down_std = _moments(self._downside[0], self._downside[1], self._downside_count)
+        summary = _ratios(
+            np.float64(self._final_equity), mean, std, down_std, np.float64(self._max_drawdown),
+            self.initial_capital, self.annualization(),
+        )
+        metrics = {name: float(value) for name, value in summary.items()}
+
+        longest = self._longest
+        if self._run_start is not None:
+            longest = max(longest, n - self._run_start)
+        if self._trough is None:
+            metrics.update({"max_drawdown_duration": 0, "max_drawdown_recovery": 0})
+        else:
+            recovery = self._trough_end - self._trough if self._trough_end is not None else None
+            metrics.update({"max_drawdown_duration": longest, "max_drawdown_recovery": recovery})
+
+        # No bars: nothing held or traded
+        metrics["exposure"] = self._holding / n if n else 0.0
+        metrics["turnover"] = float(self._traded / (self._equity_sum / n)) if n else 0.0
+        return metrics
+
+    def state(self) -> dict:
+        """Everything carried between windows, as plain JSON values, for from_state()."""
+        return {
+            name: value.tolist() if isinstance(value, np.ndarray)
+            else value.item() if isinstance(value, np.generic)
+            else value
+            for name, value in vars(self).items()
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "MetricsAccumulator":
+        accumulator = cls(state["initial_capital"], state["periods_per_year"])
+        for name, value in state.items():
+            setattr(accumulator, name, np.asarray(value, dtype=np.float64) if isinstance(value, list) else value)
+        return accumulator
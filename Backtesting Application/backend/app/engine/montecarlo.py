@@ -0,0 +1,155 @@
+"""
+Bootstrap robustness analysis of a backtest's per-bar returns.
+
+Resampled paths are drawn as a (paths x blocks) matrix of block start indices
+using the circular block bootstrap (block_size=1 is the plain i.i.d.
+bootstrap). Everything a path metric needs from a block - its log growth,
+min/max excursion, internal drawdown and return sums - is precomputed once
+per possible start bar, so metrics for all paths reduce to gathers, a
+cumulative sum and a running maximum over the block axis. Paths are processed
+in row chunks sized by `max_cells` to keep memory bounded.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.engine.metrics import PERIODS_PER_YEAR
+
+PERCENTILES = [5, 25, 50, 75, 95]
+
+
+def _block_stats(log_cum: np.ndarray, ret_cum: np.ndarray, sq_cum: np.ndarray, n: int, width: int, max_cells: int) -> dict:
+    """Per-start-bar statistics of a block of `width` bars (wrapping around the series)."""
+    stats = {name: np.empty(n) for name in ["total", "low", "high", "drawdown"]}
+    windows = sliding_window_view(log_cum[1:], width)
+    step = max(1, max_cells // width)
+    for start in range(0, n, step):
+        stop = min(start + step, n)
+        # Log equity after each bar of the block, relative to the block start
+        levels = windows[start:stop] - log_cum[start:stop, None]
+        stats["total"][start:stop] = levels[:, -1]
+        stats["low"][start:stop] = levels.min(axis=1)
+        stats["high"][start:stop] = levels.max(axis=1)
+        stats["drawdown"][start:stop] = (levels - np.maximum.accumulate(levels, axis=1)).min(axis=1)
+
+    starts = np.arange(n)
+    stats["sum"] = ret_cum[starts + width] - ret_cum[starts]
+    stats["sumsq"] = sq_cum[starts + width] - sq_cum[starts]
+    return stats
+
+
+def _summary(values: np.ndarray) -> dict:
+    return {
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "percentiles": {str(p): float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))},
+    }
+
+
+def monte_carlo(
+    returns: np.ndarray,
+    n_paths: int,
+    initial_capital: float,
+    block_size: int = 1,
+    seed: int = 42,
+    periods_per_year: float = PERIODS_PER_YEAR,
+    band_points: int = 200,
+    max_cells: int = 2_000_000,
+) -> dict:
+    """
+    Distributions of total return, Sharpe and max drawdown over resampled paths,
+    plus percentile bands of the equity curve at `band_points` checkpoints.
+
+    Results depend only on (returns, n_paths, block_size, seed, max_cells);
+    the Sharpe ratio is annualized by `periods_per_year`.
+    """
+    # A return of -100% or worse is ruin; clip so log growth stays finite
+    returns = np.maximum(np.asarray(returns, dtype=np.float64), -1.0 + 1e-12)
+    n = len(returns)
+    if n < 2:
+        raise ValueError("Monte Carlo needs at least two returns")
+    block_size = max(1, min(block_size, n))
+
+    n_blocks = -(-n // block_size)
+    last_width = n - (n_blocks - 1) * block_size
+
+    # Cumulative sums over the series extended by one block, for wrap-around
+    extended = np.concatenate([returns, returns[:block_size]])
+    log_cum = np.concatenate([[0.0], np.cumsum(np.log1p(extended))])
+    ret_cum = np.concatenate([[0.0], np.cumsum(extended)])
+    sq_cum = np.concatenate([[0.0], np.cumsum(extended ** 2)])
+
+    full = _block_stats(log_cum, ret_cum, sq_cum, n, block_size, max_cells)
+    last = full if last_width == block_size else _block_stats(log_cum, ret_cum, sq_cum, n, last_width, max_cells)
+
+    checkpoints = np.unique(np.linspace(0, n - 1, min(band_points, n)).astype(np.int64))
+    cp_block = checkpoints // block_size
+    cp_offset = checkpoints % block_size
+
+    rng = np.random.default_rng(seed)
+    chunk = max(1, max_cells // n_blocks)
+
+    total_return = np.empty(n_paths)
+    sharpe = np.empty(n_paths)
+    max_drawdown = np.empty(n_paths)
+    bands = np.empty((n_paths, len(checkpoints)))
+
+    for start in range(0, n_paths, chunk):
+        stop = min(start + chunk, n_paths)
+        starts = rng.integers(0, n, size=(stop - start, n_blocks))
+
+        def gather(name):
+            values = np.empty(starts.shape)
+            values[:, :-1] = full[name][starts[:, :-1]]
+            values[:, -1] = last[name][starts[:, -1]]
+            return values
+
+        # Log equity at the start of each block and the running peak before it
+        growth = gather("total")
+        level = np.cumsum(growth, axis=1)
+        level -= growth
+        if block_size == 1:
+            # Single-bar blocks: the bar's growth is its own low and high
+            high, low, internal = growth, growth, 0.0
+            sums = gather("sum")
+            sum_sq = (sums ** 2).sum(axis=1)
+        else:
+            high, low, internal = gather("high"), gather("low"), gather("drawdown")
+            sums = gather("sum")
+            sum_sq = gather("sumsq").sum(axis=1)
+
+        peak = np.maximum.accumulate(level + high, axis=1)
+        prior_peak = np.zeros_like(peak)
+        np.maximum(peak[:, :-1], 0.0, out=prior_peak[:, 1:])
+
+        drawdown = np.minimum(internal, level + low - prior_peak)
+        max_drawdown[start:stop] = np.expm1(drawdown.min(axis=1))
+        total_return[start:stop] = np.expm1(level[:, -1] + growth[:, -1])
+
+        mean = sums.sum(axis=1) / n
+        var = (sum_sq - n * mean ** 2) / (n - 1)
+        std = np.sqrt(var.clip(min=0))
+        sharpe[start:stop] = np.divide(mean, std, out=np.zeros_like(mean), where=std > 0) * np.sqrt(periods_per_year)
+
+        cp_start = starts[:, cp_block]
+        bands[start:stop] = np.exp(
+            level[:, cp_block] + log_cum[cp_start + cp_offset + 1] - log_cum[cp_start]
+        )
+
+    band_values = np.percentile(bands, PERCENTILES, axis=0) * initial_capital
+
+    return {
+        "n_paths": n_paths,
+        "block_size": block_size,
+        "seed": seed,
+        "bars": n,
+        "metrics": {
+            "total_return": _summary(total_return),
+            "sharpe_ratio": _summary(sharpe),
+            "max_drawdown": _summary(max_drawdown),
+        },
+        "probability_of_loss": float((total_return < 0).mean()),
+        "equity_bands": {
+            "bars": checkpoints.tolist(),
+            **{str(p): band.tolist() for p, band in zip(PERCENTILES, band_values)},
+        },
+    }
@@ -0,0 +1,14 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import billiard
+
+
+def process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Process pool that can be started from inside a Celery worker.
+
+    Prefork Celery workers are daemonic processes and the standard library
+    refuses to start children from them. billiard, Celery's multiprocessing
+    fork, lifts that restriction, so the pool uses its fork context.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=billiard.get_context("fork"))
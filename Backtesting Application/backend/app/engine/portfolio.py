@@ -0,0 +1,183 @@
+"""
+Multi-asset portfolio backtests.
+
+Each dataset is one asset. Assets are aligned on a shared datetime index and
+held as columns of (bars, assets) arrays, and a single cash account is
+simulated across all of them with simulate_portfolio.
+"""
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from app.engine.data import find_date_column, load_dataset, strategy_frame
+from app.engine.loader import load_strategy_module, run_strategy, strategy_entry
+from app.engine.parallel import process_pool
+from app.engine.sandbox import SandboxPool
+from app.engine.simulator import signals_to_target, simulate_portfolio
+
+ALIGN_MODES = ["intersection", "union"]
+
+
+def _indexed_dataset(dataset_path: str) -> pd.DataFrame:
+    df = load_dataset(dataset_path)
+    date_col = find_date_column(df)
+    if date_col is None:
+        raise ValueError(f"Portfolio datasets need a date column: {dataset_path}")
+    df = df.set_index(date_col)
+    return df[~df.index.duplicated(keep="last")].sort_index()
+
+
+def asset_signals(strategy_path: str, dataset_path: str, params: dict) -> tuple[pd.Series, pd.Series]:
+    """
+    Load one asset and run the strategy over its full history.
+
+    Runs in pool workers, so it takes paths rather than data: each worker
+    reads its own dataset and only the close and signal series travel back.
+    """
+    df = _indexed_dataset(dataset_path)
+    module = load_strategy_module(strategy_path)
+    signals = run_strategy(strategy_entry(module, params), strategy_frame(df.reset_index()))
+    return df["close"], pd.Series(signals, index=df.index)
+
+
+def sandboxed_asset_signals(
+    sandbox: SandboxPool,
+    strategy_path: str,
+    dataset_paths: list[str],
+    params: dict,
+    check: Callable[[], None] | None = None,
+) -> list[tuple[pd.Series, pd.Series]]:
+    """asset_signals() for each asset, with the strategy run in the sandbox."""
+    closes = [None] * len(dataset_paths)
+
+    def frame(item: tuple[int, str]) -> pd.DataFrame:
+        i, path = item
+        df = _indexed_dataset(path)
+        closes[i] = df["close"]
+        return df.reset_index()
+
+    signals = sandbox.map_signals(strategy_path, params, list(enumerate(dataset_paths)), frame, check)
+    return [(close, pd.Series(values, index=close.index)) for close, values in zip(closes, signals)]
+
+
+def run_asset_strategies(
+    strategy_path: str,
+    dataset_paths: list[str],
+    params: dict,
+    max_workers: int,
+    min_pool_assets: int,
+    check: Callable[[], None] | None = None,
+    sandbox: SandboxPool | None = None,
+) -> list[tuple[pd.Series, pd.Series]]:
+    """
+    Per-asset strategy runs, spread over a process pool for large universes,
+    or over the sandbox's processes if `sandbox` is given. `check`, if given,
+    is called between assets and may raise to stop the runs.
+    """
+    if sandbox is not None:
+        return sandboxed_asset_signals(sandbox, strategy_path, dataset_paths, params, check)
+    check = check or (lambda: None)
+    if len(dataset_paths) < min_pool_assets or max_workers <= 1:
+        runs = []
+        for path in dataset_paths:
+            check()
+            runs.append(asset_signals(strategy_path, path, params))
+        return runs
+
+    with process_pool(min(max_workers, len(dataset_paths))) as pool:
+        futures = [pool.submit(asset_signals, strategy_path, path, params) for path in dataset_paths]
+        runs = []
+        for future in futures:
+            try:
+                check()
+            except BaseException:
+                # Queued assets would otherwise still run before the pool exits
+                pool.shutdown(cancel_futures=True)
+                raise
+            runs.append(future.result())
+        return runs
+
+
+def panel_signals(strategy_path: str, close: pd.DataFrame, params: dict) -> pd.DataFrame:
+    """
+    Run a cross-sectional strategy once over the whole close-price panel.
+
+    The strategy receives a DataFrame with one close column per asset and must
+    return signals of the same shape.
+    """
+    module = load_strategy_module(strategy_path)
+    signals = strategy_entry(module, params)(close.copy())
+    if not isinstance(signals, pd.DataFrame):
+        raise ValueError("Panel strategies must return a DataFrame with one signal column per asset")
+    return signals.reindex(index=close.index, columns=close.columns)
+
+
+def align_panel(series: dict[str, pd.Series], how: str) -> pd.DataFrame:
+    """Align per-asset series on the union or intersection of their timestamps."""
+    if how not in ALIGN_MODES:
+        raise ValueError(f"Unknown alignment: {how}. Expected one of {ALIGN_MODES}")
+    join = "inner" if how == "intersection" else "outer"
+    return pd.concat(series, axis=1, join=join).sort_index()
+
+
+def run_portfolio(
+    strategy_path: str,
+    assets: list[dict],
+    config: dict,
+    max_workers: int = 1,
+    min_pool_assets: int = 2,
+    check: Callable[[], None] | None = None,
+    sandbox: SandboxPool | None = None,
+):
+    """
+    Backtest a strategy across several assets sharing one cash account.
+
+    `assets` are {"label", "path"} dicts. Each asset's signal becomes a target
+    position that is scaled by 1 / number of assets into a portfolio weight,
+    so a fully long universe is 100% invested. Bars before an asset's first
+    price (possible with union alignment) are untradable and carry no weight.
+    Returns the aligned close panel and the simulation result. `check` is
+    passed on to run_asset_strategies. With `sandbox`, strategy code runs in
+    its sandbox processes.
+    """
+    labels = [asset["label"] for asset in assets]
+    params = config.get("strategy_params") or {}
+    how = config.get("align", "intersection")
+
+    if config.get("panel"):
+        close = align_panel(
+            {label: _indexed_dataset(asset["path"])["close"] for label, asset in zip(labels, assets)}, how
+        )
+        if sandbox is not None:
+            signals = sandbox.panel(strategy_path, params, close.ffill(), check)
+        else:
+            signals = panel_signals(strategy_path, close.ffill(), params)
+    else:
+        runs = run_asset_strategies(
+            strategy_path, [asset["path"] for asset in assets], params, max_workers, min_pool_assets, check, sandbox
+        )
+        close = align_panel({label: run[0] for label, run in zip(labels, runs)}, how)
+        # Bars missing from an asset's own history keep its previous signal
+        signals = pd.DataFrame(
+            {label: run[1].reindex(close.index, method="ffill") for label, run in zip(labels, runs)},
+            index=close.index,
+        )
+
+    if close.empty:
+        raise ValueError("Datasets have no overlapping timestamps")
+
+    listed = close.notna().cummax().to_numpy()
+    prices = close.ffill().bfill().to_numpy(dtype=np.float64)
+
+    target = signals_to_target(signals.to_numpy(dtype=np.float64), config.get("signal_mode", "hold"))
+    target[~listed] = 0.0
+    weights = target / len(labels)
+
+    sim = simulate_portfolio(
+        prices,
+        weights,
+        config.get("initial_capital", 10000.0),
+        config.get("commission", 0.001),
+    )
+    return close, sim
@@ -0,0 +1,709 @@
+"""
+Pre-forked sandbox processes for running uploaded strategy code.
+
+Strategies are arbitrary Python, so they run in sandbox processes forked
+from the (already warm) worker rather than in the worker itself. A sandbox
+inherits every imported module, serves many runs, and is replaced after
+SANDBOX_MAX_RUNS runs or as soon as a run kills it.
+
+Limits, set in the sandbox before it serves any run:
+- memory: RLIMIT_AS of SANDBOX_MEMORY_BYTES; allocations past it raise
+  MemoryError in the strategy.
+- CPU: each run may use SANDBOX_CPU_SECONDS of CPU time (RLIMIT_CPU is
+  raised run by run, under a hard limit covering the sandbox's lifetime).
+  The kernel kills a sandbox that overruns.
+- wall time: the worker kills a sandbox that has not answered within
+  SANDBOX_WALL_SECONDS, e.g. one stuck in sleep() or I/O.
+- network: the sandbox moves into its own, empty network namespace. Where
+  the kernel refuses (no CAP_SYS_ADMIN and no unprivileged user
+  namespaces), socket creation is disabled in-process instead, which only
+  stops well-behaved code.
+- inherited descriptors: every file descriptor the sandbox inherits from the
+  worker (database, broker and Redis connections, log files) except stdio
+  and its pipe is pointed at /dev/null.
+- filesystem writes: a Landlock ruleset lets the sandbox write only into the
+  files of its own directory under SANDBOX_SHM_DIR, and not create, remove,
+  rename or execute files anywhere; reads are unrestricted. On kernels
+  without Landlock (before 5.13) only RLIMIT_FSIZE of 0 remains, which stops
+  creating or growing files but not overwriting them in place.
+
+Sweeps, walk-forward folds and portfolios run their strategy code in the
+sandbox too: a block of sweep combinations, or one asset, per job.
+
+A killed sandbox fails that run with SandboxError and is replaced; the
+worker process and its other runs are unaffected. Runs are also stopped
+from the worker side: a `check` callback that raises while the worker waits
+(e.g. because the backtest was cancelled) kills the sandbox and propagates.
+
+Data never goes through pickling: a frame's columns are written as .npy
+files under SANDBOX_SHM_DIR (tmpfs, i.e. shared memory) and memory-mapped by
+the sandbox, which writes its output arrays into files preallocated by the
+worker. Only the small job description and the status reply cross the pipe.
+The export is kept for as long as the frame is alive (engine frames stay in
+the dataset cache), up to SANDBOX_SHM_CACHE_BYTES, so later runs over the
+same data - every block of a sweep, the next backtest on a dataset - skip
+the copy. The job also carries the frame's content hash, so the sandbox's
+indicator cache keys the mapped columns without rehashing them; that cache
+lives as long as the sandbox, i.e. up to SANDBOX_MAX_RUNS runs.
+
+Event-engine runs report progress the same way: the sandbox copies the
+equity so far into its output file and counts the bars run in
+its progress output, which the worker reads while it waits.
+"""
+import ctypes
+import logging
+import os
+import queue
+import resource
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import traceback
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import billiard
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.engine.data import assume_content_hash, content_hash, strategy_frame
+from app.engine.events import run_events
+from app.engine.loader import event_strategy, load_strategy, load_strategy_module, run_strategy, strategy_entry
+from app.engine.simulator import SimulationResult
+
+logger = logging.getLogger(__name__)
+
+_CLONE_NEWUSER = 0x10000000
+_CLONE_NEWNET = 0x40000000
+_PR_SET_PDEATHSIG = 1
+_PR_SET_NO_NEW_PRIVS = 38
+
+# Landlock (linux/landlock.h); the syscall numbers are the same on every
+# architecture
+_SYS_LANDLOCK_CREATE_RULESET = 444
+_SYS_LANDLOCK_ADD_RULE = 445
+_SYS_LANDLOCK_RESTRICT_SELF = 446
+_LANDLOCK_CREATE_RULESET_VERSION = 1
+_LANDLOCK_RULE_PATH_BENEATH = 1
+_FS_EXECUTE = 1 << 0
+_FS_WRITE_FILE = 1 << 1
+# REMOVE_DIR, REMOVE_FILE and MAKE_CHAR through MAKE_SYM
+_FS_CHANGE_TREE = sum(1 << bit for bit in range(4, 13))
+_FS_REFER = 1 << 13  # ABI 2
+_FS_TRUNCATE = 1 << 14  # ABI 3
+
+_SIMULATION_FIELDS = ["target", "units", "cash", "equity", "returns", "fills", "commissions"]
+
+
+class SandboxError(Exception):
+    pass
+
+
+def _isolate_network(libc) -> bool:
+    """Move this process into a new network namespace with no interfaces."""
+    for flags in (_CLONE_NEWNET, _CLONE_NEWUSER | _CLONE_NEWNET):
+        if libc.unshare(flags) == 0:
+            return True
+    return False
+
+
+def _disable_sockets() -> None:
+    import socket
+
+    def refuse(*args, **kwargs):
+        raise PermissionError("Network access is disabled for strategies")
+
+    socket.socket = refuse
+    socket.create_connection = refuse
+    socket.socketpair = refuse
+
+
+class _RulesetAttr(ctypes.Structure):
+    _fields_ = [("handled_access_fs", ctypes.c_uint64)]
+
+
+class _PathBeneathAttr(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [("allowed_access", ctypes.c_uint64), ("parent_fd", ctypes.c_int32)]
+
+
+def _restrict_writes(libc, writable_dir: str) -> bool:
+    """
+    Landlock: forbid writing, creating, removing, renaming and executing
+    files, except writing to existing files under `writable_dir`.
+    """
+    libc.syscall.restype = ctypes.c_long
+    abi = libc.syscall(_SYS_LANDLOCK_CREATE_RULESET, None, ctypes.c_size_t(0), _LANDLOCK_CREATE_RULESET_VERSION)
+    if abi < 1:
+        return False
+    handled = _FS_EXECUTE | _FS_WRITE_FILE | _FS_CHANGE_TREE
+    if abi >= 2:
+        handled |= _FS_REFER
+    if abi >= 3:
+        handled |= _FS_TRUNCATE
+    attr = _RulesetAttr(handled)
+    ruleset = libc.syscall(_SYS_LANDLOCK_CREATE_RULESET, ctypes.byref(attr), ctypes.c_size_t(ctypes.sizeof(attr)), 0)
+    if ruleset < 0:
+        return False
+    try:
+        directory = os.open(writable_dir, os.O_PATH | os.O_DIRECTORY)
+        try:
+            rule = _PathBeneathAttr(_FS_WRITE_FILE, directory)
+            if libc.syscall(_SYS_LANDLOCK_ADD_RULE, ruleset, _LANDLOCK_RULE_PATH_BENEATH, ctypes.byref(rule), 0) != 0:
+                return False
+        finally:
+            os.close(directory)
+        # Required to restrict oneself without CAP_SYS_ADMIN
+        if libc.prctl(_PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0) != 0:
+            return False
+        return libc.syscall(_SYS_LANDLOCK_RESTRICT_SELF, ruleset, 0) == 0
+    finally:
+        os.close(ruleset)
+
+
+def _close_inherited_fds(keep: int) -> None:
+    """
+    Point every inherited descriptor but stdio and `keep` at /dev/null. Not
+    closed: objects inherited with them (e.g. pooled database connections)
+    may still write to their numbers, which must not reach a file the
+    strategy opens later.
+    """
+    # Read-only: writing to /dev/null is a file write Landlock refuses
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    for fd in [int(name) for name in os.listdir("/proc/self/fd")]:
+        if fd > 2 and fd not in (keep, devnull):
+            try:
+                os.dup2(devnull, fd)
+            except OSError:
+                pass  # The listing's own descriptor, closed since
+    os.close(devnull)
+
+
+def _cpu_seconds_used() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _load_frame(job: dict) -> pd.DataFrame:
+    columns = {
+        name: np.load(os.path.join(job["data_dir"], f"column_{i}.npy"), mmap_mode="r")
+        for i, name in enumerate(job["columns"])
+    }
+    df = pd.DataFrame(columns, copy=False)
+    assume_content_hash(df, job["data_hash"])
+    return df
+
+
+def _output(job: dict, name: str) -> np.ndarray:
+    return np.load(os.path.join(job["dir"], f"output_{name}.npy"), mmap_mode="r+")
+
+
+def _panel_signals(module, params: dict | None, close: pd.DataFrame) -> np.ndarray:
+    signals = strategy_entry(module, params)(close.copy())
+    if not isinstance(signals, pd.DataFrame):
+        raise ValueError("Panel strategies must return a DataFrame with one signal column per asset")
+    return signals.reindex(index=close.index, columns=close.columns).to_numpy(dtype=np.float64)
+
+
+def _run_job(job: dict) -> None:
+    df = _load_frame(job)
+    if job["kind"] == "signals":
+        strategy = load_strategy(job["strategy_path"], job["params"])
+        _output(job, "signals")[:] = run_strategy(strategy, strategy_frame(df))
+    elif job["kind"] == "signal_matrix":
+        module = load_strategy_module(job["strategy_path"])
+        signals = _output(job, "signals")
+        for j, params in enumerate(job["combinations"]):
+            signals[:, j] = run_strategy(strategy_entry(module, params), strategy_frame(df))
+    elif job["kind"] == "panel":
+        close = df.set_index(job["index"])
+        close.index.name = job["index_name"]
+        module = load_strategy_module(job["strategy_path"])
+        _output(job, "signals")[:] = _panel_signals(module, job["params"], close)
+    elif job["kind"] == "events":
+        equity_out = _output(job, "equity")
+        bars_run = _output(job, "progress")
+
+        def progress(done: int, equity: np.ndarray) -> None:
+            start = int(bars_run[0])
+            equity_out[start:done] = equity[start:done]
+            bars_run[0] = done
+
+        strategy = event_strategy(load_strategy_module(job["strategy_path"]), job["params"])
+        sim = run_events(strategy, df, job["initial_capital"], job["commission"], progress)
+        for name in _SIMULATION_FIELDS:
+            _output(job, name)[:] = getattr(sim, name)
+    else:
+        raise ValueError(f"Unknown sandbox job: {job['kind']}")
+
+
+def _sandbox_main(
+    conn, parent_conn, directory: str, memory_bytes: int, cpu_seconds: int, max_runs: int
+) -> None:
+    libc = ctypes.CDLL(None, use_errno=True)
+    # Die with the worker, even if it is killed before it can stop sandboxes
+    libc.prctl(_PR_SET_PDEATHSIG, signal.SIGKILL)
+    # The worker's end of the pipe: closed here so its exit reads as EOF
+    parent_conn.close()
+    if not _isolate_network(libc):
+        logger.warning("No network namespace for the strategy sandbox; disabling sockets in-process")
+        _disable_sockets()
+    if not _restrict_writes(libc, directory):
+        logger.warning("No Landlock for the strategy sandbox; it can overwrite files it can open")
+    # Writes that would create or grow a file fail (EFBIG) instead of killing
+    signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    # Last: the warnings above may still go to the worker's log file
+    _close_inherited_fds(conn.fileno())
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    # Strategy code could raise its own soft limit, but never past this
+    hard_cpu = int(_cpu_seconds_used()) + cpu_seconds * max_runs + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (hard_cpu, hard_cpu))
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        soft_cpu = min(int(_cpu_seconds_used()) + cpu_seconds + 1, hard_cpu)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft_cpu, hard_cpu))
+        try:
+            _run_job(job)
+            conn.send(("ok", None, None))
+        except BaseException as e:
+            # SystemExit from strategy code fails the run, not the sandbox
+            conn.send(("error", f"{type(e).__name__}: {e}", traceback.format_exc()))
+
+
+class _Sandbox:
+    def __init__(self, context, memory_bytes: int, cpu_seconds: int, max_runs: int, shm_dir: str):
+        os.makedirs(shm_dir, exist_ok=True)
+        # The only place the sandbox may write: its jobs' directories
+        self.dir = tempfile.mkdtemp(dir=shm_dir, prefix="quantflow_sandbox_")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_sandbox_main,
+            args=(child_conn, self.conn, self.dir, memory_bytes, cpu_seconds, max_runs),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.cpu_seconds = cpu_seconds
+        self.runs = 0
+
+    def call(self, job: dict, wall_seconds: float, watch: Callable[[], None] | None = None) -> None:
+        """
+        Run a job; `watch` is called every PROGRESS_INTERVAL_SECONDS while it
+        runs, and if it raises the sandbox is killed.
+        """
+        self.runs += 1
+        deadline = time.monotonic() + wall_seconds
+        interval = settings.PROGRESS_INTERVAL_SECONDS if watch is not None else wall_seconds
+        try:
+            self.conn.send(job)
+            while not self.conn.poll(max(0.0, min(interval, deadline - time.monotonic()))):
+                if time.monotonic() >= deadline:
+                    self.kill()
+                    raise SandboxError(f"Strategy exceeded the {wall_seconds:g}s wall-time limit and was stopped")
+                if watch is not None:
+                    try:
+                        watch()
+                    except BaseException:
+                        self.kill()
+                        raise
+            status, message, trace = self.conn.recv()
+        except (EOFError, OSError):
+            self.kill()
+            raise SandboxError(f"Strategy sandbox died: {self._exit_reason()}")
+        if status == "error":
+            raise SandboxError(f"{message}\n\nStrategy traceback:\n{trace}")
+
+    def _exit_reason(self) -> str:
+        code = self.process.exitcode
+        if code == -signal.SIGXCPU:
+            return f"CPU time limit of {self.cpu_seconds}s exceeded"
+        if code == -signal.SIGKILL:
+            return "killed (out of memory or wall time)"
+        if code is not None and code < 0:
+            return f"killed by signal {-code}"
+        return f"exit code {code}"
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            # SIGKILL: strategy code can ignore or handle SIGTERM
+            try:
+                os.kill(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.process.join()
+        self.conn.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+class _Export:
+    """A frame's columns as .npy files, shared by the jobs that run on it."""
+
+    def __init__(self, path: str, columns: list, data_hash: str, nbytes: int):
+        self.path = path
+        self.columns = columns
+        self.data_hash = data_hash
+        self.nbytes = nbytes
+        self.users = 0
+        self.frame_alive = True
+
+
+class SandboxPool:
+    """
+    Warm sandbox processes owned by one worker process.
+
+    Runs borrow an idle sandbox (or fork one when all are busy) and return it
+    afterwards; sandboxes that died, were killed or reached `max_runs` are
+    replaced by freshly forked ones so the next run starts warm. Frames are
+    exported to `shm_dir` once and kept while they are alive, least recently
+    used first out once the exports exceed `export_bytes`.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        memory_bytes: int,
+        cpu_seconds: int,
+        wall_seconds: float,
+        max_runs: int,
+        shm_dir: str,
+        export_bytes: int = 512 * 1024 * 1024,
+    ):
+        self.size = size
+        self.memory_bytes = memory_bytes
+        self.cpu_seconds = cpu_seconds
+        self.wall_seconds = wall_seconds
+        self.max_runs = max_runs
+        self.shm_dir = shm_dir
+        self.export_bytes = export_bytes
+        self._context = billiard.get_context("fork")
+        self._lock = threading.Lock()
+        self._idle = [self._fork() for _ in range(size)]
+        os.makedirs(shm_dir, exist_ok=True)
+        self._data_dir = tempfile.mkdtemp(dir=shm_dir, prefix="quantflow_data_")
+        # id(frame) -> export of a live frame, least recently used first
+        self._exports: dict[int, _Export] = {}
+        # Exports out of the lookup, deleted once their jobs finish
+        self._retired: list[_Export] = []
+        self._exported_bytes = 0
+
+    def _fork(self) -> _Sandbox:
+        return _Sandbox(self._context, self.memory_bytes, self.cpu_seconds, self.max_runs, self.shm_dir)
+
+    def _acquire(self) -> _Sandbox:
+        with self._lock:
+            while self._idle:
+                sandbox = self._idle.pop()
+                if sandbox.alive():
+                    return sandbox
+                sandbox.kill()
+        return self._fork()
+
+    def _release(self, sandbox: _Sandbox) -> None:
+        if sandbox.alive() and sandbox.runs < self.max_runs:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(sandbox)
+                    return
+        sandbox.kill()
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(self._fork())
+
+    def _export(self, df: pd.DataFrame) -> _Export:
+        """The frame's export, written on its first job; release with _unexport()."""
+        with self._lock:
+            self._evict()
+            export = self._exports.pop(id(df), None)
+            if export is not None:
+                # Most recently used last
+                self._exports[id(df)] = export
+                export.users += 1
+                return export
+
+        path = tempfile.mkdtemp(dir=self._data_dir, prefix="frame_")
+        nbytes = 0
+        for i, name in enumerate(df.columns):
+            values = df[name].to_numpy()
+            if values.dtype == object:
+                values = values.astype(str)
+            np.save(os.path.join(path, f"column_{i}.npy"), values)
+            nbytes += values.nbytes
+        export = _Export(path, list(df.columns), content_hash(df), nbytes)
+        export.users = 1
+
+        with self._lock:
+            existing = self._exports.get(id(df))
+            if existing is None:
+                self._exports[id(df)] = export
+                self._exported_bytes += nbytes
+                # Before the frame's id can be reused. No lock: this may run
+                # from garbage collection in a thread that holds it
+                weakref.finalize(df, setattr, export, "frame_alive", False)
+                return export
+            existing.users += 1
+        # Another thread exported the frame meanwhile
+        shutil.rmtree(path, ignore_errors=True)
+        return existing
+
+    def _unexport(self, export: _Export) -> None:
+        with self._lock:
+            export.users -= 1
+            self._evict()
+
+    def _evict(self) -> None:
+        """
+        Retire exports of frames that are gone, then the least recently used
+        while over `export_bytes`; delete retired exports no job is using.
+        Called with the lock held.
+        """
+        over = self._exported_bytes - self.export_bytes
+        for frame_id, export in list(self._exports.items()):
+            if not export.frame_alive or (over > 0 and export.users == 0):
+                del self._exports[frame_id]
+                self._retired.append(export)
+                over -= export.nbytes
+        for export in [export for export in self._retired if export.users == 0]:
+            self._retired.remove(export)
+            self._exported_bytes -= export.nbytes
+            shutil.rmtree(export.path, ignore_errors=True)
+
+    def _run(
+        self,
+        job: dict,
+        df: pd.DataFrame,
+        outputs: dict[str, tuple[np.dtype, tuple[int, ...]]],
+        sandbox: _Sandbox | None = None,
+        watch: Callable[[str], None] | None = None,
+    ) -> dict[str, np.ndarray]:
+        """
+        Run a job on `df` in an idle sandbox, or in `sandbox`, which the
+        caller acquired and releases. `outputs` maps each output array to
+        its dtype and shape; `watch`, if given, is called with the job's
+        directory while the job runs.
+        """
+        export = self._export(df)
+        borrowed = sandbox is None
+        if borrowed:
+            sandbox = self._acquire()
+        try:
+            # A killed sandbox's directory is gone already
+            with tempfile.TemporaryDirectory(dir=sandbox.dir, prefix="job_", ignore_cleanup_errors=True) as tmp:
+                for name, (dtype, shape) in outputs.items():
+                    np.lib.format.open_memmap(os.path.join(tmp, f"output_{name}.npy"), mode="w+", dtype=dtype, shape=shape)
+
+                sandbox.call(
+                    {
+                        **job,
+                        "dir": tmp,
+                        "data_dir": export.path,
+                        "columns": export.columns,
+                        "data_hash": export.data_hash,
+                    },
+                    self.wall_seconds,
+                    (lambda: watch(tmp)) if watch is not None else None,
+                )
+
+                return {
+                    name: np.array(np.load(os.path.join(tmp, f"output_{name}.npy"), mmap_mode="r"))
+                    for name in outputs
+                }
+        finally:
+            if borrowed:
+                self._release(sandbox)
+            self._unexport(export)
+
+    def signals(
+        self,
+        strategy_path: str,
+        params: dict | None,
+        df: pd.DataFrame,
+        check: Callable[[], None] | None = None,
+    ) -> np.ndarray:
+        """
+        Run a vectorized strategy over the engine frame `df`; returns its
+        signals. `check` is called while it runs and may raise to stop it.
+        """
+        job = {"kind": "signals", "strategy_path": strategy_path, "params": params}
+        watch = (lambda tmp: check()) if check is not None else None
+        return self._run(job, df, {"signals": (np.float64, (len(df),))}, watch=watch)["signals"]
+
+    def signal_matrix(
+        self,
+        strategy_path: str,
+        combinations: list[dict],
+        df: pd.DataFrame,
+        check: Callable[[], None] | None = None,
+    ) -> np.ndarray:
+        """
+        Signals of a vectorized strategy over the engine frame `df` for each
+        parameter combination, as (bars x combinations): one sandbox job for
+        the block. `check` is called while it runs and may raise to stop it.
+        """
+        job = {"kind": "signal_matrix", "strategy_path": strategy_path, "combinations": combinations}
+        watch = (lambda tmp: check()) if check is not None else None
+        outputs = {"signals": (np.float64, (len(df), len(combinations)))}
+        return self._run(job, df, outputs, watch=watch)["signals"]
+
+    def map_signals(
+        self,
+        strategy_path: str,
+        params: dict | None,
+        items: list,
+        frame: Callable[[Any], pd.DataFrame],
+        check: Callable[[], None] | None = None,
+    ) -> list[np.ndarray]:
+        """
+        Signals of a vectorized strategy over the engine frame `frame(item)`
+        of each item (e.g. a portfolio's assets), run in up to `size`
+        sandboxes at a time; frames are built in the threads that wait on
+        them. The sandboxes are forked before those threads start, and all
+        are killed if one run fails or `check` raises.
+        """
+        sandboxes = [self._acquire() for _ in range(max(1, min(self.size, len(items))))]
+        idle: queue.SimpleQueue[_Sandbox] = queue.SimpleQueue()
+        for sandbox in sandboxes:
+            idle.put(sandbox)
+        job = {"kind": "signals", "strategy_path": strategy_path, "params": params}
+        watch = (lambda tmp: check()) if check is not None else None
+
+        def run(item) -> np.ndarray:
+            df = frame(item)
+            sandbox = idle.get()
+            try:
+                return self._run(job, df, {"signals": (np.float64, (len(df),))}, sandbox, watch)["signals"]
+            finally:
+                idle.put(sandbox)
+
+        try:
+            with ThreadPoolExecutor(len(sandboxes)) as executor:
+                futures = [executor.submit(run, item) for item in items]
+                try:
+                    return [future.result() for future in futures]
+                except BaseException:
+                    executor.shutdown(cancel_futures=True)
+                    for sandbox in sandboxes:
+                        sandbox.kill()
+                    raise
+        finally:
+            for sandbox in sandboxes:
+                self._release(sandbox)
+
+    def panel(
+        self,
+        strategy_path: str,
+        params: dict | None,
+        close: pd.DataFrame,
+        check: Callable[[], None] | None = None,
+    ) -> pd.DataFrame:
+        """
+        Run a cross-sectional strategy over the close-price panel (see
+        portfolio.panel_signals); returns its signals aligned to the panel.
+        `check` is called while it runs and may raise to stop it.
+        """
+        frame = close.reset_index(names="__index__")
+        frame.columns = [str(name) for name in frame.columns]
+        job = {
+            "kind": "panel",
+            "strategy_path": strategy_path,
+            "params": params,
+            "index": "__index__",
+            "index_name": close.index.name,
+        }
+        watch = (lambda tmp: check()) if check is not None else None
+        signals = self._run(job, frame, {"signals": (np.float64, close.shape)}, watch=watch)["signals"]
+        return pd.DataFrame(signals, index=close.index, columns=close.columns)
+
+    def events(
+        self,
+        strategy_path: str,
+        params: dict | None,
+        df: pd.DataFrame,
+        initial_capital: float,
+        commission: float,
+        progress: Callable[[int, np.ndarray], None] | None = None,
+        check: Callable[[], None] | None = None,
+    ) -> SimulationResult:
+        """
+        Run an on_bar strategy through the event engine; `progress` is called
+        like run_events' while it runs, at most every PROGRESS_INTERVAL_SECONDS.
+        `check` is called as often and may raise to stop the run.
+        """
+        job = {
+            "kind": "events",
+            "strategy_path": strategy_path,
+            "params": params,
+            "initial_capital": initial_capital,
+            "commission": commission,
+        }
+        outputs = {name: (np.float64, (len(df),)) for name in _SIMULATION_FIELDS}
+        outputs["fills"] = (np.bool_, (len(df),))
+        outputs["progress"] = (np.int64, (1,))
+
+        reported = 0
+
+        def watch(tmp: str) -> None:
+            nonlocal reported
+            if check is not None:
+                check()
+            if progress is None:
+                return
+            done = int(np.load(os.path.join(tmp, "output_progress.npy"))[0])
+            if done > reported:
+                reported = done
+                progress(done, np.load(os.path.join(tmp, "output_equity.npy"), mmap_mode="r")[:done])
+
+        watched = progress is not None or check is not None
+        result = self._run(job, df, outputs, watch=watch if watched else None)
+        del result["progress"]
+        return SimulationResult(**result)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._exports.clear()
+            self._retired.clear()
+            self._exported_bytes = 0
+        for sandbox in idle:
+            sandbox.kill()
+        shutil.rmtree(self._data_dir, ignore_errors=True)
+
+
+_pool: SandboxPool | None = None
+_pool_pid: int | None = None
+
+
+def sandbox_pool() -> SandboxPool:
+    """This process's sandbox pool, forked on first use."""
+    global _pool, _pool_pid
+    # A pool inherited through fork belongs to the parent process
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = SandboxPool(
+            size=settings.SANDBOX_POOL_SIZE,
+            memory_bytes=settings.SANDBOX_MEMORY_BYTES,
+            cpu_seconds=settings.SANDBOX_CPU_SECONDS,
+            wall_seconds=settings.SANDBOX_WALL_SECONDS,
+            max_runs=settings.SANDBOX_MAX_RUNS,
+            shm_dir=settings.SANDBOX_SHM_DIR,
+            export_bytes=settings.SANDBOX_SHM_CACHE_BYTES,
+        )
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def close_sandbox_pool() -> None:
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.close()
+    _pool = None
@@ -0,0 +1,268 @@
+"""
+Vectorized portfolio simulator.
+
+Every array operation below works on whole columns at once, so a backtest
+costs a handful of NumPy passes regardless of how many bars or trades it has.
+Arrays are shaped (bars,) or (bars, columns); each column is an independent
+account, which lets parameter sweeps simulate many signal sets in one call.
+
+Execution model:
+- target[t] is the position (fraction of equity, -1..1) wanted after bar t
+  closes. It is filled at close[t] and held over bar t + 1.
+- Units are sized from equity at the fill and then held until the next fill,
+  so cash and units stay constant between trades.
+- Commission is `commission * |target change| * equity at the fill`.
+
+simulate_window() runs a long series in consecutive windows: each window
+continues from the SimulationCarry of the one before, and the windows'
+results, joined, equal one simulate() pass over the series bit for bit.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+SIGNAL_MODES = ["hold", "target"]
+
+
+@dataclass
+class SimulationResult:
+    target: np.ndarray
+    units: np.ndarray
+    cash: np.ndarray
+    equity: np.ndarray
+    returns: np.ndarray
+    fills: np.ndarray
+    commissions: np.ndarray
+
+
+@dataclass
+class SimulationCarry:
+    """
+    Account state after a window's last bar, which the next window starts
+    from: its target position, the close and commission rate of the most
+    recent fill, the account's growth since the start (cumulative product,
+    without the initial capital) and its equity.
+    """
+    target: np.ndarray
+    anchor_price: np.ndarray
+    anchor_fee: np.ndarray
+    growth: np.ndarray
+    equity: np.ndarray
+
+
+def signals_to_target(signals: np.ndarray, mode: str = "hold", previous: float | np.ndarray = 0.0) -> np.ndarray:
+    """
+    Convert strategy signals into target positions.
+
+    In "hold" mode a 0 (or missing) signal keeps the previous position, so
+    crossover-style strategies that only emit 1/-1 on the crossing bar stay
+    in the market; `previous` is the position held before the first bar. In
+    "target" mode the signal is the position itself and 0 means flat.
+    """
+    if mode not in SIGNAL_MODES:
+        raise ValueError(f"Unknown signal mode: {mode}. Expected one of {SIGNAL_MODES}")
+
+    signals = np.clip(np.nan_to_num(signals, nan=0.0), -1.0, 1.0)
+    if mode == "target":
+        return signals
+
+    # Forward fill the last non-zero signal down each column, -1 before the first
+    n = signals.shape[0]
+    rows = np.arange(n).reshape((n,) + (1,) * (signals.ndim - 1))
+    last = np.where(signals != 0, rows, -1)
+    np.maximum.accumulate(last, axis=0, out=last)
+    target = np.take_along_axis(signals, np.maximum(last, 0), axis=0)
+    return np.where(last >= 0, target, previous)
+
+
+def simulate(
+    close: np.ndarray,
+    target: np.ndarray,
+    initial_capital: float,
+    commission: float,
+) -> SimulationResult:
+    """
+    Simulate fills, commission, cash and equity for target positions.
+
+    `close` is (bars,) or matches `target`; `target` is (bars,) or
+    (bars, columns). Results have the shape of `target`.
+    """
+    return _simulate(close, target, initial_capital, commission, None)[0]
+
+
+def simulate_window(
+    close: np.ndarray,
+    target: np.ndarray,
+    initial_capital: float,
+    commission: float,
+    carry: SimulationCarry,
+) -> tuple[SimulationResult, SimulationCarry]:
+    """
+    simulate() for bars that continue an earlier window of the same account:
+    `carry` is start_carry() before the first window, then the carry
+    returned with the previous window's result.
+    """
+    return _simulate(close, target, initial_capital, commission, carry)
+
+
+def _simulate(
+    close: np.ndarray,
+    target: np.ndarray,
+    initial_capital: float,
+    commission: float,
+    carry: SimulationCarry | None,
+) -> tuple[SimulationResult, SimulationCarry]:
+    squeeze = target.ndim == 1
+    target = np.asarray(target, dtype=np.float64)
+    if squeeze:
+        target = target[:, None]
+    close = np.asarray(close, dtype=np.float64)
+    if close.ndim == 1:
+        close = close[:, None]
+    close = np.broadcast_to(close, target.shape)
+    state = carry if carry is not None else start_carry(close[0], initial_capital)
+
+    n = target.shape[0]
+    prev = np.empty_like(target)
+    prev[0] = state.target
+    prev[1:] = target[:-1]
+    delta = target - prev
+    fills = delta != 0
+
+    # Bar of the most recent fill (-1 before the first fill: the carried one)
+    rows = np.arange(n)[:, None]
+    anchor = np.where(fills, rows, -1)
+    np.maximum.accumulate(anchor, axis=0, out=anchor)
+    before_fill = anchor < 0
+    np.maximum(anchor, 0, out=anchor)
+
+    anchor_price = np.take_along_axis(close, anchor, axis=0)
+    fee = commission * np.abs(delta)
+    anchor_fee = np.take_along_axis(fee, anchor, axis=0)
+    if carry is not None and before_fill.any():
+        anchor_price = np.where(before_fill, state.anchor_price, anchor_price)
+        anchor_fee = np.where(before_fill, state.anchor_fee, anchor_fee)
+
+    # Equity relative to the pre-fill equity of the current holding period
+    value = 1.0 - anchor_fee + target * (close / anchor_price - 1.0)
+
+    # At each fill, the holding period that just ended grows the account by
+    # its value marked at this bar's close
+    growth = np.ones_like(target)
+    growth[0] = 1.0 - state.anchor_fee + prev[0] * (close[0] / state.anchor_price - 1.0)
+    growth[1:] = 1.0 - anchor_fee[:-1] + prev[1:] * (close[1:] / anchor_price[:-1] - 1.0)
+    growth[~fills] = 1.0
+    if carry is None:
+        growth[0] = 1.0
+        cumulative = np.cumprod(growth, axis=0)
+    else:
+        # Continue the carried product, multiplying in the same order as one pass
+        cumulative = np.cumprod(np.concatenate([np.reshape(state.growth, (1, -1)), growth]), axis=0)[1:]
+    base = initial_capital * cumulative
+
+    equity = base * value
+    units = target * base / anchor_price
+    cash = base * (1.0 - anchor_fee - target)
+    commissions = np.where(fills, fee * base, 0.0)
+
+    returns = np.empty_like(equity)
+    returns[0] = equity[0] / state.equity - 1.0
+    returns[1:] = equity[1:] / equity[:-1] - 1.0
+
+    result = SimulationResult(
+        target=target,
+        units=units,
+        cash=cash,
+        equity=equity,
+        returns=returns,
+        fills=fills,
+        commissions=commissions,
+    )
+    next_carry = SimulationCarry(
+        target=target[-1],
+        anchor_price=anchor_price[-1],
+        anchor_fee=anchor_fee[-1],
+        growth=cumulative[-1],
+        equity=equity[-1],
+    )
+    if squeeze:
+        for field in result.__dataclass_fields__:
+            setattr(result, field, getattr(result, field)[:, 0])
+    return result, next_carry
+
+
+def start_carry(first_close: float | np.ndarray, initial_capital: float) -> SimulationCarry:
+    """State of a flat account before its first bar, for simulate_window()."""
+    first_close = np.asarray(first_close, dtype=np.float64)
+    return SimulationCarry(
+        target=np.zeros_like(first_close),
+        anchor_price=first_close,
+        anchor_fee=np.zeros_like(first_close),
+        growth=np.ones_like(first_close),
+        equity=np.full_like(first_close, initial_capital),
+    )
+
+
+def simulate_portfolio(
+    close: np.ndarray,
+    weights: np.ndarray,
+    initial_capital: float,
+    commission: float,
+) -> SimulationResult:
+    """
+    Simulate one shared cash account holding several assets.
+
+    `close` and `weights` are (bars, assets); weights[t, j] is the fraction of
+    account equity wanted in asset j after bar t closes. Whenever any asset's
+    weight changes the whole book is rebalanced to its weights at that close;
+    between rebalances units and cash are held constant. Commission is
+    `commission * sum(|weight change|) * equity at the rebalance`.
+
+    equity, cash, returns, fills and commissions are (bars,); target and
+    units are (bars, assets).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    n = weights.shape[0]
+
+    prev = np.empty_like(weights)
+    prev[0] = 0.0
+    prev[1:] = weights[:-1]
+    turnover = np.abs(weights - prev).sum(axis=1)
+    fills = turnover != 0
+
+    # Bar of the most recent rebalance (0 before the first one, where weights are 0)
+    anchor = np.where(fills, np.arange(n), 0)
+    np.maximum.accumulate(anchor, out=anchor)
+
+    anchor_price = close[anchor]
+    fee = commission * turnover
+    anchor_fee = fee[anchor]
+
+    # Equity relative to the pre-rebalance equity of the current holding period
+    value = 1.0 - anchor_fee + (weights * (close / anchor_price - 1.0)).sum(axis=1)
+
+    growth = np.ones(n)
+    growth[1:] = 1.0 - anchor_fee[:-1] + (prev[1:] * (close[1:] / anchor_price[:-1] - 1.0)).sum(axis=1)
+    growth[~fills] = 1.0
+    growth[0] = 1.0
+    base = initial_capital * np.cumprod(growth)
+
+    equity = base * value
+    units = weights * (base[:, None] / anchor_price)
+    cash = base * (1.0 - anchor_fee - weights.sum(axis=1))
+    commissions = np.where(fills, fee * base, 0.0)
+
+    returns = np.empty(n)
+    returns[0] = equity[0] / initial_capital - 1.0
+    returns[1:] = equity[1:] / equity[:-1] - 1.0
+
+    return SimulationResult(
+        target=weights,
+        units=units,
+        cash=cash,
+        equity=equity,
+        returns=returns,
+        fills=fills,
+        commissions=commissions,
+    )
@@ -0,0 +1,87 @@
+"""
+Parameter sweeps evaluated as (bars x combinations) matrices.
+
+The strategy is still called once per combination (it is arbitrary Python),
+but the dataset is loaded once, and simulation and metrics run over blocks of
+signal columns at a time instead of one backtest per combination.
+
+A block's signals come from a SignalMatrix: in_process_signals() runs the
+strategy in this process, SandboxPool.signal_matrix() in a sandbox.
+"""
+import itertools
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from app.engine.data import find_date_column, strategy_frame
+from app.engine.loader import run_strategy, strategy_entry
+from app.engine.metrics import column_metrics, periods_per_year
+from app.engine.simulator import signals_to_target, simulate
+
+SWEEP_METRICS = ["total_return", "sharpe_ratio", "sortino_ratio", "max_drawdown", "calmar_ratio"]
+
+# (data frame, combinations) -> (bars x combinations) signals
+SignalMatrix = Callable[[pd.DataFrame, list[dict]], np.ndarray]
+
+
+def expand_grid(grid: dict[str, list]) -> list[dict]:
+    """Cartesian product of a parameter grid, in a stable key order."""
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def in_process_signals(module, check: Callable[[], None] | None = None) -> SignalMatrix:
+    """
+    SignalMatrix calling the imported strategy module in this process.
+    `check`, if given, is called before each strategy run and may raise to
+    stop it.
+    """
+    def signals(df: pd.DataFrame, combinations: list[dict]) -> np.ndarray:
+        matrix = np.empty((len(df), len(combinations)), dtype=np.float64)
+        for j, params in enumerate(combinations):
+            if check is not None:
+                check()
+            matrix[:, j] = run_strategy(strategy_entry(module, params), strategy_frame(df))
+        return matrix
+    return signals
+
+
+def run_sweep(
+    df: pd.DataFrame,
+    strategy_signals: SignalMatrix,
+    combinations: list[dict],
+    initial_capital: float,
+    commission: float,
+    signal_mode: str = "hold",
+    max_cells: int = 5_000_000,
+) -> list[dict]:
+    """
+    Backtest every parameter combination against one loaded dataset.
+
+    Combinations are processed in column blocks of at most `max_cells`
+    (bars x columns) cells, which bounds the size of each simulation array.
+    Returns one {"params", "metrics"} entry per combination, in input order.
+    """
+    n = len(df)
+    close = df["close"].to_numpy(dtype=np.float64)
+    date_col = find_date_column(df)
+    periods = periods_per_year(df[date_col] if date_col is not None else None)
+    block = max(1, max_cells // max(n, 1))
+    results = []
+
+    for start in range(0, len(combinations), block):
+        chunk = combinations[start:start + block]
+        signals = strategy_signals(df, chunk)
+
+        target = signals_to_target(signals, signal_mode)
+        sim = simulate(close, target, initial_capital, commission)
+        metrics = column_metrics(sim.equity, sim.returns, initial_capital, periods)
+
+        for j, params in enumerate(chunk):
+            results.append({
+                "params": params,
+                "metrics": {name: float(metrics[name][j]) for name in SWEEP_METRICS},
+            })
+
+    return results
@@ -0,0 +1,341 @@
+"""
+Vectorized trade ledger.
+
+A trade is a run of bars holding a position of one sign: it opens on the fill
+that takes the position away from flat (or flips it) and closes on the fill
+that returns it to flat or flips it again. Resizing without changing sign
+(pyramiding, partial exits) stays within the same trade.
+
+All trades are extracted together from the per-bar units array with diffs,
+cumulative sums and reduceat, so the cost does not depend on the number of
+trades. The ledger is columnar: one array per field.
+"""
+import numpy as np
+
+TRADE_FIELDS = [
+    "entry_bar", "exit_bar", "entry_time", "exit_time", "direction", "size",
+    "entry_price", "exit_price", "pnl", "return", "commission",
+    "holding_bars", "mae", "mfe", "open",
+]
+
+
+def _segment_extreme(ufunc, values: np.ndarray, starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """ufunc.reduce over values[starts[i]:stops[i]] for non-overlapping, ordered, non-empty segments."""
+    bounds = np.empty(2 * len(starts), dtype=np.int64)
+    bounds[0::2] = starts
+    bounds[1::2] = stops
+    # Pad so a segment ending at the last bar still has a valid stop index
+    padded = np.append(values, values[-1])
+    return ufunc.reduceat(padded, bounds)[0::2]
+
+
+def extract_trades(
+    close: np.ndarray,
+    units: np.ndarray,
+    commissions: np.ndarray,
+    high: np.ndarray | None = None,
+    low: np.ndarray | None = None,
+    timestamps: np.ndarray | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Build the trade ledger from a single-account simulation.
+
+    `units` is the position held after each bar's fill and `commissions` the
+    commission paid at each bar. Commission on a flip is split between the
+    closing and the opening trade by the size of each leg. A position still
+    held on the last bar is reported as an open trade marked to its close.
+
+    MAE/MFE are the worst and best price excursions over the bars the trade
+    was held, as a fraction of the entry price in the trade's direction
+    (negative MAE is adverse). High/low are used when given, else close.
+    `size` and `return` refer to the units opened on the entry fill.
+    """
+    ledger = TradeLedger()
+    ledger.add(close, units, commissions, high, low, timestamps)
+    return ledger.trades()
+
+
+class TradeLedger:
+    """
+    extract_trades() over a simulation fed in consecutive windows of bars,
+    for runs too long to hold at once. Running profit and commission sums
+    and the trade still open at the end of a window carry into the next, so
+    the ledger equals one pass over all bars.
+    """
+
+    def __init__(self):
+        self._bars = 0
+        self._units = 0.0
+        self._close = np.nan
+        self._cum_pnl = 0.0
+        self._cum_fee = 0.0
+        self._timestamp = None
+        # Trade open after the last bar added: its entry fields, the profit
+        # and commission sums at entry and the price extremes since
+        self._open: dict | None = None
+        self._parts: list[dict[str, np.ndarray]] = []
+
+    def add(
+        self,
+        close: np.ndarray,
+        units: np.ndarray,
+        commissions: np.ndarray,
+        high: np.ndarray | None = None,
+        low: np.ndarray | None = None,
+        timestamps: np.ndarray | None = None,
+    ) -> None:
+        """Append the next window's bars (arguments as for extract_trades)."""
+        close = np.asarray(close, dtype=np.float64)
+        units = np.asarray(units, dtype=np.float64)
+        commissions = np.asarray(commissions, dtype=np.float64)
+        n = len(units)
+        if n == 0:
+            return
+        high = close if high is None else np.asarray(high, dtype=np.float64)
+        low = close if low is None else np.asarray(low, dtype=np.float64)
+        timestamps = None if timestamps is None else np.asarray(timestamps)
+
+        sign = np.sign(units)
+        prev_units = np.concatenate([[self._units], units[:-1]])
+        prev_sign = np.sign(prev_units)
+        changes = np.flatnonzero(sign != prev_sign)
+
+        entries = changes[sign[changes] != 0]
+        # The next sign change after each entry closes it; none means still open
+        next_change = np.searchsorted(changes, entries, side="right")
+        is_open = next_change >= len(changes)
+        closed = entries[~is_open]
+        exits = changes[next_change[~is_open]]
+
+        # Mark-to-market profit of the units held into each bar, summed from
+        # the run's first bar
+        bar_pnl = np.empty(n)
+        bar_pnl[0] = prev_units[0] * (close[0] - self._close) if self._bars else 0.0
+        bar_pnl[1:] = prev_units[1:] * np.diff(close)
+        cum_pnl = np.cumsum(np.concatenate([[self._cum_pnl], bar_pnl]))[1:]
+
+        # Share of each bar's commission that belongs to the position held after it
+        flip_legs = np.abs(prev_units) + np.abs(units)
+        flipped = sign != prev_sign
+        opening_share = np.where(
+            flipped,
+            np.divide(np.abs(units), flip_legs, out=np.zeros(n), where=flip_legs > 0),
+            1.0,
+        )
+        opening_fee = commissions * opening_share
+        closing_fee = commissions - opening_fee
+        # cum_fee[i]: opening commission paid before bar i
+        cum_fee = np.cumsum(np.concatenate([[self._cum_fee], opening_fee]))
+
+        def time_at(bars):
+            return None if timestamps is None else timestamps[bars]
+
+        if self._open is not None:
+            trade = self._open
+            if len(changes):
+                # Closed by this window's first sign change
+                stop = changes[0]
+                trade["highest"] = max(trade["highest"], high[: stop + 1].max())
+                trade["lowest"] = min(trade["lowest"], low[: stop + 1].min())
+                self._parts.append(self._carried_part(
+                    exit_bar=self._bars + stop,
+                    exit_price=close[stop],
+                    exit_time=time_at(stop),
+                    gross=cum_pnl[stop] - trade["cum_pnl"],
+                    fees=cum_fee[stop] - trade["cum_fee"] + closing_fee[stop],
+                    open=False,
+                ))
+                self._open = None
+            else:
+                trade["highest"] = max(trade["highest"], high.max())
+                trade["lowest"] = min(trade["lowest"], low.min())
+
+        part = {
+            "entry_bar": self._bars + closed,
+            "exit_bar": self._bars + exits,
+            "entry_time": time_at(closed),
+            "exit_time": time_at(exits),
+            "direction": sign[closed],
+            "size": units[closed],
+            "entry_price": close[closed],
+            "exit_price": close[exits],
+            "gross": cum_pnl[exits] - cum_pnl[closed],
+            "fees": cum_fee[exits] - cum_fee[closed] + closing_fee[exits],
+            "highest": np.zeros(0),
+            "lowest": np.zeros(0),
+            "open": np.zeros(len(closed), dtype=bool),
+        }
+        if len(closed):
+            part["highest"] = _segment_extreme(np.maximum, high, closed + 1, exits + 1)
+            part["lowest"] = _segment_extreme(np.minimum, low, closed + 1, exits + 1)
+        self._parts.append(part)
+
+        opened = entries[is_open]
+        if len(opened):
+            entry = opened[0]
+            self._open = {
+                "entry_bar": self._bars + entry,
+                "entry_time": time_at(entry),
+                "direction": sign[entry],
+                "size": units[entry],
+                "entry_price": close[entry],
+                "cum_pnl": cum_pnl[entry],
+                "cum_fee": cum_fee[entry],
+                "highest": high[entry + 1:].max() if entry + 1 < n else -np.inf,
+                "lowest": low[entry + 1:].min() if entry + 1 < n else np.inf,
+            }
+
+        self._bars += n
+        self._units = units[-1]
+        self._close = close[-1]
+        self._cum_pnl = cum_pnl[-1]
+        self._cum_fee = cum_fee[-1]
+        self._timestamp = time_at(-1)
+
+    def _carried_part(self, **fields) -> dict[str, np.ndarray]:
+        """One-trade part for the carried open trade, ending as `fields` say."""
+        trade = self._open
+        fields = {
+            "entry_bar": trade["entry_bar"],
+            "entry_time": trade["entry_time"],
+            "direction": trade["direction"],
+            "size": trade["size"],
+            "entry_price": trade["entry_price"],
+            "highest": trade["highest"],
+            "lowest": trade["lowest"],
+            **fields,
+        }
+        return {
+            name: None if value is None else np.asarray([value])
+            for name, value in fields.items()
+        }
+
+    def trades(self) -> dict[str, np.ndarray]:
+        """The ledger so far; a trade still open is marked to the last close."""
+        parts = list(self._parts)
+        if self._open is not None:
+            trade = self._open
+            parts.append(self._carried_part(
+                exit_bar=self._bars - 1,
+                exit_price=self._close,
+                exit_time=self._timestamp,
+                gross=self._cum_pnl - trade["cum_pnl"],
+                fees=self._cum_fee - trade["cum_fee"],
+                open=True,
+            ))
+        if not parts:
+            return _ledger({
+                "entry_bar": np.zeros(0, dtype=np.int64),
+                "exit_bar": np.zeros(0, dtype=np.int64),
+                "entry_time": None,
+                "exit_time": None,
+                **{name: np.zeros(0) for name in (
+                    "direction", "size", "entry_price", "exit_price", "gross", "fees", "highest", "lowest",
+                )},
+                "open": np.zeros(0, dtype=bool),
+            })
+        return _ledger({
+            name: None if parts[0][name] is None else np.concatenate([part[name] for part in parts])
+            for name in parts[0]
+        })
+
+    def state(self) -> dict:
+        """
+        What carries to the next window, as plain JSON values, for resuming
+        the ledger later with from_state(). Trades already closed are not
+        included.
+        """
+        state = {
+            "bars": int(self._bars),
+            "units": float(self._units),
+            "close": float(self._close),
+            "cum_pnl": float(self._cum_pnl),
+            "cum_fee": float(self._cum_fee),
+            "timestamp": _encode_time(self._timestamp),
+            "open": None,
+        }
+        if self._open is not None:
+            state["open"] = {
+                name: int(value) if name == "entry_bar"
+                else _encode_time(value) if name == "entry_time"
+                else float(value)
+                for name, value in self._open.items()
+            }
+        return state
+
+    @classmethod
+    def from_state(cls, state: dict) -> "TradeLedger":
+        """A ledger continuing from state(), holding only the trades closed after it."""
+        ledger = cls()
+        ledger._bars = state["bars"]
+        ledger._units = state["units"]
+        ledger._close = state["close"]
+        ledger._cum_pnl = state["cum_pnl"]
+        ledger._cum_fee = state["cum_fee"]
+        ledger._timestamp = _decode_time(state["timestamp"])
+        if state["open"] is not None:
+            ledger._open = {**state["open"], "entry_time": _decode_time(state["open"]["entry_time"])}
+        return ledger
+
+
+def _encode_time(value) -> int | None:
+    """A bar timestamp as nanoseconds since the epoch (NaT included)."""
+    return None if value is None else int(np.datetime64(value, "ns").astype(np.int64))
+
+
+def _decode_time(value: int | None):
+    return None if value is None else np.datetime64(value, "ns")
+
+
+def _ledger(columns: dict[str, np.ndarray | None]) -> dict[str, np.ndarray]:
+    """Trade fields from the entry/exit columns a TradeLedger collects."""
+    entries = columns["entry_bar"].astype(np.int64)
+    exits = columns["exit_bar"].astype(np.int64)
+    direction = columns["direction"]
+    size = columns["size"]
+    entry_price = columns["entry_price"]
+    pnl = columns["gross"] - columns["fees"]
+
+    held = exits > entries
+    mfe = np.zeros(len(entries))
+    mae = np.zeros(len(entries))
+    if held.any():
+        highest = columns["highest"][held] / entry_price[held] - 1.0
+        lowest = columns["lowest"][held] / entry_price[held] - 1.0
+        long = direction[held] > 0
+        mfe[held] = np.where(long, highest, -lowest)
+        mae[held] = np.where(long, lowest, -highest)
+
+    trades = {
+        "entry_bar": entries,
+        "exit_bar": exits,
+        "direction": direction.astype(np.int8),
+        "size": size,
+        "entry_price": entry_price,
+        "exit_price": columns["exit_price"],
+        "pnl": pnl,
+        "return": pnl / (np.abs(size) * entry_price),
+        "commission": columns["fees"],
+        "holding_bars": exits - entries,
+        "mae": mae,
+        "mfe": mfe,
+        "open": columns["open"],
+    }
+    if columns["entry_time"] is not None:
+        trades["entry_time"] = columns["entry_time"]
+        trades["exit_time"] = columns["exit_time"]
+    return trades
+
+
+def trade_columns(trades: dict[str, np.ndarray]) -> dict[str, list]:
+    """JSON-ready columnar ledger, timestamps as ISO strings."""
+    columns = {}
+    for field in TRADE_FIELDS:
+        values = trades.get(field)
+        if values is None:
+            continue
+        if values.dtype.kind == "M":
+            columns[field] = np.datetime_as_string(values, unit="s").tolist()
+        else:
+            columns[field] = values.tolist()
+    return columns
@@ -3,8 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.api.v1.routes import api_router
-from app.db.models import Base
-from app.db.session import engine
+from app.db.migrate import upgrade_database
 import os
 
 app = FastAPI(
@@ -34,8 +33,8 @@ def on_startup() -> None:
     ]:
         os.makedirs(path, exist_ok=True)
 
-    # Create DB tables (replace with Alembic in later iterations)
-    Base.metadata.create_all(bind=engine)
+    # Create or upgrade the DB tables
+    upgrade_database()
     
     # Create default user if not exists
     from app.db.session import SessionLocal
@@ -1,85 +1,848 @@
 from app.tasks.celery_app import celery_app
+from app.core.pubsub import get_pubsub, progress_channel
 from app.db.session import SessionLocal
-from app.db.models import Backtest
-import pandas as pd
+from app.db.models import Backtest, Dataset, Strategy
+from app.engine.artifacts import (
+    LEVEL_EQUITY_PREFIX, LEVEL_PREFIX, LEVEL_TIME_PREFIX, RESUME_MEMBER, TRADE_PREFIX, artifact_path, delete_artifact,
+    load_artifact, load_signals, save_artifact, save_signals,
+)
+from app.engine.chunked import Checkpoint, run_chunked
+from app.engine.data import (
+    count_rows, dataset_cache_stats, date_index, file_snapshot, find_date_column, load_dataset, load_range,
+    strategy_frame,
+)
+from app.engine.downsample import equity_levels
+from app.engine.events import run_events
+from app.engine.indicators import cache_stats as indicator_cache_stats
+from app.engine.fingerprint import cache_key, file_hash
+from app.engine.loader import (
+    event_strategy, load_strategy, load_strategy_module, run_strategy, strategy_code_cache_stats,
+)
+from app.engine.simulator import signals_to_target, simulate_window, start_carry
+from app.engine.trades import TradeLedger
+from app.engine.sweep import SignalMatrix, expand_grid, in_process_signals, run_sweep as sweep_combinations
+from app.engine.montecarlo import monte_carlo
+from app.engine.portfolio import run_portfolio
+from app.engine.sandbox import sandbox_pool
+from app.engine.metrics import (
+    PERIODS_PER_YEAR, MetricsAccumulator, backtest_metrics, equity_metrics, periods_per_year, rolling_metrics,
+)
+from app.engine.walkforward import evaluate_fold, stitch_folds, walk_forward_windows
+from celery.utils import uuid
+from app.core.config import settings
 import numpy as np
+import logging
+import os
+import shutil
+import time
 from datetime import datetime
 import traceback
 
+logger = logging.getLogger(__name__)
+
+
+class BacktestCancelled(Exception):
+    pass
+
+
+def _cancel_requested(backtest_id: int) -> bool:
+    """Whether the run has been cancelled, or its row deleted."""
+    db = SessionLocal()
+    try:
+        status = db.query(Backtest.status).filter(Backtest.id == backtest_id).scalar()
+    finally:
+        db.close()
+    return status is None or status in ("cancelling", "cancelled")
+
+
+class _CancelCheck:
+    """
+    Called between engine chunks: raises BacktestCancelled once the run has
+    been cancelled or deleted. Reads the status at most every
+    CANCEL_CHECK_SECONDS.
+    """
+    
+    def __init__(self, backtest_id: int):
+        self.backtest_id = backtest_id
+        self._checked_at = time.monotonic()
+    
+    def __call__(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < settings.CANCEL_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        if _cancel_requested(self.backtest_id):
+            raise BacktestCancelled(f"Backtest {self.backtest_id} was cancelled")
+
+
+def _start_run(db, backtest_id: int) -> Backtest | None:
+    """Mark a queued run as running; None if it was deleted or cancelled first."""
+    started = (
+        db.query(Backtest)
+        .filter(Backtest.id == backtest_id, Backtest.status == "pending")
+        .update({"status": "running", "started_at": datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return db.get(Backtest, backtest_id) if started else None
+
+
+def _end_run(db, backtest_id: int, error: Exception) -> bool:
+    """
+    Record a run stopped by an exception as cancelled or failed, and remove
+    any artifact it already wrote. Written by id: returns False, instead of
+    failing again, when the row was deleted meanwhile.
+    """
+    db.rollback()
+    if isinstance(error, BacktestCancelled):
+        values = {"status": "cancelled", "results": None}
+    else:
+        values = {"status": "failed", "results": {"error": str(error), "traceback": traceback.format_exc()}}
+    updated = (
+        db.query(Backtest)
+        .filter(Backtest.id == backtest_id)
+        .update({**values, "completed_at": datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    delete_artifact(artifact_path(backtest_id))
+    return updated > 0
+
+
+class _Progress:
+    """
+    Publishes a run's progress events: its stage, the percent done and, once
+    known, the metrics so far. A broker outage never fails the run.
+    """
+    
+    def __init__(self, backtest_id: int):
+        self.backtest_id = backtest_id
+        self._published_at = 0.0
+    
+    def __call__(self, stage: str, percent: float, **fields) -> None:
+        event = {"backtest_id": self.backtest_id, "stage": stage, "percent": round(percent, 1), **fields}
+        try:
+            get_pubsub().publish(progress_channel(self.backtest_id), event)
+        except Exception:
+            logger.warning("Could not publish progress of backtest %s", self.backtest_id, exc_info=True)
+        self._published_at = time.monotonic()
+    
+    def bars(
+        self, stage: str, start: float, stop: float, total: int, initial_capital: float, periods_per_year: float
+    ):
+        """
+        Progress callback for run_events: reports the bars run, scaled between
+        `start` and `stop` percent, with the metrics of the equity so far.
+        Throttled to PROGRESS_INTERVAL_SECONDS.
+        """
+        def report(done: int, equity: np.ndarray) -> None:
+            if time.monotonic() - self._published_at < settings.PROGRESS_INTERVAL_SECONDS:
+                return
+            self(
+                stage,
+                start + (stop - start) * done / max(total, 1),
+                bars=done,
+                total_bars=total,
+                metrics=equity_metrics(equity, initial_capital, periods_per_year),
+            )
+        return report
+
+
+def _save_artifact(backtest: Backtest, arrays: dict) -> list:
+    """
+    Write the per-bar output, with the equity curve's chart levels, to the
+    backtest's artifact. Returns the smallest level as the `equity_curve`
+    preview kept in the results.
+    """
+    levels = equity_levels(arrays["equity"], settings.EQUITY_CURVE_LEVELS)
+    for points, bars in levels.items():
+        arrays[f"{LEVEL_PREFIX}{points}"] = bars
+        arrays[f"{LEVEL_EQUITY_PREFIX}{points}"] = arrays["equity"][bars]
+        if arrays.get("timestamps") is not None:
+            arrays[f"{LEVEL_TIME_PREFIX}{points}"] = arrays["timestamps"][bars]
+    backtest.artifact_path = save_artifact(artifact_path(backtest.id), arrays)
+    return arrays["equity"][levels[min(levels)]].tolist()
+
+
+def _strategy_hash(db, backtest: Backtest, strategy_path: str) -> str:
+    strategy = db.get(Strategy, backtest.strategy_id) if backtest.strategy_id else None
+    return strategy.content_hash if strategy and strategy.content_hash else file_hash(strategy_path)
+
+
+def _checkpoint(
+    db, backtest: Backtest, strategy_path: str, dataset_path: str, snapshot: tuple, config: dict,
+    bars: int, carry, ledger: TradeLedger, accumulator: MetricsAccumulator,
+) -> dict:
+    """
+    Artifact member with the run's checkpoint, for continuing it once bars
+    are appended to the dataset; none if the dataset changed during the run,
+    since the bytes it read are then unknown, or if the run ends at an
+    end_date, since appended bars fall after it.
+    """
+    if config.get("end_date"):
+        return {}
+    checkpoint = Checkpoint.after(
+        dataset_path, snapshot[1], _strategy_hash(db, backtest, strategy_path), _warmup_bars(config),
+        bars, carry, ledger, accumulator,
+    )
+    if file_snapshot(dataset_path) != snapshot:
+        logger.info("Dataset changed while backtest %s ran; no checkpoint saved", backtest.id)
+        return {}
+    return {RESUME_MEMBER: np.array(checkpoint.to_json())}
+
+
+def _signal_cache_key(
+    db, backtest: Backtest, strategy_path: str, dataset_path: str, params: dict | None, dates: dict | None = None
+) -> str:
+    """
+    Signals depend only on the strategy source, the data (the bars of a date
+    range, with their warm-up) and the strategy parameters.
+    """
+    dataset = db.get(Dataset, backtest.dataset_id) if backtest.dataset_id else None
+    config = {"strategy_params": params or {}}
+    if dates:
+        config["dates"] = dates
+    return cache_key(
+        "signals",
+        _strategy_hash(db, backtest, strategy_path),
+        [dataset.content_hash if dataset and dataset.content_hash else file_hash(dataset_path)],
+        config,
+    )
+
+
+def _run_signals(strategy_path: str, params: dict | None, df, check: _CancelCheck) -> np.ndarray:
+    if settings.SANDBOX_ENABLED:
+        return sandbox_pool().signals(strategy_path, params, df, check)
+    return run_strategy(load_strategy(strategy_path, params), strategy_frame(df))
+
+
+def _signal_matrix(strategy_path: str, check: _CancelCheck) -> SignalMatrix:
+    """Signals of sweep combinations, run in the sandbox when it is enabled."""
+    if settings.SANDBOX_ENABLED:
+        pool = sandbox_pool()
+        return lambda df, combinations: pool.signal_matrix(strategy_path, combinations, df, check)
+    return in_process_signals(load_strategy_module(strategy_path), check)
+
+
+def _strategy_signals(
+    db, backtest: Backtest, strategy_path: str, dataset_path: str, df, params: dict | None, check: _CancelCheck,
+    dates: dict | None = None,
+) -> np.ndarray:
+    """Run the strategy, or reuse its signals from an earlier backtest on the same data."""
+    if not settings.SIGNAL_CACHE_ENABLED:
+        return _run_signals(strategy_path, params, df, check)
+    
+    key = _signal_cache_key(db, backtest, strategy_path, dataset_path, params, dates)
+    signals = load_signals(key)
+    if signals is None or len(signals) != len(df):
+        signals = _run_signals(strategy_path, params, df, check)
+        save_signals(key, signals)
+    return signals
+
+
+def _chunk_bars(config: dict, dataset_path: str) -> int | None:
+    """Window length for an out-of-core run, or None to load the dataset whole."""
+    if config.get("engine", "vectorized") != "vectorized":
+        return None
+    if config.get("chunk_bars"):
+        return config["chunk_bars"]
+    size = os.path.getsize(dataset_path)
+    start_date, end_date = config.get("start_date"), config.get("end_date")
+    if start_date or end_date:
+        # Only the date range is read
+        index = date_index(dataset_path)
+        if index is not None:
+            size = index.stop_offset(end_date) - index.start_offset(start_date)
+    if size > settings.CHUNKED_DATASET_BYTES:
+        return settings.CHUNK_BARS
+    return None
+
+
+def _warmup_bars(config: dict) -> int:
+    warmup_bars = config.get("warmup_bars")
+    return settings.CHUNK_WARMUP_BARS if warmup_bars is None else warmup_bars
+
+
+def _in_memory_results(
+    db, backtest: Backtest, strategy_path: str, dataset_path: str, config: dict, snapshot: tuple,
+    check: _CancelCheck, progress: _Progress,
+) -> dict:
+    # Load dataset (or the date range, after its warm-up bars) and run the
+    # uploaded strategy against it
+    start_date, end_date = config.get("start_date"), config.get("end_date")
+    dates = None
+    if start_date or end_date:
+        # Event strategies keep their own state; they only see the range
+        warmup_bars = _warmup_bars(config) if config.get("engine", "vectorized") == "vectorized" else 0
+        frame, lead = load_range(dataset_path, start_date, end_date, warmup_bars)
+        dates = {"start_date": start_date, "end_date": end_date, "warmup_bars": warmup_bars}
+    else:
+        frame, lead = load_dataset(dataset_path), 0
+    # The bars traded
+    df = frame.iloc[lead:].reset_index(drop=True) if lead else frame
+    close = df['close'].to_numpy(dtype=np.float64)
+    date_col = find_date_column(df)
+    periods = periods_per_year(df[date_col] if date_col is not None else None)
+    initial_capital = config.get("initial_capital", 10000.0)
+    commission = config.get("commission", 0.001)
+    carry = None
+    
+    if config.get("engine", "vectorized") == "event":
+        # Stateful strategies trade bar by bar through on_bar()
+        progress("simulating", 5, bars=0, total_bars=len(df))
+        report = progress.bars("simulating", 5, 85, len(df), initial_capital, periods)
+        if settings.SANDBOX_ENABLED:
+            sim = sandbox_pool().events(
+                strategy_path, config.get("strategy_params"), df, initial_capital, commission, report, check
+            )
+        else:
+            def on_bars(done: int, equity: np.ndarray) -> None:
+                check()
+                report(done, equity)
+            
+            strategy = event_strategy(load_strategy_module(strategy_path), config.get("strategy_params"))
+            sim = run_events(strategy, df, initial_capital, commission, on_bars)
+    else:
+        progress("strategy", 5)
+        signals = _strategy_signals(
+            db, backtest, strategy_path, dataset_path, frame, config.get("strategy_params"), check, dates
+        )[lead:]
+        check()
+        progress("simulating", 60)
+        target = signals_to_target(signals, config.get("signal_mode", "hold"))
+        # As simulate(), keeping the account state for a checkpoint
+        sim, carry = simulate_window(close, target, initial_capital, commission, start_carry(close[0], initial_capital))
+    progress("metrics", 85, bars=len(df), total_bars=len(df))
+    
+    timestamps = df[date_col].to_numpy() if date_col is not None else None
+    ledger = TradeLedger()
+    ledger.add(
+        close,
+        sim.units,
+        sim.commissions,
+        high=df['high'].to_numpy(dtype=np.float64) if 'high' in df.columns else None,
+        low=df['low'].to_numpy(dtype=np.float64) if 'low' in df.columns else None,
+        timestamps=timestamps,
+    )
+    trades = ledger.trades()
+    
+    metrics = backtest_metrics(sim, close, initial_capital, periods)
+    metrics["total_trades"] = len(trades["pnl"])
+    progress("saving", 90, metrics=metrics)
+    
+    arrays = {
+        "equity": sim.equity,
+        "returns": sim.returns,
+        "cash": sim.cash,
+        "units": sim.units,
+        "target": sim.target,
+        "commissions": sim.commissions,
+        **{f"{TRADE_PREFIX}{field}": values for field, values in trades.items()},
+    }
+    if timestamps is not None:
+        arrays["timestamps"] = timestamps
+    if carry is not None:
+        accumulator = MetricsAccumulator(initial_capital)
+        accumulator.add(sim, close, df[date_col] if date_col is not None else None)
+        arrays.update(_checkpoint(
+            db, backtest, strategy_path, dataset_path, snapshot, config, len(df), carry, ledger, accumulator
+        ))
+    
+    return {
+        "metrics": metrics,
+        "periods_per_year": periods,
+        "rolling": rolling_metrics(sim.returns, config.get("rolling_window", 63), periods),
+        "equity_curve": _save_artifact(backtest, arrays),
+    }
+
+
+def _chunked_results(
+    db, backtest: Backtest, strategy_path: str, dataset_path: str, config: dict, chunk_bars: int,
+    snapshot: tuple, check: _CancelCheck, progress: _Progress, resume: Backtest | None = None,
+) -> dict:
+    """
+    Out-of-core run: the dataset is read, run through the strategy and
+    simulated window by window (see app.engine.chunked). Signals are not
+    cached, since they would be as long as the dataset. With `resume`, the
+    run continues that completed backtest from its checkpoint.
+    """
+    params = config.get("strategy_params")
+    warmup_bars = _warmup_bars(config)
+    checkpoint = None
+    if resume is not None:
+        checkpoint = Checkpoint.load(resume.artifact_path) if resume.artifact_path else None
+        if checkpoint is None:
+            raise ValueError(f"Backtest {resume.id} saved no checkpoint to continue from")
+        if not checkpoint.matches(dataset_path):
+            raise ValueError(f"The dataset changed other than by appended rows since backtest {resume.id} ran")
+    
+    def report(bars: int, fraction: float, metrics: dict) -> None:
+        progress("simulating", 5 + 80 * fraction, bars=bars, metrics=metrics)
+    
+    output_dir = os.path.join(settings.RESULTS_DIR, f"backtest_{backtest.id}_chunks")
+    progress("simulating", 5, bars=0)
+    try:
+        run = run_chunked(
+            dataset_path,
+            lambda window: _run_signals(strategy_path, params, window, check),
+            output_dir,
+            config.get("initial_capital", 10000.0),
+            config.get("commission", 0.001),
+            signal_mode=config.get("signal_mode", "hold"),
+            chunk_bars=chunk_bars,
+            warmup_bars=warmup_bars,
+            check=check,
+            progress=report,
+            resume=checkpoint,
+            resume_artifact=resume.artifact_path if resume is not None else None,
+            start_date=config.get("start_date"),
+            end_date=config.get("end_date"),
+        )
+        progress("metrics", 85, bars=run.bars, total_bars=run.bars)
+        
+        metrics = run.metrics
+        metrics["total_trades"] = len(run.trades["pnl"])
+        progress("saving", 90, metrics=metrics)
+        
+        arrays = {
+            **run.arrays,
+            **{f"{TRADE_PREFIX}{field}": values for field, values in run.trades.items()},
+            **_checkpoint(
+                db, backtest, strategy_path, dataset_path, snapshot, config,
+                run.bars, run.carry, run.ledger, run.accumulator,
+            ),
+        }
+        results = {
+            "metrics": metrics,
+            "periods_per_year": run.periods_per_year,
+            "rolling": rolling_metrics(run.arrays["returns"], config.get("rolling_window", 63), run.periods_per_year),
+            "equity_curve": _save_artifact(backtest, arrays),
+            "chunks": {"chunk_bars": chunk_bars, "warmup_bars": warmup_bars},
+        }
+        if checkpoint is not None:
+            results["extends"] = {
+                "backtest_id": resume.id,
+                "bars_before": checkpoint.bars,
+                "bars_added": run.bars - checkpoint.bars,
+            }
+        return results
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
 @celery_app.task(name="tasks.backtest.run_backtest")
 def run_backtest(backtest_id: int, strategy_path: str, dataset_path: str, config: dict):
     db = SessionLocal()
     
     try:
         # Update status to running
-        backtest = db.query(Backtest).filter(Backtest.id == backtest_id).first()
+        backtest = _start_run(db, backtest_id)
         if not backtest:
-            return {"error": "Backtest not found"}
+            return {"error": "Backtest not found or cancelled"}
         
-        backtest.status = "running"
-        backtest.started_at = datetime.utcnow()
-        db.commit()
+        check = _CancelCheck(backtest_id)
+        progress = _Progress(backtest_id)
+        progress("loading", 0)
+        
+        # Identifies the bytes run, for the checkpoint
+        snapshot = file_snapshot(dataset_path)
+        chunk_bars = _chunk_bars(config, dataset_path)
+        if backtest.extends_id is not None:
+            # Continue the extended run over the bars appended since, chunked
+            # so only they are read (a deleted source runs in full)
+            results = _chunked_results(
+                db, backtest, strategy_path, dataset_path, config, chunk_bars or settings.CHUNK_BARS,
+                snapshot, check, progress, resume=db.get(Backtest, backtest.extends_id),
+            )
+        elif chunk_bars:
+            results = _chunked_results(
+                db, backtest, strategy_path, dataset_path, config, chunk_bars, snapshot, check, progress
+            )
+        else:
+            results = _in_memory_results(
+                db, backtest, strategy_path, dataset_path, config, snapshot, check, progress
+            )
         
-        # Load dataset
-        df = pd.read_csv(dataset_path)
+        # Update backtest with results
+        backtest.status = "completed"
+        backtest.results = results
+        backtest.completed_at = datetime.utcnow()
+        db.commit()
+        progress("completed", 100, metrics=results["metrics"])
         
-        # Normalize column names
-        df.columns = [col.lower() for col in df.columns]
+        return results
         
-        # Basic vectorized backtest simulation (placeholder for real strategy execution)
-        initial_capital = config.get("initial_capital", 10000.0)
-        commission = config.get("commission", 0.001)
+    except BacktestCancelled as e:
+        _end_run(db, backtest_id, e)
+        _Progress(backtest_id)("cancelled", 100)
+        return {"cancelled": True}
         
-        # Simple buy-and-hold strategy as demo
-        df['returns'] = df['close'].pct_change()
-        df['strategy_returns'] = df['returns'] - commission
-        df['equity'] = initial_capital * (1 + df['strategy_returns']).cumprod()
-        df['equity'].fillna(initial_capital, inplace=True)
+    except Exception as e:
+        # Update status to failed
+        if not _end_run(db, backtest_id, e):
+            return {"error": "Backtest deleted"}
+        _Progress(backtest_id)("failed", 100, error=str(e))
+        raise
         
-        # Calculate metrics
-        total_return = (df['equity'].iloc[-1] - initial_capital) / initial_capital
+    finally:
+        db.close()
+
+
+@celery_app.task(name="tasks.backtest.run_sweep")
+def run_sweep(backtest_id: int, strategy_path: str, dataset_path: str, config: dict):
+    """Evaluate a parameter grid against one dataset load and rank the combinations."""
+    db = SessionLocal()
+    
+    try:
+        backtest = _start_run(db, backtest_id)
+        if not backtest:
+            return {"error": "Backtest not found or cancelled"}
         
-        returns = df['strategy_returns'].dropna()
-        sharpe = returns.mean() / returns.std() * np.sqrt(252) if returns.std() > 0 else 0
+        df = load_dataset(dataset_path)
         
-        downside_returns = returns[returns < 0]
-        sortino = returns.mean() / downside_returns.std() * np.sqrt(252) if len(downside_returns) > 0 and downside_returns.std() > 0 else 0
+        base_params = config.get("strategy_params") or {}
+        combinations = [{**base_params, **combo} for combo in expand_grid(config["parameter_grid"])]
         
-        cumulative = (1 + returns).cumprod()
-        running_max = cumulative.expanding().max()
-        drawdown = (cumulative - running_max) / running_max
-        max_drawdown = drawdown.min()
+        evaluated = sweep_combinations(
+            df,
+            _signal_matrix(strategy_path, _CancelCheck(backtest_id)),
+            combinations,
+            initial_capital=config.get("initial_capital", 10000.0),
+            commission=config.get("commission", 0.001),
+            signal_mode=config.get("signal_mode", "hold"),
+            max_cells=settings.SWEEP_MAX_CELLS,
+        )
         
-        calmar = total_return / abs(max_drawdown) if max_drawdown != 0 else 0
+        metric = config.get("metric", "sharpe_ratio")
+        evaluated.sort(key=lambda r: r["metrics"][metric], reverse=True)
         
         results = {
-            "metrics": {
-                "total_return": float(total_return),
-                "sharpe_ratio": float(sharpe),
-                "sortino_ratio": float(sortino),
-                "max_drawdown": float(max_drawdown),
-                "calmar_ratio": float(calmar),
-                "total_trades": 0,  # Placeholder
-            },
-            "equity_curve": df['equity'].tolist()[-100:],  # Last 100 points
-            "trades": [],  # Placeholder
+            "metric": metric,
+            "total_combinations": len(evaluated),
+            "best": evaluated[0] if evaluated else None,
+            "combinations": evaluated,
         }
         
-        # Update backtest with results
         backtest.status = "completed"
         backtest.results = results
         backtest.completed_at = datetime.utcnow()
         db.commit()
         
-        return results
+        return {"metric": metric, "best": results["best"]}
+        
+    except BacktestCancelled as e:
+        _end_run(db, backtest_id, e)
+        return {"cancelled": True}
         
     except Exception as e:
-        # Update status to failed
+        if not _end_run(db, backtest_id, e):
+            return {"error": "Backtest deleted"}
+        raise
+        
+    finally:
+        db.close()
+
+
+@celery_app.task(name="tasks.backtest.run_walk_forward")
+def run_walk_forward(backtest_id: int, strategy_path: str, dataset_path: str, config: dict):
+    """
+    Split the dataset into folds and queue a run per fold, which the scheduler
+    releases within the user's places in the sweep lane. The last fold to end
+    stitches the result.
+    """
+    db = SessionLocal()
+    
+    try:
+        backtest = _start_run(db, backtest_id)
+        if not backtest:
+            return {"error": "Backtest not found or cancelled"}
+        
+        # Stored at ingestion and kept by appends; counted for older datasets
+        dataset = db.query(Dataset).filter(Dataset.id == backtest.dataset_id).first()
+        n_bars = dataset.rows if dataset is not None and dataset.rows is not None else count_rows(dataset_path)
+        folds = walk_forward_windows(
+            n_bars,
+            config["in_sample_bars"],
+            config["out_of_sample_bars"],
+            anchored=config.get("anchored", False),
+        )
+        if not folds:
+            raise ValueError(f"Dataset has {n_bars} bars; not enough for one walk-forward fold")
+        if len(folds) > settings.WALK_FORWARD_MAX_FOLDS:
+            raise ValueError(f"Walk-forward produced {len(folds)} folds; the limit is {settings.WALK_FORWARD_MAX_FOLDS}")
+        
+        # Locked so a cancel or delete either comes first, and no folds are
+        # queued, or finds all of them
+        backtest = db.query(Backtest).filter(Backtest.id == backtest_id).with_for_update().first()
+        if backtest is None or backtest.status != "running":
+            raise BacktestCancelled(f"Backtest {backtest_id} was cancelled")
+        db.add_all(
+            Backtest(
+                user_id=backtest.user_id,
+                strategy_id=backtest.strategy_id,
+                dataset_id=backtest.dataset_id,
+                parent_id=backtest_id,
+                name=f"{backtest.name} fold {fold['fold']}",
+                mode="walk_forward_fold",
+                status="queued",
+                lane="sweep",
+                task_id=uuid(),
+                task_request={"name": "tasks.backtest.walk_forward_fold", "args": [strategy_path, dataset_path]},
+                parameters={**config, "fold": fold},
+            )
+            for fold in folds
+        )
+        db.commit()
+        
+        # Released by the dispatch that follows this task
+        return {"folds": len(folds)}
+        
+    except BacktestCancelled as e:
+        _end_run(db, backtest_id, e)
+        return {"cancelled": True}
+        
+    except Exception as e:
+        if not _end_run(db, backtest_id, e):
+            return {"error": "Backtest deleted"}
+        raise
+        
+    finally:
+        db.close()
+
+
+@celery_app.task(name="tasks.backtest.walk_forward_fold")
+def walk_forward_fold(backtest_id: int, strategy_path: str, dataset_path: str, config: dict):
+    """
+    Optimize one in-sample window and store the winner's out-of-sample
+    returns in the fold's artifact; the walk-forward is then finished if no
+    other fold is left.
+    """
+    db = SessionLocal()
+    
+    try:
+        backtest = _start_run(db, backtest_id)
+        if not backtest:
+            return {"error": "Backtest not found or cancelled"}
+        parent_id = backtest.parent_id
+        
+        # A fold's failure is recorded on its row rather than raised, so the
+        # last fold still finishes the walk-forward, as failed
+        try:
+            df = load_dataset(dataset_path)
+            base_params = config.get("strategy_params") or {}
+            combinations = [{**base_params, **combo} for combo in expand_grid(config["parameter_grid"])]
+            
+            result = evaluate_fold(
+                df,
+                _signal_matrix(strategy_path, _CancelCheck(backtest_id)),
+                combinations,
+                config["fold"],
+                metric=config.get("metric", "sharpe_ratio"),
+                initial_capital=config.get("initial_capital", 10000.0),
+                commission=config.get("commission", 0.001),
+                signal_mode=config.get("signal_mode", "hold"),
+                max_cells=settings.SWEEP_MAX_CELLS,
+            )
+            returns = np.asarray(result.pop("returns"), dtype=np.float64)
+            backtest.artifact_path = save_artifact(artifact_path(backtest_id), {"returns": returns})
+            backtest.status = "completed"
+            backtest.results = result
+            backtest.completed_at = datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            if not _end_run(db, backtest_id, e):
+                return {"error": "Backtest deleted"}
+        
+        _finish_walk_forward(db, parent_id)
+        return {"fold": config["fold"]["fold"]}
+        
+    finally:
+        db.close()
+
+
+def _finish_walk_forward(db, backtest_id: int) -> None:
+    """
+    Once every fold of the walk-forward has ended, stitch their out-of-sample
+    returns into its result, or mark it cancelled or failed, and delete the
+    fold runs. Each fold calls this as it ends; the walk-forward's row is
+    locked so that of two folds ending together only one finishes it.
+    """
+    backtest = db.query(Backtest).filter(Backtest.id == backtest_id).with_for_update().first()
+    folds = db.query(Backtest).filter(Backtest.parent_id == backtest_id).order_by(Backtest.id).all()
+    if (
+        backtest is None
+        or backtest.status not in ("running", "cancelling")
+        or any(fold.status not in ("completed", "failed", "cancelled") for fold in folds)
+    ):
+        db.rollback()
+        return
+    
+    try:
+        failed = [fold for fold in folds if fold.status == "failed"]
+        if backtest.status == "cancelling" or any(fold.status == "cancelled" for fold in folds):
+            backtest.status = "cancelled"
+            backtest.results = None
+        elif failed:
+            backtest.status = "failed"
+            backtest.results = {
+                "error": f"{len(failed)} of {len(folds)} folds failed",
+                "folds": [
+                    {"fold": fold.parameters["fold"]["fold"], "error": fold.results["error"], "traceback": fold.results["traceback"]}
+                    for fold in failed
+                ],
+            }
+        else:
+            periods = folds[0].results["periods_per_year"]
+            stitched = stitch_folds(
+                [{**fold.results, **load_artifact(fold.artifact_path, ["returns"])} for fold in folds],
+                backtest.parameters.get("initial_capital", 10000.0),
+                periods,
+            )
+            backtest.results = {
+                "metrics": stitched["metrics"],
+                "folds": stitched["folds"],
+                "periods_per_year": periods,
+                "equity_curve": _save_artifact(
+                    backtest, {"equity": stitched["equity"], "returns": stitched["returns"]}
+                ),
+            }
+            backtest.status = "completed"
+    except Exception as e:
+        logger.exception("Finishing walk-forward %s failed", backtest_id)
         backtest.status = "failed"
         backtest.results = {"error": str(e), "traceback": traceback.format_exc()}
+    
+    backtest.completed_at = datetime.utcnow()
+    for fold in folds:
+        db.delete(fold)
+    db.commit()
+    for fold in folds:
+        delete_artifact(fold.artifact_path)
+
+
+@celery_app.task(name="tasks.backtest.run_monte_carlo")
+def run_monte_carlo(run_id: int, config: dict):
+    """
+    Bootstrap the strategy returns of a completed backtest.
+
+    `run_id` is the analysis' child run, which only holds an interactive
+    place: the analysis is stored in the parent backtest's results and the
+    child deleted.
+    """
+    db = SessionLocal()
+    backtest = None
+    
+    try:
+        run = _start_run(db, run_id)
+        if not run:
+            return {"error": "Backtest not found or cancelled"}
+        backtest = db.query(Backtest).filter(Backtest.id == run.parent_id).first()
+        
+        returns = load_artifact(backtest.artifact_path, ["returns"])["returns"]
+        analysis = monte_carlo(
+            returns,
+            n_paths=config["n_paths"],
+            initial_capital=backtest.parameters.get("initial_capital", 10000.0),
+            block_size=config.get("block_size", 1),
+            seed=config.get("seed", 42),
+            periods_per_year=backtest.results.get("periods_per_year", PERIODS_PER_YEAR),
+            max_cells=settings.MONTE_CARLO_MAX_CELLS,
+        )
+        
+        # Reassign the dict so SQLAlchemy sees the JSON column change
+        backtest.results = {**backtest.results, "monte_carlo": {"status": "completed", **analysis}}
+        db.delete(run)
+        db.commit()
+        
+        return {"probability_of_loss": analysis["probability_of_loss"]}
+        
+    except Exception as e:
+        db.rollback()
+        if backtest:
+            backtest.results = {
+                **backtest.results,
+                "monte_carlo": {"status": "failed", "error": str(e), "traceback": traceback.format_exc()},
+            }
+        db.query(Backtest).filter(Backtest.id == run_id).delete(synchronize_session=False)
+        db.commit()
+        raise
+        
+    finally:
+        db.close()
+
+
+@celery_app.task(name="tasks.backtest.run_portfolio_backtest")
+def run_portfolio_backtest(backtest_id: int, strategy_path: str, assets: list, config: dict):
+    """Backtest one strategy across several datasets with a shared cash account."""
+    db = SessionLocal()
+    
+    try:
+        backtest = _start_run(db, backtest_id)
+        if not backtest:
+            return {"error": "Backtest not found or cancelled"}
+        
+        initial_capital = config.get("initial_capital", 10000.0)
+        close, sim = run_portfolio(
+            strategy_path,
+            assets,
+            config,
+            max_workers=settings.PORTFOLIO_MAX_WORKERS,
+            min_pool_assets=settings.PORTFOLIO_POOL_MIN_ASSETS,
+            sandbox=sandbox_pool() if settings.SANDBOX_ENABLED else None,
+            check=_CancelCheck(backtest_id),
+        )
+        periods = periods_per_year(close.index)
+        metrics = backtest_metrics(sim, close.ffill().bfill().to_numpy(dtype=np.float64), initial_capital, periods)
+        
+        results = {
+            "metrics": metrics,
+            "periods_per_year": periods,
+            "assets": [
+                {
+                    "dataset_id": asset["dataset_id"],
+                    "label": asset["label"],
+                    "exposure": float(np.abs(sim.target[:, j]).mean()),
+                    "final_weight": float(sim.target[-1, j]),
+                }
+                for j, asset in enumerate(assets)
+            ],
+            "bars": len(close),
+            "equity_curve": _save_artifact(backtest, {
+                "equity": sim.equity,
+                "returns": sim.returns,
+                "cash": sim.cash,
+                "units": sim.units,
+                "target": sim.target,
+                "commissions": sim.commissions,
+                "timestamps": close.index.to_numpy(),
+            }),
+        }
+        
+        backtest.status = "completed"
+        backtest.results = results
         backtest.completed_at = datetime.utcnow()
         db.commit()
+        
+        return {"metrics": results["metrics"]}
+        
+    except BacktestCancelled as e:
+        _end_run(db, backtest_id, e)
+        return {"cancelled": True}
+        
+    except Exception as e:
+        if not _end_run(db, backtest_id, e):
+            return {"error": "Backtest deleted"}
         raise
         
     finally:
         db.close()
+
+
+@celery_app.task(name="tasks.backtest.worker_cache_stats", bind=True)
+def worker_cache_stats(self):
+    """Cache counters of the worker process that runs this task."""
+    return {
+        "hostname": self.request.hostname,
+        "pid": os.getpid(),
+        "datasets": dataset_cache_stats(),
+        "indicators": indicator_cache_stats(),
+        "strategy_code": strategy_code_cache_stats(),
+    }
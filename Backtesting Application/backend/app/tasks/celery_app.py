@@ -1,18 +1,112 @@
+import logging
+
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 celery_app = Celery(
     "quantflow",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
 )
 
+# Priority lanes, one queue each (see app.tasks.scheduler)
+LANES = ["interactive", "batch", "sweep"]
+
+
+def lane_queue(lane: str) -> str:
+    return f"backtests.{lane}"
+
+
 celery_app.conf.update(
+    # Batch runs are sent to their lane explicitly; exact names win over the
+    # pattern
     task_routes={
-        "tasks.backtest.*": {"queue": "backtests"},
+        "tasks.backtest.run_sweep": {"queue": lane_queue("sweep")},
+        "tasks.backtest.run_walk_forward": {"queue": lane_queue("sweep")},
+        "tasks.backtest.walk_forward_fold": {"queue": lane_queue("sweep")},
+        "tasks.backtest.*": {"queue": lane_queue("interactive")},
+        # Users wait on an upload's ingestion before they can run on it
+        "tasks.dataset.*": {"queue": lane_queue("interactive")},
     },
     task_time_limit=60 * 30,
+    # Backtests are long: a worker process reserves one task at a time, so
+    # queued work is not stuck behind a busy process
+    worker_prefetch_multiplier=1,
 )
 
+
+@worker_process_init.connect
+def warm_up_worker(**kwargs):
+    """
+    Pay a worker process's one-off costs before its first task: lazily
+    imported numpy/pandas internals, first-call setup of the engine code
+    paths, SQLAlchemy statement compilation and the database connection.
+    """
+    import io
+    import os
+    import tempfile
+
+    import numpy as np
+    import pandas as pd
+
+    from app.db.models import Backtest
+    from app.db.session import SessionLocal, engine
+    from app.engine.artifacts import save_artifact
+    from app.engine.data import strategy_frame
+    from app.engine.downsample import equity_levels
+    from app.engine.indicators import sma
+    from app.engine.metrics import backtest_metrics, rolling_metrics
+    from app.engine.simulator import signals_to_target, simulate
+    from app.engine.trades import extract_trades, trade_columns
+
+    # Connections inherited from the parent process must not be shared
+    engine.dispose(close=False)
+    db = SessionLocal()
+    try:
+        db.query(Backtest).filter(Backtest.id == -1).first()
+    except Exception as e:
+        # Tasks reconnect on their own; a warm-up failure must not stop the worker
+        logger.warning("Worker warm-up could not query the database: %s", e)
+    finally:
+        db.close()
+
+    # A tiny backtest through the same code paths a task takes
+    csv = "Date,Open,High,Low,Close,Volume\n" + "".join(
+        f"2020-01-{day:02d},{100 + day % 7},{101 + day % 7},{99 + day % 7},{100 + day % 7},1000\n"
+        for day in range(1, 29)
+    )
+    df = pd.read_csv(io.StringIO(csv))
+    df.columns = [col.lower() for col in df.columns]
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    data = strategy_frame(df)
+    signals = np.sign(data["Close"] - sma(data["Close"], 5)).fillna(0.0).to_numpy()
+    close = df["close"].to_numpy(dtype=np.float64)
+    sim = simulate(close, signals_to_target(signals, "hold"), 10000.0, 0.001)
+    trades = extract_trades(close, sim.units, sim.commissions, timestamps=df["date"].to_numpy())
+    trade_columns(trades)
+    backtest_metrics(sim, close, 10000.0)
+    rolling_metrics(sim.returns, 5)
+    with tempfile.TemporaryDirectory() as tmp:
+        save_artifact(os.path.join(tmp, "warm_up.npz"), {"equity": sim.equity, "bars": equity_levels(sim.equity, [10])[10]})
+
+    # Fork the strategy sandboxes last, so they start from the warm process
+    if settings.SANDBOX_ENABLED:
+        from app.engine.sandbox import sandbox_pool
+
+        sandbox_pool()
+
+
+@worker_process_shutdown.connect
+def close_sandboxes(**kwargs):
+    """Stop this process's sandboxes and remove their shared-memory files."""
+    if settings.SANDBOX_ENABLED:
+        from app.engine.sandbox import close_sandbox_pool
+
+        close_sandbox_pool()
+
+
 # Import tasks to register them
-from app.tasks import backtest
+from app.tasks import backtest, dataset, scheduler
@@ -0,0 +1,94 @@
+"""
+Ingestion of uploaded datasets, off the API's event loop.
+
+The upload endpoint only streams the file to disk and checks its header;
+ingest_dataset() then parses it a part at a time, so a multi-gigabyte upload
+takes neither the API's memory nor its time.
+"""
+import logging
+
+import pandas as pd
+
+from app.core.config import settings
+from app.db.models import Dataset
+from app.db.session import SessionLocal
+from app.engine.data import convert_dataset, date_index, find_date_column, iter_dataset
+from app.engine.fingerprint import file_hash
+from app.tasks.celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+def _scan(dataset_path: str) -> tuple[int, pd.Timestamp | None, pd.Timestamp | None]:
+    """Rows, first date and last date of the dataset."""
+    rows = 0
+    first = last = None
+    for chunk, _ in iter_dataset(dataset_path, settings.CHUNK_BARS):
+        rows += len(chunk)
+        date_col = find_date_column(chunk)
+        if date_col is None:
+            continue
+        dates = chunk[date_col].dropna()
+        if len(dates):
+            first = dates.min() if first is None else min(first, dates.min())
+            last = dates.max() if last is None else max(last, dates.max())
+    return rows, first, last
+
+
+def _update(dataset_id: int, values: dict) -> None:
+    db = SessionLocal()
+    try:
+        # Updates nothing if the dataset was deleted meanwhile
+        db.query(Dataset).filter(Dataset.id == dataset_id).update(values, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+@celery_app.task(name="tasks.dataset.ingest_dataset")
+def ingest_dataset(dataset_id: int):
+    """
+    Parse an uploaded dataset: write its columnar copy and date index, store
+    its hash, row count and date range, and mark it `ready`, or `failed`
+    with the reason if the file does not parse. Unexpected errors also mark
+    it `failed`, so it is never left `ingesting`, and fail the task.
+    """
+    try:
+        _ingest(dataset_id)
+    except Exception as e:
+        logger.exception("Ingesting dataset %s failed", dataset_id)
+        try:
+            _update(dataset_id, {"status": "failed", "error": str(e).strip() or type(e).__name__})
+        except Exception:
+            logger.exception("Could not mark dataset %s failed", dataset_id)
+        raise
+
+
+def _ingest(dataset_id: int) -> None:
+    db = SessionLocal()
+    try:
+        dataset = db.get(Dataset, dataset_id)
+        if dataset is None:
+            return  # Deleted meanwhile
+        path = dataset.file_path
+    finally:
+        # No connection held while the file is parsed
+        db.close()
+    try:
+        if settings.DATASET_COLUMNAR:
+            # Scanning then reads slices of the copy instead of the CSV
+            convert_dataset(path)
+        rows, first, last = _scan(path)
+        date_index(path)
+        values = {
+            "rows": rows,
+            "start_date": first,
+            "end_date": last,
+            "content_hash": file_hash(path),
+            "status": "ready",
+        }
+    except (OSError, ValueError) as e:
+        # The upload does not parse: the user's error, not the task's
+        logger.warning("Ingesting dataset %s failed: %s", dataset_id, e)
+        values = {"status": "failed", "error": str(e).strip()}
+    _update(dataset_id, values)
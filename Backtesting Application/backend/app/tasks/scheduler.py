@@ -0,0 +1,172 @@
+"""
+Per-user fair dispatch of backtests.
+
+Tasks run in lanes, one Celery queue each:
+- interactive: single and portfolio backtests and Monte Carlo analyses. A
+  worker that consumes only this lane keeps their latency independent of
+  background load.
+- batch: runs submitted through POST /backtests/batch
+- sweep: parameter sweeps and walk-forward optimizations. A walk-forward
+  queues a run per fold, dispatched like any other run; while its folds
+  exist the walk-forward itself holds no place.
+
+Runs are stored as `queued` rows and released by dispatch(), which keeps
+each user's runs that are pending at the broker or running to
+USER_MAX_CONCURRENCY per batch and sweep lane, and to the higher
+USER_MAX_INTERACTIVE_CONCURRENCY in the interactive lane, and interleaves
+the users it releases. A user's 5,000-run batch therefore holds only a few places in its lane's
+FIFO queue, and other users' runs are not stuck behind it. dispatch() runs
+after each submission, after each backtest task and when a worker starts.
+"""
+import itertools
+import logging
+
+from celery.signals import task_postrun, worker_ready
+from sqlalchemy import exists, func
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.db.models import Backtest, User
+from app.db.session import SessionLocal
+from app.tasks.celery_app import LANES, celery_app, lane_queue
+
+logger = logging.getLogger(__name__)
+
+# Statuses that occupy one of a user's places in a lane
+_ACTIVE_STATUSES = ("pending", "running", "cancelling")
+
+# Tasks whose end may free a place
+_RELEASING_TASKS = {
+    "tasks.backtest.run_backtest",
+    "tasks.backtest.run_portfolio_backtest",
+    "tasks.backtest.run_monte_carlo",
+    "tasks.backtest.run_sweep",
+    "tasks.backtest.run_walk_forward",
+    "tasks.backtest.walk_forward_fold",
+}
+
+
+def dispatch(db: Session, user_ids: list[int] | None = None) -> int:
+    """
+    Send queued runs of the given users (default: all users with
+    queued runs) up to their concurrency cap; returns how many were sent.
+    """
+    if user_ids is None:
+        user_ids = [
+            user_id for (user_id,) in
+            db.query(Backtest.user_id).filter(Backtest.status == "queued").distinct().all()
+        ]
+
+    # A walk-forward waiting on its folds: the folds hold its places
+    fold = aliased(Backtest)
+    has_folds = exists().where(fold.parent_id == Backtest.id)
+
+    released = {}
+    for user_id in sorted(user_ids):
+        # Locks the user's row (where supported) so concurrent dispatchers
+        # cannot both fill the same free places
+        db.query(User.id).filter(User.id == user_id).with_for_update().first()
+        runs = []
+        for lane in LANES:
+            user_lane = (Backtest.user_id == user_id, Backtest.lane == lane)
+            active = (
+                db.query(func.count(Backtest.id))
+                .filter(*user_lane, Backtest.status.in_(_ACTIVE_STATUSES), ~has_folds)
+                .scalar()
+            )
+            free = _lane_cap(lane) - active
+            if free > 0:
+                runs += (
+                    db.query(Backtest)
+                    .filter(*user_lane, Backtest.status == "queued")
+                    .order_by(Backtest.id)
+                    .limit(free)
+                    .all()
+                )
+        for run in runs:
+            run.status = "pending"
+        released[user_id] = runs
+    db.commit()
+
+    # Round-robin over users, so each lane's queue alternates between them
+    order = [run for runs in itertools.zip_longest(*released.values()) for run in runs if run is not None]
+    if not order:
+        return 0
+    for sent, run in enumerate(order):
+        try:
+            celery_app.send_task(
+                run.task_request["name"],
+                args=[run.id, *run.task_request["args"], run.parameters],
+                task_id=run.task_id,
+                queue=lane_queue(run.lane),
+            )
+        except Exception:
+            # Not sent: queue the rest again for the next dispatch
+            for unsent in order[sent:]:
+                unsent.status = "queued"
+            db.commit()
+            raise
+    return len(order)
+
+
+def _lane_cap(lane: str) -> int:
+    if lane == "interactive":
+        return settings.USER_MAX_INTERACTIVE_CONCURRENCY
+    return settings.USER_MAX_CONCURRENCY
+
+
+def queue_depths(db: Session) -> dict:
+    """
+    Per lane: messages waiting at the broker, and runs by status (queued for
+    dispatch, pending at the broker, running) overall and per user.
+    """
+    depths = {
+        lane: {"broker": None, "queued": 0, "pending": 0, "running": 0, "users": {}}
+        for lane in LANES
+    }
+    try:
+        with celery_app.connection_for_read() as connection:
+            # One retry: the endpoint should answer promptly with the broker down
+            connection.ensure_connection(max_retries=1)
+            channel = connection.default_channel
+            for lane in LANES:
+                depths[lane]["broker"] = channel.queue_declare(lane_queue(lane), passive=True).message_count
+    except Exception as e:
+        logger.warning("Could not read broker queue depths: %s", e)
+
+    rows = (
+        db.query(Backtest.lane, Backtest.user_id, Backtest.status, func.count(Backtest.id))
+        .filter(Backtest.status.in_(("queued", "pending", "running", "cancelling")))
+        .group_by(Backtest.lane, Backtest.user_id, Backtest.status)
+        .all()
+    )
+    for lane, user_id, status, count in rows:
+        # Rows from before lanes ran on the interactive worker
+        lane = depths[lane or "interactive"]
+        status = "running" if status == "cancelling" else status
+        user = lane["users"].setdefault(user_id, {"queued": 0, "pending": 0, "running": 0})
+        lane[status] += count
+        user[status] += count
+    return depths
+
+
+def _dispatch_safely() -> None:
+    db = SessionLocal()
+    try:
+        dispatch(db)
+    except Exception:
+        logger.exception("Dispatching queued backtests failed")
+    finally:
+        db.close()
+
+
+@task_postrun.connect
+def dispatch_after_run(sender=None, **kwargs):
+    if sender is not None and sender.name in _RELEASING_TASKS:
+        _dispatch_safely()
+
+
+@worker_ready.connect
+def dispatch_on_start(**kwargs):
+    """Release runs left queued while no worker was there to finish tasks."""
+    _dispatch_safely()
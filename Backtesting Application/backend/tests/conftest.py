@@ -0,0 +1,84 @@
+"""
+Shared fixtures. Settings are read at import, so the environment points the
+app at a throwaway SQLite database and storage directories before any app
+module is imported; tasks sent to Celery run in the test process.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+_root = tempfile.mkdtemp(prefix="quantflow_tests_")
+atexit.register(shutil.rmtree, _root, ignore_errors=True)
+os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(_root, 'quantflow.db')}"
+for _name in ["UPLOAD_DIR", "STRATEGY_DIR", "DATASET_DIR", "RESULTS_DIR"]:
+    os.environ[_name] = os.path.join(_root, _name.lower())
+os.environ["PROGRESS_BROKER"] = "memory"
+# Strategies run in-process; tests/test_sandbox.py covers the sandbox
+os.environ["SANDBOX_ENABLED"] = "false"
+
+import numpy as np
+import pandas as pd
+import pytest
+
+EXAMPLE_STRATEGIES = os.path.join(os.path.dirname(__file__), "..", "..", "example_strategies")
+
+
+def write_dataset(path, bars: int, seed: int = 0, start: str = "2020-01-01") -> pd.DataFrame:
+    """A random-walk OHLCV CSV at `path`; returns its rows."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    df = pd.DataFrame({
+        "Date": pd.date_range(start, periods=bars, freq="D").strftime("%Y-%m-%d"),
+        "Open": close * (1 + rng.normal(0, 0.002, bars)),
+        "High": close * 1.01,
+        "Low": close * 0.99,
+        "Close": close,
+        "Volume": rng.integers(1000, 5000, bars),
+    })
+    df.to_csv(path, index=False)
+    return df
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+
+    from app.core import pubsub
+    from app.db.models import Base
+    from app.db.session import engine
+    from app.main import app
+    from app.tasks import backtest  # noqa: F401 - registers the tasks
+    from app.tasks.celery_app import celery_app
+
+    def send_task(name, args=None, kwargs=None, task_id=None, **options):
+        return celery_app.tasks[name].apply(args, kwargs, task_id=task_id)
+
+    original = celery_app.send_task
+    celery_app.send_task = send_task
+    # Groups are applied through the task classes rather than send_task
+    celery_app.conf.task_always_eager = True
+    try:
+        # Entering runs startup: directories, migrations and the default user
+        with TestClient(app) as test_client:
+            yield test_client
+    finally:
+        celery_app.send_task = original
+        celery_app.conf.task_always_eager = False
+        # Each test starts from empty tables, and no progress events of
+        # earlier runs with the same ids
+        with engine.begin() as connection:
+            for table in reversed(Base.metadata.sorted_tables):
+                connection.execute(table.delete())
+        pubsub._pubsub = None
+
+
+@pytest.fixture
+def db():
+    from app.db.session import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,476 @@
+import asyncio
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.pubsub import get_pubsub, progress_channel
+from app.db.models import Backtest, Dataset, Strategy
+from app.engine.artifacts import artifact_fields, load_artifact
+from app.engine.data import load_dataset
+from app.engine.simulator import signals_to_target, simulate
+
+from conftest import EXAMPLE_STRATEGIES, write_dataset
+
+SMA = os.path.join(EXAMPLE_STRATEGIES, "sma_crossover.py")
+
+
+@pytest.fixture
+def rows(client, db, tmp_path):
+    """A strategy and a dataset; returns their ids and the dataset's path."""
+    path = str(tmp_path / "prices.csv")
+    write_dataset(path, 2000, seed=11)
+
+    strategy = Strategy(user_id=1, name="sma", file_path=SMA)
+    dataset = Dataset(user_id=1, name="prices", type="uploaded", file_path=path)
+    db.add_all([strategy, dataset])
+    db.commit()
+    return strategy.id, dataset.id, path
+
+
+def _submit(client, strategy_id: int, dataset_id: int, **fields) -> dict:
+    response = client.post("/api/v1/backtests", json={
+        "name": "test",
+        "strategy_id": strategy_id,
+        "dataset_id": dataset_id,
+        **fields,
+    })
+    assert response.status_code == 200, response.json()
+    return response.json()
+
+
+def _completed(client, db, backtest_id: int) -> Backtest:
+    assert client.get(f"/api/v1/backtests/{backtest_id}").json()["status"] == "completed"
+    db.expire_all()
+    return db.get(Backtest, backtest_id)
+
+
+def test_backtest_simulates_the_strategy_signals(client, db, rows):
+    strategy_id, dataset_id, path = rows
+    backtest = _completed(client, db, _submit(client, strategy_id, dataset_id, commission=0.002)["backtest_id"])
+
+    # The example with its defaults: long while the 20-bar average is above the 50-bar one
+    close = load_dataset(path)["close"]
+    short, long = close.rolling(20).mean(), close.rolling(50).mean()
+    signals = np.where(short > long, 1.0, np.where(short < long, -1.0, 0.0))
+    sim = simulate(close.to_numpy(), signals_to_target(signals), 10_000.0, 0.002)
+
+    stored = load_artifact(backtest.artifact_path, ["equity"])
+    np.testing.assert_allclose(stored["equity"], sim.equity, rtol=1e-12)
+    assert backtest.results["metrics"]["total_return"] == pytest.approx(sim.equity[-1] / 10_000.0 - 1)
+
+
+def test_equity_views_match_the_stored_curve(client, db, rows):
+    strategy_id, dataset_id, path = rows
+    backtest = _completed(client, db, _submit(client, strategy_id, dataset_id)["backtest_id"])
+    equity = load_artifact(backtest.artifact_path, ["equity"])["equity"]
+    dates = load_dataset(path)["date"].dt.strftime("%Y-%m-%dT%H:%M:%S").to_numpy()
+
+    # Served from the stored 500-point level, then from the full curve
+    for params in [{"points": 300}, {"points": 300, "start": 100, "end": 1500}, {"points": 300, "method": "minmax"}]:
+        curve = client.get(f"/api/v1/backtests/{backtest.id}/equity", params=params).json()
+        bars = np.asarray(curve["bars"])
+        assert len(bars) <= 300
+        assert params.get("start", 0) <= bars.min() and bars.max() < params.get("end", len(equity))
+        np.testing.assert_array_equal(curve["equity"], equity[bars])
+        assert curve["timestamps"] == dates[bars].tolist()
+
+
+@pytest.mark.parametrize("fields", [{}, {"chunk_bars": 300}])
+def test_date_range_trades_only_its_bars(client, db, rows, monkeypatch, fields):
+    from app.engine import data
+
+    # Index entries every 64 rows, so the run seeks into the file
+    monkeypatch.setattr(data, "DATE_INDEX_STRIDE", 64)
+    strategy_id, dataset_id, path = rows
+    backtest = _completed(client, db, _submit(
+        client, strategy_id, dataset_id, start_date="2021-01-01", end_date="2022-06-30", warmup_bars=100, **fields
+    )["backtest_id"])
+
+    # The warm-up covers the longest average, so the range's signals are the full run's
+    df = load_dataset(path)
+    close = df["close"]
+    short, long = close.rolling(20).mean(), close.rolling(50).mean()
+    signals = np.where(short > long, 1.0, np.where(short < long, -1.0, 0.0))
+    in_range = ((df["date"] >= "2021-01-01") & (df["date"] <= "2022-06-30")).to_numpy()
+    sim = simulate(close.to_numpy()[in_range], signals_to_target(signals[in_range]), 10_000.0, 0.001)
+
+    stored = load_artifact(backtest.artifact_path, ["equity", "timestamps"])
+    np.testing.assert_array_equal(stored["timestamps"], df["date"].to_numpy()[in_range])
+    np.testing.assert_allclose(stored["equity"], sim.equity, rtol=1e-12)
+
+
+def test_reversed_date_range_is_rejected(client, rows):
+    strategy_id, dataset_id, _ = rows
+    response = client.post("/api/v1/backtests", json={
+        "name": "test",
+        "strategy_id": strategy_id,
+        "dataset_id": dataset_id,
+        "start_date": "2022-01-01",
+        "end_date": "2021-01-01",
+    })
+    assert response.status_code == 400
+
+
+def test_progress_ends_with_the_completed_run(client, db, rows):
+    strategy_id, dataset_id, _ = rows
+    backtest = _completed(client, db, _submit(client, strategy_id, dataset_id)["backtest_id"])
+
+    last = get_pubsub().last(progress_channel(backtest.id))
+    assert last["stage"] == "completed" and last["percent"] == 100
+    assert last["metrics"] == backtest.results["metrics"]
+
+    # A finished run's stream is its final event, read from the database
+    response = client.get(f"/api/v1/backtests/{backtest.id}/events")
+    assert response.headers["content-type"].startswith("text/event-stream")
+    (event,) = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    assert event == last
+    assert client.get("/api/v1/backtests/0/events").status_code == 404
+
+
+def test_stream_relays_a_running_backtests_events(client, db, rows):
+    from app.api.v1.endpoints.backtests import _progress_stream
+
+    strategy_id, dataset_id, _ = rows
+    backtest = Backtest(
+        user_id=1, name="running", strategy_id=strategy_id, dataset_id=dataset_id, parameters={}, status="running"
+    )
+    db.add(backtest)
+    db.commit()
+    channel = progress_channel(backtest.id)
+    events = [
+        {"backtest_id": backtest.id, "stage": "simulating", "percent": 40.0},
+        {"backtest_id": backtest.id, "stage": "completed", "percent": 100},
+    ]
+
+    async def stream() -> list[str]:
+        # Published from another thread, as by a worker, once the stream listens
+        publisher = threading.Timer(0.2, lambda: [get_pubsub().publish(channel, event) for event in events])
+        publisher.start()
+        try:
+            return [message async for message in _progress_stream(backtest.id)]
+        finally:
+            publisher.join()
+
+    assert asyncio.run(stream()) == [f"data: {json.dumps(event)}\n\n" for event in events]
+
+
+def test_cancel_stops_a_running_backtest(client, db, rows, monkeypatch):
+    from app.core.config import settings
+    from app.tasks import backtest as tasks
+    from app.tasks.celery_app import celery_app
+
+    monkeypatch.setattr(celery_app.control, "revoke", lambda task_id: None)
+    monkeypatch.setattr(settings, "CANCEL_CHECK_SECONDS", 0.0)
+    # Signals cached by earlier tests would skip the strategy
+    monkeypatch.setattr(settings, "SIGNAL_CACHE_ENABLED", False)
+    responses = []
+
+    def cancel_meanwhile(strategy, data):
+        # The user cancels while the strategy runs
+        backtest_id = db.query(Backtest.id).filter(Backtest.status == "running").scalar()
+        responses.append(client.post(f"/api/v1/backtests/{backtest_id}/cancel").json())
+        return run_strategy(strategy, data)
+
+    run_strategy = tasks.run_strategy
+    monkeypatch.setattr(tasks, "run_strategy", cancel_meanwhile)
+    strategy_id, dataset_id, _ = rows
+    backtest_id = _submit(client, strategy_id, dataset_id)["backtest_id"]
+
+    assert responses == [{"backtest_id": backtest_id, "status": "cancelling"}]
+    db.expire_all()
+    backtest = db.get(Backtest, backtest_id)
+    assert backtest.status == "cancelled" and backtest.results is None
+    assert get_pubsub().last(progress_channel(backtest_id))["stage"] == "cancelled"
+    # Finished: nothing left to cancel, and not served to identical requests
+    assert client.post(f"/api/v1/backtests/{backtest_id}/cancel").status_code == 400
+    assert not _submit(client, strategy_id, dataset_id)["cached"]
+
+
+def test_cancel_revokes_a_queued_backtest(client, db, rows, monkeypatch):
+    from app.tasks.backtest import run_backtest
+    from app.tasks.celery_app import celery_app
+
+    revoked = []
+    monkeypatch.setattr(celery_app.control, "revoke", revoked.append)
+    strategy_id, dataset_id, path = rows
+    backtest = Backtest(
+        user_id=1, name="queued", strategy_id=strategy_id, dataset_id=dataset_id, parameters={}, task_id="queued-task"
+    )
+    db.add(backtest)
+    db.commit()
+
+    response = client.post(f"/api/v1/backtests/{backtest.id}/cancel").json()
+    assert response == {"backtest_id": backtest.id, "status": "cancelled"}
+    assert revoked == ["queued-task"]
+
+    # A worker that picks the task up anyway does not start it
+    assert run_backtest(backtest.id, SMA, path, {}) == {"error": "Backtest not found or cancelled"}
+    db.expire_all()
+    assert db.get(Backtest, backtest.id).status == "cancelled"
+
+
+def test_identical_request_is_served_from_cache(client, db, rows):
+    strategy_id, dataset_id, _ = rows
+    first = _submit(client, strategy_id, dataset_id)
+    again = _submit(client, strategy_id, dataset_id, name="renamed")
+
+    assert not first["cached"]
+    assert again["cached"] and again["backtest_id"] == first["backtest_id"]
+    assert again["status"] == "completed"
+    # Older rows are hashed on first use
+    assert db.get(Strategy, strategy_id).content_hash is not None
+    # A setting that changes the result is another run
+    assert not _submit(client, strategy_id, dataset_id, commission=0.002)["cached"]
+
+
+def test_cache_reports_the_runs_own_status(client, db, rows):
+    strategy_id, dataset_id, _ = rows
+    backtest = _completed(client, db, _submit(client, strategy_id, dataset_id)["backtest_id"])
+
+    backtest.status = "running"
+    db.commit()
+    again = _submit(client, strategy_id, dataset_id)
+    assert again["cached"] and again["status"] == "running"
+
+    # A completed run whose artifact is gone is run again
+    backtest.status = "completed"
+    db.commit()
+    os.remove(backtest.artifact_path)
+    assert not _submit(client, strategy_id, dataset_id)["cached"]
+
+
+@pytest.fixture
+def growing(client, db, tmp_path):
+    """
+    A strategy and a dataset of 2,000 bars that can grow to 3,000; returns
+    their ids and a function appending the next bars through the API.
+    """
+    path = str(tmp_path / "prices.csv")
+    frame = write_dataset(path, 3000, seed=11)
+    frame.iloc[:2000].to_csv(path, index=False)
+
+    strategy = Strategy(user_id=1, name="sma", file_path=SMA)
+    dataset = Dataset(user_id=1, name="prices", type="uploaded", file_path=path)
+    db.add_all([strategy, dataset])
+    db.commit()
+    appended = [2000]
+
+    def append(count: int) -> None:
+        upload = tmp_path / "append.csv"
+        frame.iloc[appended[0]:appended[0] + count].to_csv(upload, index=False)
+        with open(upload, "rb") as f:
+            response = client.post(f"/api/v1/datasets/{dataset.id}/append", files={"file": ("append.csv", f, "text/csv")})
+        assert response.status_code == 200, response.json()
+        assert response.json()["rows_appended"] == count
+        appended[0] += count
+
+    return strategy.id, dataset.id, append
+
+
+def test_append_rejects_rows_that_do_not_follow_the_dataset(client, db, growing, tmp_path):
+    _, dataset_id, append = growing
+    append(100)
+    path = db.get(Dataset, dataset_id).file_path
+    with open(path, "rb") as f:
+        before = f.read()
+
+    # The last 50 bars again: they start before the dataset's last date
+    upload = tmp_path / "overlap.csv"
+    pd.read_csv(path).iloc[-50:].to_csv(upload, index=False)
+    with open(upload, "rb") as f:
+        response = client.post(f"/api/v1/datasets/{dataset_id}/append", files={"file": ("overlap.csv", f, "text/csv")})
+    assert response.status_code == 400 and "last date" in response.json()["detail"]
+    with open(path, "rb") as f:
+        assert f.read() == before
+    # The streamed upload is removed
+    assert not [name for name in os.listdir(os.path.dirname(path)) if name.endswith(".append")]
+
+
+def test_dataset_change_invalidates_cache_key(client, db, growing):
+    strategy_id, dataset_id, append = growing
+    first = _submit(client, strategy_id, dataset_id)
+    key = _completed(client, db, first["backtest_id"]).cache_key
+
+    append(100)
+    after = _submit(client, strategy_id, dataset_id)
+
+    assert not after["cached"] and after["backtest_id"] != first["backtest_id"]
+    assert _completed(client, db, after["backtest_id"]).cache_key != key
+
+
+@pytest.mark.parametrize("fields", [{}, {"chunk_bars": 700, "warmup_bars": 100}])
+def test_extend_equals_full_rerun(client, db, growing, fields):
+    strategy_id, dataset_id, append = growing
+    source = _submit(client, strategy_id, dataset_id, **fields)["backtest_id"]
+
+    # Nothing appended yet
+    assert client.post(f"/api/v1/backtests/{source}/extend").status_code == 400
+    for count in (400, 600):
+        append(count)
+        extended = client.post(f"/api/v1/backtests/{source}/extend").json()
+        assert extended["extends"] == source and not extended["cached"]
+        # Repeats attach to the extension and report its own status
+        again = client.post(f"/api/v1/backtests/{source}/extend").json()
+        assert again["cached"] and again["backtest_id"] == extended["backtest_id"]
+        assert again["status"] == "completed"
+        source = extended["backtest_id"]
+    extended = _completed(client, db, source)
+
+    rerun = _completed(client, db, _submit(client, strategy_id, dataset_id, **fields)["backtest_id"])
+    assert rerun.id != extended.id
+    fields_saved = sorted(name for name in artifact_fields(rerun.artifact_path) if name != "resume_state")
+    assert fields_saved == sorted(name for name in artifact_fields(extended.artifact_path) if name != "resume_state")
+    a = load_artifact(extended.artifact_path, fields_saved)
+    b = load_artifact(rerun.artifact_path, fields_saved)
+    assert len(b["equity"]) == 3000
+    for name in fields_saved:
+        np.testing.assert_array_equal(a[name], b[name], err_msg=name)
+    assert extended.results["periods_per_year"] == pytest.approx(rerun.results["periods_per_year"], rel=1e-12)
+    for name, value in rerun.results["metrics"].items():
+        assert extended.results["metrics"][name] == pytest.approx(value, rel=1e-9), name
+
+
+def test_cost_only_change_reuses_the_strategy_signals(client, db, rows):
+    from app.core.config import settings
+
+    strategy_id, dataset_id, _ = rows
+    signal_dir = os.path.join(settings.RESULTS_DIR, "signals")
+    shutil.rmtree(signal_dir, ignore_errors=True)
+    _completed(client, db, _submit(client, strategy_id, dataset_id)["backtest_id"])
+    (cached,) = os.listdir(signal_dir)
+
+    # Flat signals in place of the cached ones: a run that reads them never trades
+    np.save(os.path.join(signal_dir, cached), np.zeros(2000))
+    backtest = _completed(client, db, _submit(client, strategy_id, dataset_id, commission=0.002)["backtest_id"])
+    assert backtest.results["metrics"]["total_return"] == 0.0
+    assert os.listdir(signal_dir) == [cached]
+
+
+def test_batch_ranks_its_completed_runs(client, db, rows):
+    strategy_id, dataset_id, _ = rows
+    windows = [5, 10, 20, 30]
+    response = client.post("/api/v1/backtests/batch", json={
+        "name": "windows",
+        "runs": [
+            {"strategy_id": strategy_id, "dataset_id": dataset_id, "strategy_params": {"short_window": w}}
+            for w in windows
+        ],
+    })
+    assert response.status_code == 200, response.json()
+    batch = response.json()
+    assert batch["runs"] == len(windows)
+
+    db.expire_all()
+    runs = [db.get(Backtest, backtest_id) for backtest_id in batch["backtest_ids"]]
+    assert [run.name for run in runs] == [f"windows #{i}" for i in range(1, len(windows) + 1)]
+    assert [run.parameters["strategy_params"]["short_window"] for run in runs] == windows
+    assert len({run.task_id for run in runs}) == len(windows)
+    # Hashed once for the batch and kept
+    assert db.get(Dataset, dataset_id).content_hash is not None
+
+    for metric in ["sharpe_ratio", "max_drawdown"]:
+        status = client.get(f"/api/v1/backtests/batch/{batch['batch_id']}", params={"metric": metric}).json()
+        assert status["status"] == "completed" and status["counts"] == {"completed": len(windows)}
+        expected = sorted(runs, key=lambda run: run.results["metrics"][metric], reverse=True)
+        assert [entry["backtest_id"] for entry in status["leaderboard"]] == [run.id for run in expected]
+        assert [entry["rank"] for entry in status["leaderboard"]] == [1, 2, 3, 4]
+
+    # The batch's runs serve later identical single submissions
+    again = _submit(client, strategy_id, dataset_id, strategy_params={"short_window": 10})
+    assert again["cached"] and again["backtest_id"] == runs[1].id
+
+
+def test_batch_beyond_the_user_cap_drains(client, db, rows, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "USER_MAX_CONCURRENCY", 2)
+    strategy_id, dataset_id, _ = rows
+    response = client.post("/api/v1/backtests/batch", json={
+        "name": "drain",
+        "runs": [
+            {"strategy_id": strategy_id, "dataset_id": dataset_id, "strategy_params": {"short_window": w}}
+            for w in range(5, 10)
+        ],
+    })
+    assert response.status_code == 200, response.json()
+    batch = response.json()
+
+    # Each finished run released the next queued one
+    status = client.get(f"/api/v1/backtests/batch/{batch['batch_id']}").json()
+    assert status["counts"] == {"completed": 5}
+    assert len(status["leaderboard"]) == 5
+
+
+def test_walk_forward_folds_are_dispatched_as_runs(client, db, rows, monkeypatch):
+    from app.core.config import settings
+    from app.engine.loader import load_strategy_module
+    from app.engine.sweep import in_process_signals
+    from app.engine.walkforward import evaluate_fold, stitch_folds, walk_forward_windows
+
+    # One place: the walk-forward must not hold it while its folds wait
+    monkeypatch.setattr(settings, "USER_MAX_CONCURRENCY", 1)
+    strategy_id, dataset_id, path = rows
+    grid = {"short_window": [5, 10]}
+    response = client.post("/api/v1/backtests/walk-forward", json={
+        "name": "wf",
+        "strategy_id": strategy_id,
+        "dataset_id": dataset_id,
+        "parameter_grid": grid,
+        "in_sample_bars": 500,
+        "out_of_sample_bars": 500,
+    })
+    assert response.status_code == 200, response.json()
+    backtest = _completed(client, db, response.json()["backtest_id"])
+
+    df = load_dataset(path)
+    signals = in_process_signals(load_strategy_module(SMA))
+    combinations = [{"short_window": w} for w in grid["short_window"]]
+    folds = [
+        evaluate_fold(df, signals, combinations, fold, "sharpe_ratio", 10_000.0, 0.001)
+        for fold in walk_forward_windows(len(df), 500, 500)
+    ]
+    expected = stitch_folds(folds, 10_000.0, folds[0]["periods_per_year"])
+    assert backtest.results["metrics"] == pytest.approx(expected["metrics"])
+    assert [fold["params"] for fold in backtest.results["folds"]] == [fold["params"] for fold in folds]
+    # The fold runs are gone once the walk-forward is finished
+    assert db.query(Backtest).filter(Backtest.parent_id == backtest.id).count() == 0
+    assert [run["id"] for run in client.get("/api/v1/backtests").json()] == [backtest.id]
+
+
+def test_monte_carlo_is_stored_on_its_backtest(client, db, rows):
+    from app.core.config import settings
+    from app.engine.montecarlo import monte_carlo
+
+    strategy_id, dataset_id, _ = rows
+    backtest = _completed(client, db, _submit(client, strategy_id, dataset_id)["backtest_id"])
+    response = client.post(f"/api/v1/backtests/{backtest.id}/monte-carlo", json={"n_paths": 50, "block_size": 5})
+    assert response.status_code == 200, response.json()
+
+    db.expire_all()
+    analysis = db.get(Backtest, backtest.id).results["monte_carlo"]
+    expected = monte_carlo(
+        load_artifact(backtest.artifact_path, ["returns"])["returns"],
+        50,
+        10_000.0,
+        block_size=5,
+        periods_per_year=backtest.results["periods_per_year"],
+        max_cells=settings.MONTE_CARLO_MAX_CELLS,
+    )
+    assert analysis["status"] == "completed"
+    assert analysis["probability_of_loss"] == pytest.approx(expected["probability_of_loss"])
+    # The child run only held an interactive place while it ran
+    assert db.query(Backtest).filter(Backtest.parent_id == backtest.id).count() == 0
+
+
+def test_batch_rejects_unknown_rows(client, rows):
+    strategy_id, dataset_id, _ = rows
+    response = client.post("/api/v1/backtests/batch", json={
+        "name": "missing",
+        "runs": [{"strategy_id": strategy_id, "dataset_id": dataset_id}, {"strategy_id": strategy_id, "dataset_id": 999}],
+    })
+    assert response.status_code == 404 and "999" in response.json()["detail"]
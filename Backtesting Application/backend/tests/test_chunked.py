@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.engine.chunked import run_chunked
+from app.engine.data import load_dataset, strategy_frame
+from app.engine.loader import load_strategy, run_strategy
+from app.engine.metrics import MetricsAccumulator, column_metrics, periods_per_year
+from app.engine.simulator import signals_to_target, simulate
+
+from conftest import EXAMPLE_STRATEGIES, write_dataset
+
+SMA = os.path.join(EXAMPLE_STRATEGIES, "sma_crossover.py")
+PARAMS = {"short_window": 10, "long_window": 40}
+
+
+@pytest.mark.parametrize("chunk_bars", [500, 1234, 10_000])
+def test_chunked_run_equals_in_memory_run(tmp_path, chunk_bars):
+    path = str(tmp_path / "prices.csv")
+    write_dataset(path, 5000, seed=7)
+    strategy = load_strategy(SMA, PARAMS)
+
+    df = load_dataset(path)
+    target = signals_to_target(run_strategy(strategy, strategy_frame(df)))
+    in_memory = simulate(df["close"].to_numpy(), target, 10_000.0, 0.001)
+
+    # Warm-up covers the longest moving average, so every window's signals
+    # equal the in-memory ones
+    chunked = run_chunked(
+        path,
+        lambda window: run_strategy(strategy, strategy_frame(window)),
+        str(tmp_path / "chunks"),
+        10_000.0,
+        0.001,
+        chunk_bars=chunk_bars,
+        warmup_bars=100,
+    )
+
+    assert chunked.bars == len(df)
+    np.testing.assert_array_equal(chunked.arrays["target"], in_memory.target)
+    np.testing.assert_array_equal(chunked.arrays["equity"], in_memory.equity)
+    np.testing.assert_array_equal(chunked.arrays["commissions"], in_memory.commissions)
+    periods = periods_per_year(df["date"])
+    assert chunked.periods_per_year == pytest.approx(periods, rel=1e-12)
+    expected = column_metrics(in_memory.equity, in_memory.returns, 10_000.0, periods)
+    for name in ["total_return", "sharpe_ratio", "max_drawdown", "volatility"]:
+        assert chunked.metrics[name] == pytest.approx(float(expected[name]), rel=1e-9)
+
+
+def test_accumulator_without_bars_reports_nothing_held():
+    metrics = MetricsAccumulator(10_000.0).metrics()
+    assert metrics["exposure"] == 0.0 and metrics["turnover"] == 0.0
@@ -0,0 +1,70 @@
+import os
+
+import pandas as pd
+import pytest
+from conftest import write_dataset
+
+from app.core.config import settings
+from app.engine.columnar import columnar_dir, load_columnar
+from app.engine.data import _normalize, convert_dataset, load_dataset, load_range
+
+
+@pytest.fixture
+def prices(tmp_path):
+    path = str(tmp_path / "prices.csv")
+    write_dataset(path, 500)
+    return path
+
+
+def test_columnar_copy_loads_like_the_csv(prices):
+    assert convert_dataset(prices)
+
+    columnar = load_columnar(prices)
+    assert columnar is not None and columnar.sorted
+    pd.testing.assert_frame_equal(columnar.frame, _normalize(pd.read_csv(prices)), check_dtype=False)
+    pd.testing.assert_frame_equal(load_dataset(prices), _normalize(pd.read_csv(prices)), check_dtype=False)
+
+
+def test_date_range_binary_searches_the_copy(prices):
+    convert_dataset(prices)
+
+    frame, lead = load_range(prices, "2020-03-01", "2020-03-31", warmup_bars=10)
+
+    assert lead == 10
+    assert len(frame) == 10 + 31
+    assert frame["date"].iloc[lead] == pd.Timestamp("2020-03-01")
+    assert frame["date"].iloc[-1] == pd.Timestamp("2020-03-31")
+
+
+def test_changed_csv_gets_a_new_copy(prices, monkeypatch):
+    monkeypatch.setattr(settings, "DATASET_COLUMNAR", True)
+    convert_dataset(prices)
+    write_dataset(prices, 600, seed=1)
+
+    # The old copy is keyed to the old file, so the next load converts again
+    assert load_columnar(prices) is None
+    assert len(load_dataset(prices)) == 600
+    assert len(load_columnar(prices).frame) == 600
+
+
+def test_upload_converts_and_delete_removes_the_copy(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DATASET_COLUMNAR", True)
+    source = tmp_path / "upload.csv"
+    write_dataset(source, 200)
+
+    with open(source, "rb") as f:
+        response = client.post("/api/v1/datasets/upload", files={"file": ("upload.csv", f, "text/csv")})
+    assert response.status_code == 200, response.text
+    dataset_id = response.json()["id"]
+    assert client.get(f"/api/v1/datasets/{dataset_id}").json()["columnar"] is True
+
+    from app.db.models import Dataset
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as db:
+        path = db.get(Dataset, dataset_id).file_path
+    assert os.path.isdir(columnar_dir(path))
+
+    assert client.delete(f"/api/v1/datasets/{dataset_id}").status_code == 200
+    assert not os.path.exists(columnar_dir(path))
+    assert not os.path.exists(path)
@@ -0,0 +1,117 @@
+import os
+
+import pandas as pd
+import pytest
+
+from app.db.models import Dataset, Strategy
+
+from conftest import EXAMPLE_STRATEGIES, write_dataset
+
+SMA = os.path.join(EXAMPLE_STRATEGIES, "sma_crossover.py")
+
+
+def _upload(client, path, filename: str = "prices.csv"):
+    with open(path, "rb") as f:
+        return client.post("/api/v1/datasets/upload", files={"file": (filename, f, "text/csv")})
+
+
+@pytest.fixture
+def strategy_id(client, db):
+    strategy = Strategy(user_id=1, name="sma", file_path=SMA)
+    db.add(strategy)
+    db.commit()
+    return strategy.id
+
+
+def test_upload_is_ingested_by_a_worker(client, tmp_path):
+    source = tmp_path / "prices.csv"
+    df = write_dataset(source, 1500)
+
+    response = _upload(client, source)
+    assert response.status_code == 200, response.text
+    # Tasks run in the test process, so ingestion has finished by now
+    assert response.json()["status"] == "ingesting"
+    assert response.json()["columns"] == list(df.columns)
+
+    dataset = client.get(f"/api/v1/datasets/{response.json()['id']}").json()
+    assert dataset["status"] == "ready"
+    assert dataset["rows"] == 1500
+    assert pd.Timestamp(dataset["start_date"]) == pd.Timestamp(df["Date"].iloc[0])
+    assert pd.Timestamp(dataset["end_date"]) == pd.Timestamp(df["Date"].iloc[-1])
+    with open(source, "rb") as f, open(dataset["file_path"], "rb") as stored:
+        assert stored.read() == f.read()
+
+
+def test_upload_without_ohlcv_columns_is_rejected(client, db, tmp_path):
+    source = tmp_path / "prices.csv"
+    write_dataset(source, 10).drop(columns="Volume").to_csv(source, index=False)
+
+    response = _upload(client, source)
+    assert response.status_code == 400
+    assert "volume" in response.json()["detail"]
+    assert db.query(Dataset).count() == 0
+
+
+def test_unparsable_upload_fails_ingestion(client, db, strategy_id, tmp_path):
+    source = tmp_path / "prices.csv"
+    source.write_text("Date,Open,High,Low,Close,Volume\n2020-01-01,1,2,0.5,1.5,100\n2020-01-02,1,2,0.5,1.5,100,7,8\n")
+
+    dataset_id = _upload(client, source).json()["id"]
+    dataset = client.get(f"/api/v1/datasets/{dataset_id}").json()
+    assert dataset["status"] == "failed"
+    assert dataset["error"]
+
+    response = client.post("/api/v1/backtests", json={
+        "name": "test", "strategy_id": strategy_id, "dataset_id": dataset_id,
+    })
+    assert response.status_code == 400
+    assert "failed ingestion" in response.json()["detail"]
+    with open(source, "rb") as f:
+        response = client.post(f"/api/v1/datasets/{dataset_id}/append", files={"file": ("rows.csv", f, "text/csv")})
+    assert response.status_code == 409
+
+
+def test_ingesting_dataset_cannot_be_backtested(client, db, strategy_id, tmp_path):
+    path = str(tmp_path / "prices.csv")
+    write_dataset(path, 100)
+    dataset = Dataset(user_id=1, name="prices", type="uploaded", file_path=path, status="ingesting")
+    db.add(dataset)
+    db.commit()
+
+    response = client.post("/api/v1/backtests", json={
+        "name": "test", "strategy_id": strategy_id, "dataset_id": dataset.id,
+    })
+    assert response.status_code == 409
+
+
+def test_appends_and_walk_forward_use_the_stored_row_count(client, db, strategy_id, tmp_path, monkeypatch):
+    from app.tasks import backtest as tasks
+
+    source = tmp_path / "prices.csv"
+    df = write_dataset(source, 1500)
+    df.iloc[:1000].to_csv(source, index=False)
+    dataset_id = _upload(client, source).json()["id"]
+
+    appended = tmp_path / "rows.csv"
+    df.iloc[1000:].to_csv(appended, index=False)
+    with open(appended, "rb") as f:
+        response = client.post(f"/api/v1/datasets/{dataset_id}/append", files={"file": ("rows.csv", f, "text/csv")})
+    assert response.status_code == 200, response.text
+    assert response.json()["rows"] == 1500
+
+    def count_rows(path):
+        raise AssertionError("The walk-forward counted the rows of a dataset that stores them")
+
+    monkeypatch.setattr(tasks, "count_rows", count_rows)
+    response = client.post("/api/v1/backtests/walk-forward", json={
+        "name": "wf",
+        "strategy_id": strategy_id,
+        "dataset_id": dataset_id,
+        "parameter_grid": {"short_window": [5, 10]},
+        "in_sample_bars": 500,
+        "out_of_sample_bars": 500,
+    })
+    assert response.status_code == 200, response.json()
+    backtest = client.get(f"/api/v1/backtests/{response.json()['backtest_id']}").json()
+    assert backtest["status"] == "completed", backtest
+    assert len(backtest["results"]["folds"]) == 2
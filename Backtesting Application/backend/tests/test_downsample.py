@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from app.engine.downsample import decimate, equity_levels, lttb, minmax
+
+
+def reference_lttb(values, points):
+    """Largest-triangle-three-buckets as usually written, one bucket at a time."""
+    n = len(values)
+    every = (n - 2) / (points - 2)
+    selected = [0]
+    a = 0
+    for i in range(points - 2):
+        start, stop = int(i * every) + 1, int((i + 1) * every) + 1
+        next_start, next_stop = stop, min(int((i + 2) * every) + 1, n)
+        avg_x = (next_start + next_stop - 1) / 2
+        avg_y = np.mean(values[next_start:next_stop])
+        best, best_area = start, -1.0
+        for j in range(start, stop):
+            area = abs((a - avg_x) * (values[j] - values[a]) - (a - j) * (avg_y - values[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+@pytest.fixture
+def equity():
+    rng = np.random.default_rng(17)
+    return 10_000 * np.exp(np.cumsum(rng.normal(0, 0.01, 5003)))
+
+
+@pytest.mark.parametrize("points", [3, 4, 10, 97, 500])
+def test_lttb_matches_reference(equity, points):
+    np.testing.assert_array_equal(lttb(equity, points), reference_lttb(equity, points))
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+@pytest.mark.parametrize("n", [1, 2, 3, 5, 50, 5003])
+def test_never_more_points_than_asked(equity, method, n):
+    values = equity[:n]
+    for points in range(0, 60):
+        bars = decimate(values, points, method)
+        assert len(bars) <= points, (n, points)
+        assert np.all(np.diff(bars) > 0)
+        if points >= 2 and n >= 2:
+            assert bars[0] == 0 and bars[-1] == n - 1
+
+
+def test_minmax_keeps_every_extreme(equity):
+    bars = minmax(equity, 100)
+    assert np.argmin(equity) in bars and np.argmax(equity) in bars
+    # Each bucket's spike survives, however narrow
+    spiked = equity.copy()
+    spiked[1234] *= 3
+    assert 1234 in minmax(spiked, 10)
+
+
+def test_levels_are_the_lttb_view_at_each_size(equity):
+    levels = equity_levels(equity, [500, 50])
+    assert list(levels) == [50, 500]
+    for level, bars in levels.items():
+        np.testing.assert_array_equal(bars, lttb(equity, level))
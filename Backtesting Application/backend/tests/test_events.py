@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.engine import events
+from app.engine.events import MIN_BARS_PER_SECOND, benchmark, run_events
+
+
+class Script:
+    """Places the orders listed for each bar: {bar: [("order", size) or ("target", fraction)]}."""
+
+    def __init__(self, orders):
+        self.orders = orders
+
+    def on_bar(self, bar, broker):
+        for kind, value in self.orders.get(bar.index, []):
+            if kind == "target":
+                broker.order_target_percent(value)
+            else:
+                broker.order(value)
+
+
+def run(close, orders, commission=0.01):
+    return run_events(Script(orders), pd.DataFrame({"close": close}), 1000.0, commission)
+
+
+def test_fills_at_the_close_with_commission_from_cash():
+    close = [10.0, 20.0, 25.0, 15.0]
+    sim = run(close, {1: [("order", 10)], 2: [("order", -4)], 3: [("target", 0.0)]})
+
+    fee = [0.0, 0.01 * 10 * 20, 0.01 * 4 * 25, 0.01 * 6 * 15]
+    cash = 1000.0 - np.cumsum([0.0, 10 * 20, -4 * 25, -6 * 15]) - np.cumsum(fee)
+    units = [0.0, 10.0, 6.0, 0.0]
+    np.testing.assert_allclose(sim.commissions, fee)
+    np.testing.assert_allclose(sim.cash, cash)
+    np.testing.assert_allclose(sim.units, units)
+    np.testing.assert_allclose(sim.equity, cash + np.multiply(units, close))
+    np.testing.assert_array_equal(sim.fills, [False, True, True, True])
+
+
+def test_target_percent_sizes_from_equity():
+    sim = run([50.0, 40.0, 80.0], {0: [("target", 0.5)], 2: [("target", -0.25)]}, commission=0.0)
+    assert sim.units[0] == pytest.approx(0.5 * 1000.0 / 50.0)
+    equity = sim.equity[2]
+    assert sim.units[2] * 80.0 == pytest.approx(-0.25 * equity)
+
+
+@pytest.mark.parametrize("price", [0.0, -1.0, np.nan, np.inf])
+def test_target_percent_skips_bars_without_a_usable_price(price):
+    sim = run([10.0, price, 12.0], {1: [("target", 1.0)], 2: [("target", 1.0)]}, commission=0.0)
+    assert not sim.fills[1]
+    assert sim.units[1] == 0.0
+    assert sim.units[2] == pytest.approx(1000.0 / 12.0)
+
+
+def test_progress_is_reported_between_blocks(monkeypatch):
+    monkeypatch.setattr(events, "PROGRESS_BARS", 2)
+    close = [10.0, 11.0, 12.0, 11.0, 13.0]
+    orders = {0: [("target", 1.0)], 3: [("target", 0.0)]}
+    calls = []
+    sim = run_events(
+        Script(orders), pd.DataFrame({"close": close}), 1000.0, 0.01,
+        lambda done, equity: calls.append((done, equity.copy())),
+    )
+
+    assert [done for done, _ in calls] == [2, 4, 5]
+    for done, equity in calls:
+        np.testing.assert_array_equal(equity, sim.equity[:done])
+    np.testing.assert_array_equal(sim.equity, run(close, orders).equity)
+
+
+def test_engine_overhead_within_budget():
+    # Best of three, so one slow moment on a busy machine does not fail it
+    bars_per_second = max(benchmark(200_000, seed) for seed in range(3))
+    assert bars_per_second >= MIN_BARS_PER_SECOND
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.engine import indicators
+
+
+@pytest.fixture
+def close():
+    rng = np.random.default_rng(21)
+    values = 5_000 * np.exp(np.cumsum(rng.normal(0, 0.01, 3000)))
+    values[[0, 1, 700, 701, 702, 1500]] = np.nan
+    return pd.Series(values, index=pd.date_range("2020-01-01", periods=len(values), freq="h"))
+
+
+@pytest.fixture
+def complete(close):
+    return close.dropna().reset_index(drop=True)
+
+
+@pytest.mark.parametrize("window", [1, 2, 14, 50, 400, 5000])
+def test_sma_and_std_match_pandas_rolling(close, window):
+    pd.testing.assert_series_equal(indicators.sma(close, window), close.rolling(window).mean(), rtol=1e-10)
+    # Both lose precision relative to the price level, not to the deviation
+    atol = 1e-9 * close.max()
+    pd.testing.assert_series_equal(indicators.rolling_std(close, window), close.rolling(window).std(), rtol=1e-8, atol=atol)
+    pd.testing.assert_series_equal(
+        indicators.rolling_std(close, window, ddof=0), close.rolling(window).std(ddof=0), rtol=1e-8, atol=atol
+    )
+
+
+@pytest.mark.parametrize("span", [1, 2, 12, 26.5, 200, 2000])
+def test_ema_matches_pandas_ewm(complete, close, span):
+    pd.testing.assert_series_equal(indicators.ema(complete, span), complete.ewm(span=span, adjust=False).mean(), rtol=1e-10)
+    # Interior gaps follow pandas too
+    pd.testing.assert_series_equal(indicators.ema(close, span), close.ewm(span=span, adjust=False).mean(), rtol=1e-10)
+
+
+def test_composite_indicators_match_pandas(complete):
+    delta = complete.diff()
+    gain = delta.where(delta > 0, 0.0).rolling(14).mean()
+    loss = (-delta.where(delta < 0, 0.0)).rolling(14).mean()
+    rsi = 100 - 100 / (1 + gain / loss)
+    pd.testing.assert_series_equal(indicators.rsi(complete, 14), rsi, rtol=1e-8, check_names=False)
+
+    middle, upper, lower = indicators.bollinger_bands(complete, 20, 2.5)
+    std = complete.rolling(20).std()
+    pd.testing.assert_series_equal(middle, complete.rolling(20).mean(), rtol=1e-10)
+    pd.testing.assert_series_equal(upper, complete.rolling(20).mean() + 2.5 * std, rtol=1e-10)
+    pd.testing.assert_series_equal(lower, complete.rolling(20).mean() - 2.5 * std, rtol=1e-10)
+
+    line, signal, histogram = indicators.macd(complete, 12, 26, 9)
+    expected = complete.ewm(span=12, adjust=False).mean() - complete.ewm(span=26, adjust=False).mean()
+    expected_signal = expected.ewm(span=9, adjust=False).mean()
+    pd.testing.assert_series_equal(line, expected, rtol=1e-8)
+    pd.testing.assert_series_equal(signal, expected_signal, rtol=1e-8)
+    pd.testing.assert_series_equal(histogram, expected - expected_signal, rtol=1e-6, atol=1e-9)
+
+    high, low = complete * 1.01, complete * 0.99
+    median = (high + low) / 2
+    ao = median.rolling(5).mean() - median.rolling(34).mean()
+    pd.testing.assert_series_equal(indicators.awesome_oscillator(high, low), ao, rtol=1e-8, atol=1e-9)
+    pd.testing.assert_series_equal(
+        indicators.accelerator_oscillator(high, low), ao - ao.rolling(5).mean(), rtol=1e-6, atol=1e-9
+    )
+
+
+def test_arrays_in_arrays_out(complete):
+    values = complete.to_numpy()
+    result = indicators.sma(values, 10)
+    assert isinstance(result, np.ndarray)
+    np.testing.assert_allclose(result, complete.rolling(10).mean().to_numpy(), rtol=1e-10)
+
+
+def test_repeated_calls_are_served_from_the_memo(complete):
+    indicators.sma(complete, 33)
+    hits = indicators.cache_stats()["hits"]
+    again = indicators.sma(complete.copy(), 33)
+    assert indicators.cache_stats()["hits"] == hits + 1
+
+    # Callers get their own copy of the cached values
+    again.iloc[:] = 0.0
+    assert indicators.sma(complete, 33).iloc[-1] != 0.0
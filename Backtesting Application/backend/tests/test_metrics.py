@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.engine.metrics import PERIODS_PER_YEAR, backtest_metrics, periods_per_year, rolling_metrics
+from app.engine.simulator import signals_to_target, simulate
+
+
+@pytest.mark.parametrize("freq, expected", [("B", 261), ("D", 365.25), ("h", 8766), ("5min", 105_192)])
+def test_periods_per_year_from_bar_spacing(freq, expected):
+    stamps = pd.Series(pd.date_range("2020-01-01", periods=3000, freq=freq))
+    assert periods_per_year(stamps) == pytest.approx(expected, rel=0.01)
+
+
+def test_periods_per_year_counts_trading_sessions():
+    # Weekdays less ~9 holidays a year: about 252 daily bars
+    days = pd.bdate_range("2015-01-01", "2024-12-31")
+    sessions = days[np.arange(len(days)) % 29 != 0]
+    assert periods_per_year(sessions) == pytest.approx(252, rel=0.01)
+
+
+@pytest.mark.parametrize("timestamps", [None, np.arange(10), pd.Series([pd.NaT, pd.Timestamp("2020-01-01")])])
+def test_periods_per_year_defaults_without_dates(timestamps):
+    assert periods_per_year(timestamps) == PERIODS_PER_YEAR
+
+
+def test_metrics_match_direct_calculation():
+    rng = np.random.default_rng(5)
+    n = 2500
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0002, 0.01, n)))
+    signals = rng.choice([0.0, 0.0, 0.0, 1.0, -1.0, 0.5], size=n)
+    sim = simulate(close, signals_to_target(signals, "target"), 10_000.0, 0.001)
+    periods = 8766.0
+
+    metrics = backtest_metrics(sim, close, 10_000.0, periods)
+
+    returns = pd.Series(sim.returns)
+    equity = pd.Series(sim.equity)
+    downside = returns[returns < 0]
+    peak = np.maximum(equity.cummax(), 10_000.0)
+    drawdown = equity / peak - 1
+    assert metrics["total_return"] == pytest.approx(equity.iloc[-1] / 10_000.0 - 1, rel=1e-12)
+    assert metrics["sharpe_ratio"] == pytest.approx(returns.mean() / returns.std() * np.sqrt(periods), rel=1e-9)
+    assert metrics["sortino_ratio"] == pytest.approx(returns.mean() / downside.std() * np.sqrt(periods), rel=1e-9)
+    assert metrics["volatility"] == pytest.approx(returns.std() * np.sqrt(periods), rel=1e-9)
+    assert metrics["max_drawdown"] == pytest.approx(drawdown.min(), rel=1e-12)
+    assert metrics["calmar_ratio"] == pytest.approx(metrics["total_return"] / abs(drawdown.min()), rel=1e-12)
+    assert metrics["exposure"] == pytest.approx((sim.units != 0).mean())
+    traded = np.abs(np.diff(sim.units, prepend=0.0)) * close
+    assert metrics["turnover"] == pytest.approx(traded.sum() / equity.mean(), rel=1e-12)
+
+    # Longest run of bars under water
+    runs = (drawdown < 0).astype(int).groupby((drawdown >= 0).cumsum()).sum()
+    assert metrics["max_drawdown_duration"] == runs.max()
+
+
+def test_rolling_metrics_match_pandas_rolling():
+    returns = np.random.default_rng(2).normal(0, 0.01, 1000)
+    rolling = rolling_metrics(returns, 63, periods_per_year=365, points=2000)
+
+    expected = pd.Series(returns).rolling(63)
+    sharpe = (expected.mean() / expected.std() * np.sqrt(365)).dropna()
+    assert rolling["bars"] == sharpe.index.tolist()
+    np.testing.assert_allclose(rolling["sharpe_ratio"], sharpe, rtol=1e-8)
+    np.testing.assert_allclose(rolling["volatility"], expected.std().dropna() * np.sqrt(365), rtol=1e-8)
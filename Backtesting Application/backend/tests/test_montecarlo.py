@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from app.engine.montecarlo import PERCENTILES, monte_carlo
+
+
+def brute_force(returns, n_paths, block_size, seed, max_cells, band_bars):
+    """Build every resampled path bar by bar, drawing block starts like monte_carlo."""
+    n = len(returns)
+    n_blocks = -(-n // block_size)
+    rng = np.random.default_rng(seed)
+    chunk = max(1, max_cells // n_blocks)
+    starts = np.concatenate([
+        rng.integers(0, n, size=(min(chunk, n_paths - start), n_blocks))
+        for start in range(0, n_paths, chunk)
+    ])
+
+    total_return, sharpe, max_drawdown, bands = [], [], [], []
+    for path_starts in starts:
+        path = []
+        for block, start in enumerate(path_starts):
+            width = min(block_size, n - block * block_size)
+            path += [returns[(start + k) % n] for k in range(width)]
+        path = np.array(path)
+        equity = np.cumprod(1.0 + path)
+        peak = np.maximum.accumulate(np.maximum(equity, 1.0))
+        total_return.append(equity[-1] - 1.0)
+        max_drawdown.append((equity / peak - 1.0).min())
+        sharpe.append(path.mean() / path.std(ddof=1) * np.sqrt(252))
+        bands.append(equity[band_bars])
+    return np.array(total_return), np.array(sharpe), np.array(max_drawdown), np.array(bands)
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 50])
+def test_bootstrap_matches_brute_force_paths(block_size):
+    rng = np.random.default_rng(9)
+    returns = rng.normal(0.0005, 0.02, 503)
+    # A small max_cells splits both the block statistics and the paths into chunks
+    result = monte_carlo(returns, 300, 10_000.0, block_size=block_size, seed=3, band_points=40, max_cells=5_000)
+    band_bars = result["equity_bands"]["bars"]
+    total_return, sharpe, max_drawdown, bands = brute_force(returns, 300, block_size, 3, 5_000, band_bars)
+
+    for name, values in [("total_return", total_return), ("sharpe_ratio", sharpe), ("max_drawdown", max_drawdown)]:
+        summary = result["metrics"][name]
+        assert summary["mean"] == pytest.approx(values.mean(), rel=1e-9), name
+        assert summary["std"] == pytest.approx(values.std(), rel=1e-7), name
+        for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+            assert summary["percentiles"][str(p)] == pytest.approx(value, rel=1e-9, abs=1e-12), (name, p)
+    assert result["probability_of_loss"] == (total_return < 0).mean()
+
+    expected_bands = np.percentile(bands, PERCENTILES, axis=0) * 10_000.0
+    for p, band in zip(PERCENTILES, expected_bands):
+        np.testing.assert_allclose(result["equity_bands"][str(p)], band, rtol=1e-9)
+
+
+def test_same_seed_same_result():
+    returns = np.random.default_rng(1).normal(0, 0.01, 200)
+    assert monte_carlo(returns, 100, 1.0, block_size=5, seed=7) == monte_carlo(returns, 100, 1.0, block_size=5, seed=7)
+    with pytest.raises(ValueError):
+        monte_carlo(returns[:1], 100, 1.0)
@@ -0,0 +1,245 @@
+import os
+import socket
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.engine.data import load_dataset
+from app.engine.loader import load_strategy_module
+from app.engine.sandbox import SandboxError, SandboxPool
+from app.engine.sweep import in_process_signals
+
+from conftest import EXAMPLE_STRATEGIES, write_dataset
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="sandboxes need Linux")
+
+PROBE = '''
+import os
+import socket
+import time
+
+import numpy as np
+
+
+def strategy(data, probe="none", path="", forbidden=()):
+    if probe == "network":
+        socket.create_connection(("1.1.1.1", 53), timeout=2)
+    elif probe == "descriptors":
+        for fd in os.listdir("/proc/self/fd"):
+            try:
+                target = os.readlink(f"/proc/self/fd/{fd}")
+            except OSError:
+                continue
+            if target in forbidden:
+                raise RuntimeError(f"Inherited descriptor {fd}: {target}")
+    elif probe == "write":
+        with open(path, "w") as f:
+            f.write("escaped")
+    elif probe == "memory":
+        bytearray(4 * 1024 ** 3)
+    elif probe == "cpu":
+        while True:
+            pass
+    elif probe == "sleep":
+        time.sleep(60)
+    return np.ones(len(data))
+'''
+
+
+@pytest.fixture
+def probe(tmp_path):
+    path = tmp_path / "probe.py"
+    path.write_text(PROBE)
+    return str(path)
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({"close": np.linspace(100, 110, 50)})
+
+
+def make_pool(tmp_path, **limits) -> SandboxPool:
+    options = {
+        "size": 1,
+        "memory_bytes": 2 * 1024 ** 3,
+        "cpu_seconds": 30,
+        "wall_seconds": 30,
+        "max_runs": 10,
+        "shm_dir": str(tmp_path / "shm"),
+        **limits,
+    }
+    return SandboxPool(**options)
+
+
+@pytest.fixture
+def pool(tmp_path):
+    sandbox_pool = make_pool(tmp_path)
+    yield sandbox_pool
+    sandbox_pool.close()
+
+
+def test_strategy_runs_in_sandbox(pool, probe, frame):
+    np.testing.assert_array_equal(pool.signals(probe, {}, frame), np.ones(len(frame)))
+
+
+def test_no_network(pool, probe, frame):
+    with pytest.raises(SandboxError, match="OSError|PermissionError"):
+        pool.signals(probe, {"probe": "network"}, frame)
+
+
+def test_inherited_descriptors_are_closed(tmp_path, probe, frame):
+    # Open in the worker before the sandbox is forked, like its database connections
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    secret = open(tmp_path / "secret.txt", "w")
+    forbidden = [os.path.realpath(secret.name), f"socket:[{os.fstat(listener.fileno()).st_ino}]"]
+    pool = make_pool(tmp_path)
+    try:
+        pool.signals(probe, {"probe": "descriptors", "forbidden": forbidden}, frame)
+    finally:
+        pool.close()
+        listener.close()
+        secret.close()
+
+
+def test_no_writes_outside_sandbox(pool, probe, frame, tmp_path):
+    target = tmp_path / "escaped.txt"
+    with pytest.raises(SandboxError):
+        pool.signals(probe, {"probe": "write", "path": str(target)}, frame)
+    # Without Landlock the file may be created, but never written
+    assert not target.exists() or target.read_text() == ""
+
+
+def test_memory_limit(pool, probe, frame):
+    with pytest.raises(SandboxError, match="MemoryError"):
+        pool.signals(probe, {"probe": "memory"}, frame)
+    # The sandbox survives its strategy's failure
+    assert pool.signals(probe, {}, frame).sum() == len(frame)
+
+
+def test_cpu_limit(tmp_path, probe, frame):
+    pool = make_pool(tmp_path, cpu_seconds=1)
+    try:
+        with pytest.raises(SandboxError, match="CPU time limit"):
+            pool.signals(probe, {"probe": "cpu"}, frame)
+        # A fresh sandbox takes the next run
+        assert pool.signals(probe, {}, frame).sum() == len(frame)
+    finally:
+        pool.close()
+
+
+def test_wall_time_limit(tmp_path, probe, frame):
+    pool = make_pool(tmp_path, wall_seconds=1)
+    try:
+        with pytest.raises(SandboxError, match="wall-time limit"):
+            pool.signals(probe, {"probe": "sleep"}, frame)
+    finally:
+        pool.close()
+
+
+def test_check_stops_run(pool, probe, frame):
+    class Cancelled(Exception):
+        pass
+
+    def check():
+        raise Cancelled
+
+    with pytest.raises(Cancelled):
+        pool.signals(probe, {"probe": "sleep"}, frame, check)
+    # The killed sandbox is replaced
+    assert pool.signals(probe, {}, frame).sum() == len(frame)
+
+
+def test_sweep_signals_match_in_process(pool, tmp_path):
+    path = str(tmp_path / "prices.csv")
+    write_dataset(path, 500, seed=5)
+    df = load_dataset(path)
+    strategy = os.path.join(EXAMPLE_STRATEGIES, "sma_crossover.py")
+    combinations = [{"short_window": s, "long_window": 30} for s in (5, 10, 15)]
+
+    np.testing.assert_array_equal(
+        pool.signal_matrix(strategy, combinations, df),
+        in_process_signals(load_strategy_module(strategy))(df, combinations),
+    )
+
+
+SLOW_EVENTS = '''
+import time
+
+
+class Strategy:
+    def on_bar(self, bar, broker):
+        time.sleep(0.002)
+        if bar.index == 0:
+            broker.order_target_percent(1.0)
+'''
+
+
+def test_event_runs_report_progress(tmp_path, monkeypatch):
+    from app.core.config import settings
+    from app.engine import events
+
+    path = tmp_path / "slow_events.py"
+    path.write_text(SLOW_EVENTS)
+    # Sandboxes fork with the engine's block size
+    monkeypatch.setattr(events, "PROGRESS_BARS", 20)
+    monkeypatch.setattr(settings, "PROGRESS_INTERVAL_SECONDS", 0.02)
+    pool = make_pool(tmp_path)
+    try:
+        df = pd.DataFrame({"close": np.linspace(100, 110, 300)})
+        calls = []
+        sim = pool.events(str(path), None, df, 1000.0, 0.0, lambda done, equity: calls.append((done, np.array(equity))))
+    finally:
+        pool.close()
+
+    assert calls
+    assert [done for done, _ in calls] == sorted({done for done, _ in calls})
+    for done, equity in calls:
+        assert done % 20 == 0 or done == 300
+        np.testing.assert_array_equal(equity, sim.equity[:done])
+
+
+def test_frames_are_exported_once_while_alive(pool, probe):
+    frame = pd.DataFrame({"close": np.linspace(100, 110, 50)})
+    pool.signals(probe, {}, frame)
+    (export,) = pool._exports.values()
+    pool.signals(probe, {"probe": "none"}, frame)
+    assert list(pool._exports.values()) == [export]
+
+    # The export goes with its frame
+    del frame
+    other = pd.DataFrame({"close": np.linspace(1, 2, 10)})
+    pool.signals(probe, {}, other)
+    assert not os.path.exists(export.path)
+    assert [e.columns for e in pool._exports.values()] == [["close"]]
+
+
+def test_exports_are_bounded(tmp_path, probe):
+    pool = make_pool(tmp_path, export_bytes=1000)
+    try:
+        frames = [pd.DataFrame({"close": np.full(100, float(i))}) for i in range(3)]
+        for df in frames:
+            np.testing.assert_array_equal(pool.signals(probe, {}, df), np.ones(100))
+        # 800 bytes each: only the last is kept
+        assert len(pool._exports) == 1 and pool._exported_bytes == 800
+        assert len(os.listdir(pool._data_dir)) == 1
+    finally:
+        pool.close()
+
+
+def test_panel_and_asset_runs_match_in_process(pool, tmp_path):
+    from app.engine.portfolio import run_portfolio
+
+    strategy = os.path.join(EXAMPLE_STRATEGIES, "sma_crossover.py")
+    assets = []
+    for seed in range(3):
+        path = str(tmp_path / f"asset_{seed}.csv")
+        write_dataset(path, 300, seed=seed)
+        assets.append({"label": f"A{seed}", "path": path})
+
+    _, expected = run_portfolio(strategy, assets, {})
+    _, sandboxed = run_portfolio(strategy, assets, {}, sandbox=pool)
+    np.testing.assert_array_equal(sandboxed.equity, expected.equity)
@@ -0,0 +1,72 @@
+from app.core.config import settings
+from app.db.models import Backtest, User
+from app.tasks import scheduler
+from app.tasks.celery_app import celery_app
+
+
+def _queue(db, user_id: int, lane: str, count: int) -> list[int]:
+    runs = [
+        Backtest(
+            user_id=user_id,
+            name=f"{lane} {i}",
+            status="queued",
+            lane=lane,
+            task_id=f"{user_id}-{lane}-{i}",
+            task_request={"name": "tasks.backtest.run_backtest", "args": ["strategy.py", "prices.csv"]},
+            parameters={},
+        )
+        for i in range(count)
+    ]
+    db.add_all(runs)
+    db.commit()
+    return [run.id for run in runs]
+
+
+def test_dispatch_caps_each_user_per_lane_and_interleaves_users(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "USER_MAX_CONCURRENCY", 2)
+    sent = []
+    monkeypatch.setattr(
+        celery_app, "send_task", lambda name, args=None, task_id=None, queue=None, **options: sent.append((args[0], queue))
+    )
+    db.add(User(id=2, email="other@example.com", hashed_password="-"))
+    db.commit()
+    first = _queue(db, 1, "batch", 3)
+    sweep = _queue(db, 1, "sweep", 1)
+    second = _queue(db, 2, "batch", 3)
+
+    assert scheduler.dispatch(db) == 5
+    assert sent == [
+        (first[0], "backtests.batch"),
+        (second[0], "backtests.batch"),
+        (first[1], "backtests.batch"),
+        (second[1], "backtests.batch"),
+        (sweep[0], "backtests.sweep"),
+    ]
+    # Full: nothing more until a run finishes
+    assert scheduler.dispatch(db) == 0
+
+    db.get(Backtest, first[0]).status = "completed"
+    db.commit()
+    sent.clear()
+    assert scheduler.dispatch(db) == 1
+    assert sent == [(first[2], "backtests.batch")]
+    db.expire_all()
+    assert db.get(Backtest, second[2]).status == "queued"
+
+
+def test_interactive_runs_have_their_own_cap(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "USER_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "USER_MAX_INTERACTIVE_CONCURRENCY", 3)
+    sent = []
+    monkeypatch.setattr(
+        celery_app, "send_task", lambda name, args=None, task_id=None, queue=None, **options: sent.append((args[0], queue))
+    )
+    batch = _queue(db, 1, "batch", 2)
+    interactive = _queue(db, 1, "interactive", 4)
+
+    assert scheduler.dispatch(db) == 4
+    assert sorted(sent) == sorted(
+        [(batch[0], "backtests.batch")] + [(run_id, "backtests.interactive") for run_id in interactive[:3]]
+    )
+    db.expire_all()
+    assert db.get(Backtest, interactive[3]).status == "queued"
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from app.engine.simulator import signals_to_target, simulate
+
+
+def reference_simulate(close, target, initial_capital, commission):
+    """One bar at a time: fill at the close, size from the pre-fill equity."""
+    n = len(close)
+    cash, units, held = initial_capital, 0.0, 0.0
+    equity = np.empty(n)
+    commissions = np.zeros(n)
+    units_out = np.empty(n)
+    for t in range(n):
+        value = cash + units * close[t]
+        if target[t] != held:
+            fee = commission * abs(target[t] - held) * value
+            units = target[t] * value / close[t]
+            cash = value - units * close[t] - fee
+            commissions[t] = fee
+            held = target[t]
+        units_out[t] = units
+        equity[t] = cash + units * close[t]
+    return equity, units_out, commissions
+
+
+def random_market(seed: int, bars: int = 2000):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    signals = rng.choice([-1.0, 0.0, 0.0, 0.0, 1.0, 0.5], size=bars)
+    return close, signals
+
+
+@pytest.mark.parametrize("mode", ["hold", "target"])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_simulate_matches_per_bar_reference(seed, mode):
+    close, signals = random_market(seed)
+    target = signals_to_target(signals, mode)
+    sim = simulate(close, target, 10_000.0, 0.001)
+    equity, units, commissions = reference_simulate(close, target, 10_000.0, 0.001)
+
+    np.testing.assert_allclose(sim.equity, equity, rtol=1e-10)
+    np.testing.assert_allclose(sim.units, units, rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(sim.commissions, commissions, rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(sim.returns[1:], equity[1:] / equity[:-1] - 1, rtol=1e-8, atol=1e-14)
+
+
+def test_simulate_columns_are_independent_accounts():
+    close, _ = random_market(3)
+    targets = np.column_stack([signals_to_target(random_market(seed)[1]) for seed in range(4)])
+    sim = simulate(close, targets, 10_000.0, 0.002)
+    for j in range(targets.shape[1]):
+        np.testing.assert_array_equal(sim.equity[:, j], simulate(close, targets[:, j], 10_000.0, 0.002).equity)
+
+
+def test_signals_to_target_hold_keeps_previous_position():
+    signals = np.array([0, 1, 0, np.nan, -1, 0, 0.5])
+    np.testing.assert_array_equal(signals_to_target(signals, "hold"), [0, 1, 1, 1, -1, -1, 0.5])
+    with pytest.raises(ValueError):
+        signals_to_target(signals, "unknown")
+
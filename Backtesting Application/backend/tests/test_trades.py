@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.engine.simulator import signals_to_target, simulate
+from app.engine.trades import extract_trades, trade_columns
+
+
+def reference_trades(close, units, commissions, high, low):
+    """Walk the bars once, opening and closing trades as the position's sign changes."""
+    trades, trade = [], None
+    for t in range(len(units)):
+        prev = units[t - 1] if t else 0.0
+        cur = units[t]
+        if trade is not None:
+            trade["pnl"] += prev * (close[t] - close[t - 1])
+            trade["high"] = max(trade["high"], high[t])
+            trade["low"] = min(trade["low"], low[t])
+        if np.sign(cur) == np.sign(prev):
+            if trade is not None:
+                trade["commission"] += commissions[t]
+            continue
+        legs = abs(prev) + abs(cur)
+        if trade is not None:
+            trade["commission"] += commissions[t] * abs(prev) / legs
+            trade.update(exit_bar=t, open=False)
+            trades.append(trade)
+        trade = None
+        if cur != 0:
+            trade = {
+                "entry_bar": t, "size": cur, "entry_price": close[t], "pnl": 0.0,
+                "commission": commissions[t] * abs(cur) / legs, "high": -np.inf, "low": np.inf,
+            }
+    if trade is not None:
+        trade.update(exit_bar=len(units) - 1, open=True)
+        trades.append(trade)
+
+    for trade in trades:
+        trade["exit_price"] = close[trade["exit_bar"]]
+        trade["pnl"] -= trade["commission"]
+        long = trade["size"] > 0
+        if trade["exit_bar"] > trade["entry_bar"]:
+            up, down = trade["high"] / trade["entry_price"] - 1, trade["low"] / trade["entry_price"] - 1
+            trade["mfe"], trade["mae"] = (up, down) if long else (-down, -up)
+        else:
+            trade["mfe"] = trade["mae"] = 0.0
+    return trades
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2, 3])
+def test_ledger_matches_per_bar_loop(seed):
+    rng = np.random.default_rng(seed)
+    n = 3000
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    high, low = close * (1 + rng.uniform(0, 0.01, n)), close * (1 - rng.uniform(0, 0.01, n))
+    # Entries, exits, flips and resizes within a trade
+    signals = rng.choice([0.0, 0.0, 0.0, 1.0, -1.0, 0.5, -0.25], size=n)
+    sim = simulate(close, signals_to_target(signals, "target"), 10_000.0, 0.001)
+
+    trades = extract_trades(close, sim.units, sim.commissions, high, low)
+    expected = reference_trades(close, sim.units, sim.commissions, high, low)
+
+    assert len(trades["entry_bar"]) == len(expected) > 100
+    for field in ["entry_bar", "exit_bar", "size", "entry_price", "exit_price", "open"]:
+        np.testing.assert_array_equal(trades[field], [t[field] for t in expected], err_msg=field)
+    for field in ["pnl", "commission", "mfe", "mae"]:
+        np.testing.assert_allclose(trades[field], [t[field] for t in expected], rtol=1e-9, atol=1e-9, err_msg=field)
+    np.testing.assert_array_equal(trades["holding_bars"], trades["exit_bar"] - trades["entry_bar"])
+    # Net of commission, the trades' profits add up to the account's
+    assert trades["pnl"].sum() == pytest.approx(sim.equity[-1] - 10_000.0, rel=1e-9)
+
+
+def test_columns_are_json_ready():
+    close = np.array([10.0, 11.0, 12.0, 11.0])
+    units = np.array([0.0, 5.0, 5.0, 0.0])
+    timestamps = pd.date_range("2024-01-01", periods=4, freq="D").to_numpy()
+    columns = trade_columns(extract_trades(close, units, np.zeros(4), timestamps=timestamps))
+
+    assert columns["entry_time"] == ["2024-01-02T00:00:00"]
+    assert columns["exit_time"] == ["2024-01-04T00:00:00"]
+    assert columns["pnl"] == [0.0] and columns["open"] == [False]
@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.engine.data import count_rows, load_dataset
+from app.engine.loader import load_strategy_module
+from app.engine.sweep import in_process_signals
+from app.engine.walkforward import evaluate_fold, stitch_folds, walk_forward_windows
+
+from conftest import EXAMPLE_STRATEGIES, write_dataset
+
+
+@pytest.mark.parametrize("anchored", [False, True])
+@pytest.mark.parametrize("n_bars, in_sample, out_of_sample", [(1000, 200, 100), (1001, 200, 100), (250, 200, 100)])
+def test_out_of_sample_windows_tile_the_data(n_bars, in_sample, out_of_sample, anchored):
+    folds = walk_forward_windows(n_bars, in_sample, out_of_sample, anchored=anchored)
+
+    assert [f["fold"] for f in folds] == list(range(len(folds)))
+    assert folds[0]["oos_start"] == in_sample
+    assert folds[-1]["oos_end"] == n_bars
+    for before, after in zip(folds, folds[1:]):
+        assert after["oos_start"] == before["oos_end"]
+    for f in folds:
+        assert f["is_end"] == f["oos_start"]
+        assert 0 < f["oos_end"] - f["oos_start"] <= out_of_sample
+        assert f["is_start"] == (0 if anchored else f["oos_start"] - in_sample)
+
+
+def test_no_folds_without_out_of_sample_bars():
+    assert walk_forward_windows(200, 200, 100) == []
+
+
+def test_row_count_matches_loaded_rows(tmp_path):
+    path = tmp_path / "prices.csv"
+    write_dataset(path, 321, seed=1)
+    assert count_rows(str(path)) == len(load_dataset(str(path))) == 321
+
+    # Blank lines are skipped by the loader; so is a missing final newline
+    path.write_bytes(path.read_bytes().rstrip(b"\n").replace(b"\n", b"\n\n", 3))
+    assert count_rows(str(path)) == len(load_dataset(str(path))) == 321
+
+
+def test_stitched_returns_cover_each_out_of_sample_bar_once(tmp_path):
+    path = str(tmp_path / "prices.csv")
+    write_dataset(path, 900, seed=3)
+    df = load_dataset(path)
+    signals = in_process_signals(load_strategy_module(os.path.join(EXAMPLE_STRATEGIES, "sma_crossover.py")))
+    combinations = [{"short_window": s, "long_window": 40} for s in (5, 10, 20)]
+
+    folds = [
+        evaluate_fold(df, signals, combinations, fold, "sharpe_ratio", 10_000.0, 0.001)
+        for fold in walk_forward_windows(len(df), 300, 150)
+    ]
+    stitched = stitch_folds(folds, 10_000.0)
+
+    assert [len(f["returns"]) for f in folds] == [150, 150, 150, 150]
+    assert len(stitched["equity"]) == len(df) - 300
+    np.testing.assert_allclose(stitched["equity"], 10_000.0 * np.cumprod(1.0 + np.concatenate([f["returns"] for f in folds])))
@@ -25,12 +25,12 @@ class BollingerBandsStrategy:
             signals: pandas Series with trading signals
         """
         import pandas as pd
+        from app.engine.indicators import bollinger_bands
         
         # Calculate Bollinger Bands
-        data['SMA'] = data['Close'].rolling(window=self.window).mean()
-        data['STD'] = data['Close'].rolling(window=self.window).std()
-        data['Upper_Band'] = data['SMA'] + (data['STD'] * self.num_std)
-        data['Lower_Band'] = data['SMA'] - (data['STD'] * self.num_std)
+        data['SMA'], data['Upper_Band'], data['Lower_Band'] = bollinger_bands(
+            data['Close'], self.window, self.num_std
+        )
         
         # Generate signals
         signals = pd.Series(0, index=data.index)
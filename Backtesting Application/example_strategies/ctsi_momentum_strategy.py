@@ -41,7 +41,7 @@ class Strategy:
         Returns:
             DataFrame with AC, AO, and intermediate calculations
         """
-        import pandas as pd
+        from app.engine.indicators import median_price, sma
         
         df = data.copy()
         
@@ -49,17 +49,17 @@ class Strategy:
         df.columns = [col.capitalize() for col in df.columns]
         
         # Calculate Median Price
-        df['Median_Price'] = (df['High'] + df['Low']) / 2
+        df['Median_Price'] = median_price(df['High'], df['Low'])
         
         # Calculate short and long period SMAs of the Median Price
-        df['SMA_Short'] = df['Median_Price'].rolling(window=self.short_sma_period).mean()
-        df['SMA_Long'] = df['Median_Price'].rolling(window=self.long_sma_period).mean()
+        df['SMA_Short'] = sma(df['Median_Price'], self.short_sma_period)
+        df['SMA_Long'] = sma(df['Median_Price'], self.long_sma_period)
         
         # Calculate Awesome Oscillator (AO)
         df['AO'] = df['SMA_Short'] - df['SMA_Long']
         
         # Calculate SMA of the AO
-        df['SMA_AO'] = df['AO'].rolling(window=self.ao_sma_period).mean()
+        df['SMA_AO'] = sma(df['AO'], self.ao_sma_period)
         
         # Calculate Accelerator Oscillator (AC)
         df['AC'] = df['AO'] - df['SMA_AO']
@@ -130,27 +130,17 @@ def strategy(data, short_sma_period=5, long_sma_period=34, ao_sma_period=5):
         signals: pandas Series with 1 (long), -1 (short), 0 (hold)
     """
     import pandas as pd
-    
-    df = data.copy()
+    from app.engine.indicators import accelerator_oscillator, awesome_oscillator
     
     # Normalize column names
-    df.columns = [col.capitalize() for col in df.columns]
-    
-    # Calculate Median Price
-    df['Median_Price'] = (df['High'] + df['Low']) / 2
-    
-    # Calculate SMAs
-    df['SMA_Short'] = df['Median_Price'].rolling(window=short_sma_period).mean()
-    df['SMA_Long'] = df['Median_Price'].rolling(window=long_sma_period).mean()
-    
-    # Calculate Awesome Oscillator (AO)
-    df['AO'] = df['SMA_Short'] - df['SMA_Long']
-    
-    # Calculate SMA of AO
-    df['SMA_AO'] = df['AO'].rolling(window=ao_sma_period).mean()
+    high = data[[col for col in data.columns if col.lower() == 'high'][0]]
+    low = data[[col for col in data.columns if col.lower() == 'low'][0]]
     
-    # Calculate Accelerator Oscillator (AC)
-    df['AC'] = df['AO'] - df['SMA_AO']
+    # Calculate Awesome (AO) and Accelerator (AC) Oscillators; the median
+    # price SMAs behind AO are cached and shared with the AC calculation
+    df = pd.DataFrame(index=data.index)
+    df['AO'] = awesome_oscillator(high, low, short_sma_period, long_sma_period)
+    df['AC'] = accelerator_oscillator(high, low, short_sma_period, long_sma_period, ao_sma_period)
     
     # Generate signals
     signals = pd.Series(0, index=df.index)
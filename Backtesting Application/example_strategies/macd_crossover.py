@@ -27,15 +27,12 @@ class Strategy:
             signals: pandas Series with trading signals
         """
         import pandas as pd
+        from app.engine.indicators import macd as macd_indicator
         
-        # Calculate MACD
-        exp1 = data['Close'].ewm(span=self.fast_period, adjust=False).mean()
-        exp2 = data['Close'].ewm(span=self.slow_period, adjust=False).mean()
-        macd = exp1 - exp2
-        signal_line = macd.ewm(span=self.signal_period, adjust=False).mean()
-        
-        # Calculate histogram
-        histogram = macd - signal_line
+        # Calculate MACD, its signal line and histogram
+        macd, signal_line, histogram = macd_indicator(
+            data['Close'], self.fast_period, self.slow_period, self.signal_period
+        )
         
         # Generate signals based on crossovers
         signals = pd.Series(0, index=data.index)
@@ -0,0 +1,69 @@
+"""
+Pyramiding Trend Strategy with a Trailing Stop (event-driven)
+
+This strategy enters long when price closes above its moving average, adds
+another layer each time price gains a further `add_step` from the last
+entry (up to `max_layers`), and exits everything when price falls
+`trailing_stop` below the highest close since entry.
+
+The exit depends on the strategy's own position and entry history, so it is
+written for the event-driven engine (`"engine": "event"`): on_bar() is called
+once per bar and trades through the broker.
+
+Parameters:
+- window: Period for the trend moving average (default: 50)
+- layer_size: Fraction of equity added per layer (default: 0.25)
+- max_layers: Maximum number of layers held (default: 4)
+- add_step: Gain from the last entry that triggers a new layer (default: 0.02 = 2%)
+- trailing_stop: Drop from the highest close that exits (default: 0.05 = 5%)
+"""
+
+class PyramidTrailingStop:
+    def __init__(self, window=50, layer_size=0.25, max_layers=4, add_step=0.02, trailing_stop=0.05):
+        self.window = window
+        self.layer_size = layer_size
+        self.max_layers = max_layers
+        self.add_step = add_step
+        self.trailing_stop = trailing_stop
+
+    def on_start(self, data):
+        """Precompute the trend filter once for the whole dataset."""
+        from app.engine.indicators import sma
+
+        self.trend = sma(data['Close'], self.window).tolist()
+        self.layers = 0
+        self.last_entry = 0.0
+        self.peak = 0.0
+
+    def on_bar(self, bar, broker):
+        """
+        Called once per bar.
+
+        Args:
+            bar: current bar (index, timestamp, open, high, low, close, volume)
+            broker: account with cash, position, equity and order methods
+        """
+        price = bar.close
+
+        if self.layers == 0:
+            # Flat: enter on a close above the trend
+            if price > self.trend[bar.index]:
+                broker.buy(self.layer_size * broker.equity / price)
+                self.layers = 1
+                self.last_entry = price
+                self.peak = price
+            return
+
+        self.peak = max(self.peak, price)
+
+        # Trailing stop: exit every layer at once
+        if price <= self.peak * (1 - self.trailing_stop):
+            broker.close_position()
+            self.layers = 0
+            return
+
+        # Pyramid: add a layer after each further gain
+        if self.layers < self.max_layers and price >= self.last_entry * (1 + self.add_step):
+            broker.buy(self.layer_size * broker.equity / price)
+            self.layers += 1
+            self.last_entry = price
@@ -24,16 +24,10 @@ def strategy(data, rsi_period=14, oversold=30, overbought=70):
         signals: pandas Series with 1 (buy), -1 (sell), 0 (hold)
     """
     import pandas as pd
-    import numpy as np
+    from app.engine.indicators import rsi as relative_strength
     
-    # Calculate RSI
-    delta = data['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=rsi_period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=rsi_period).mean()
-    
-    # Avoid division by zero
-    rs = gain / loss.replace(0, np.nan)
-    rsi = 100 - (100 / (1 + rs))
+    # Calculate RSI (NaN while there are no losses in the window)
+    rsi = relative_strength(data['Close'], rsi_period)
     
     # Generate signals
     signals = pd.Series(0, index=data.index)
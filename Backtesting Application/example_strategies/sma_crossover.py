@@ -25,10 +25,11 @@ class Strategy:
             signals: pandas Series with 1 (buy), -1 (sell), 0 (hold)
         """
         import pandas as pd
+        from app.engine.indicators import sma
         
         # Calculate moving averages
-        data['SMA_short'] = data['Close'].rolling(window=self.short_window).mean()
-        data['SMA_long'] = data['Close'].rolling(window=self.long_window).mean()
+        data['SMA_short'] = sma(data['Close'], self.short_window)
+        data['SMA_long'] = sma(data['Close'], self.long_window)
         
         # Generate signals
         data['signal'] = 0